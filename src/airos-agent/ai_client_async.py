@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+"""
+AIROS Async Client - asyncio variant of AIROSClient
+Shares one keep-alive connection pool across all calls so agents can run
+dozens of device operations concurrently
+"""
+
+import json
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Any, Callable, Iterable, Iterator, Union, AsyncIterator, Awaitable
+
+import aiohttp
+
+from ai_client_python import (
+    DeviceInfo, CommandResult, OutputChunk, ResponseCache, output_chunk, cache_ttls,
+    payload_type, batch_payload, batch_http_timeout, batch_results, SNAPSHOT_MODES
+)
+from payload_codec import accept_headers, decode, decompress
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAIROSClient:
+    """
+    Async client for AIROS-enabled devices with the AIROSClient API surface
+
+    Like AIROSClient it targets the ROM's AIAgentService API.
+    """
+
+    def __init__(self, device_ip: str, auth_token: str, port: int = 8080, ws_port: int = 8081,
+                 request_timeout: float = 10.0,
+                 endpoint_timeouts: Optional[Dict[str, float]] = None,
+                 max_connections: int = 16, max_concurrency: int = 32,
+                 cache: Union[bool, Dict[str, float]] = False,
+                 payload_format: str = "json", snapshot_mode: str = "full"):
+        """
+        Initialize async AIROS client
+
+        Args:
+            device_ip: IP address of the Android device
+            auth_token: Authentication token from the device
+            port: HTTP API port (default 8080)
+            ws_port: WebSocket port for real-time monitoring (default 8081)
+            request_timeout: Default total timeout per request in seconds
+            endpoint_timeouts: Per-endpoint overrides, e.g. {"snapshot": 60}
+            max_connections: Keep-alive connections kept open to the device
+            max_concurrency: Requests allowed in flight at once
+            cache: Response cache setting, as for AIROSClient
+            payload_format: Response encoding to negotiate, as for AIROSClient
+            snapshot_mode: "full" or "lazy", as for AIROSClient
+        """
+        if snapshot_mode not in SNAPSHOT_MODES:
+            raise ValueError(f"Unknown snapshot mode: {snapshot_mode}")
+        self.device_ip = device_ip
+        self.auth_token = auth_token
+        self.port = port
+        self.ws_port = ws_port
+        self.request_timeout = request_timeout
+        self.endpoint_timeouts = endpoint_timeouts or {}
+        self.snapshot_mode = snapshot_mode
+        # Lazy snapshot each task's commands are journaled into (see journaling)
+        self.journal: ContextVar[Optional[str]] = ContextVar(f"airos_journal_{id(self)}", default=None)
+        self.max_connections = max_connections
+        self.content_type = payload_type(payload_format)
+
+        self.base_url = f"http://{device_ip}:{port}/api"
+        self.ws_url = f"ws://{device_ip}:{ws_port}"
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+        ttls = cache_ttls(cache)
+        self.cache: Optional[ResponseCache] = ResponseCache(ttls) if ttls else None
+
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self.ws_task: Optional[asyncio.Task] = None
+        self.event_handlers: Dict[str, List[Callable]] = {}
+        self.last_seq: Optional[int] = None
+        self.epoch: Optional[str] = None  # agent run last_seq belongs to
+
+    async def connect(self) -> "AsyncAIROSClient":
+        """Open the shared connection pool and verify the device answers"""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=60
+            )
+            # Bodies are decompressed by payload_codec, which also handles zstd
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                auto_decompress=False,
+                headers={
+                    "Authorization": f"Bearer {self.auth_token}",
+                    "Content-Type": "application/json",
+                    **accept_headers(self.content_type)
+                }
+            )
+        await self._verify_connection()
+        return self
+
+    async def __aenter__(self) -> "AsyncAIROSClient":
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _verify_connection(self):
+        """Verify connection to the device"""
+        try:
+            info = await self.get_system_info()
+            logger.info(f"Connected to {info.model} running AIROS {info.airos_version}")
+        except Exception as e:
+            await self.close()
+            raise ConnectionError(f"Failed to connect to device: {e}")
+
+    async def _make_request(self, endpoint: str, method: str = "GET",
+                            data: Optional[Dict] = None,
+                            timeout: Optional[float] = None) -> Dict:
+        """Make HTTP request to the device over the shared pool"""
+        if self.session is None:
+            raise ConnectionError("Client is not connected; call connect() first")
+
+        url = f"{self.base_url}/{endpoint}"
+        if timeout is None:
+            timeout = self.endpoint_timeouts.get(endpoint, self.request_timeout)
+
+        if method not in ("GET", "POST", "PUT", "DELETE"):
+            raise ValueError(f"Unsupported method: {method}")
+
+        kwargs: Dict[str, Any] = {"timeout": aiohttp.ClientTimeout(total=timeout)}
+        if method in ("POST", "PUT"):
+            kwargs["json"] = data or {}
+
+        try:
+            async with self.semaphore:
+                async with self.session.request(method, url, **kwargs) as response:
+                    response.raise_for_status()
+                    body = decompress(await response.read(),
+                                      response.headers.get("Content-Encoding"))
+                    return decode(body, response.headers.get("Content-Type"))
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Request failed: {e}")
+            raise
+
+    async def _cached(self, group: str, key: str, loader: Callable[[], Awaitable[Any]],
+                      cache_if: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Serve a read-only query from the response cache when enabled"""
+        if self.cache is None or not self.cache.enabled(group):
+            return await loader()
+
+        hit, value, generation = self.cache.lookup(group, key)
+        if hit:
+            return value
+
+        value = await loader()
+        if cache_if is None or cache_if(value):
+            self.cache.store(group, key, value, generation)
+        return value
+
+    def _invalidate(self, operation: str):
+        if self.cache is not None:
+            self.cache.invalidate_for(operation)
+
+    # System Information Methods
+
+    async def get_system_info(self) -> DeviceInfo:
+        """Get device system information"""
+        data = await self._cached("system/info", "", lambda: self._make_request("system/info"))
+        return DeviceInfo(
+            device=data["device"],
+            model=data["model"],
+            android_version=data["androidVersion"],
+            sdk_version=data["sdkVersion"],
+            airos_version=data["airosVersion"],
+            uptime=data["uptime"],
+            total_memory=data["totalMemory"],
+            free_memory=data["freeMemory"]
+        )
+
+    # Command Execution Methods
+
+    async def execute_command(self, command: str, timeout: int = 5000) -> CommandResult:
+        """
+        Execute a shell command on the device
+
+        Args:
+            command: Shell command to execute
+            timeout: Timeout in milliseconds
+
+        Returns:
+            CommandResult with output and status
+        """
+        start_time = time.time()
+
+        payload = {"command": command, "timeout": timeout}
+        snapshot_id = self.journal.get()
+        if snapshot_id:
+            payload["snapshotId"] = snapshot_id
+
+        data = await self._make_request("execute", "POST", payload,
+                                        timeout=timeout / 1000 + self.request_timeout)
+
+        execution_time = time.time() - start_time
+
+        return CommandResult(
+            success="error" not in data,
+            output=data.get("output", ""),
+            exit_code=data.get("exitCode", -1),
+            error=data.get("error"),
+            execution_time=execution_time
+        )
+
+    async def execute_many(self, commands: Iterable[str], timeout: int = 5000) -> List[CommandResult]:
+        """Execute independent commands concurrently, results in input order"""
+        return await asyncio.gather(*[
+            self.execute_command(command, timeout) for command in commands
+        ])
+
+    async def execute_batch(self, commands: List[Union[str, Dict]], parallel: bool = False,
+                            stop_on_error: bool = False, timeout: int = 5000) -> List[CommandResult]:
+        """Execute several shell commands in one round trip (see AIROSClient.execute_batch)"""
+        data = await self._make_request(
+            "execute_batch", "POST",
+            batch_payload(commands, parallel, stop_on_error, timeout),
+            timeout=batch_http_timeout(commands, timeout, self.request_timeout)
+        )
+        return batch_results(data)
+
+    async def execute_stream(self, command: str, timeout: int = 30000,
+                             in_waydroid: bool = False) -> AsyncIterator[OutputChunk]:
+        """Yield command output as it is produced (see AIROSClient.execute_stream)"""
+        if self.session is None:
+            raise ConnectionError("Client is not connected; call connect() first")
+
+        payload = {"command": command, "timeout": timeout, "in_waydroid": in_waydroid}
+        client_timeout = aiohttp.ClientTimeout(
+            total=timeout / 1000 + self.request_timeout,
+            connect=self.request_timeout
+        )
+
+        async with self.semaphore:
+            async with self.session.post(f"{self.base_url}/execute_stream", json=payload,
+                                         timeout=client_timeout) as response:
+                response.raise_for_status()
+                async for line in response.content:
+                    if line.strip():
+                        yield output_chunk(json.loads(line))
+
+    async def execute_as_root(self, command: str, timeout: int = 5000) -> CommandResult:
+        """Execute command with root privileges"""
+        return await self.execute_command(f"su -c '{command}'", timeout)
+
+    # Code Injection Methods
+
+    async def inject_code(self, target_class: str, method_name: str,
+                          code: str, language: str = "java") -> bool:
+        """Inject code into a running system component"""
+        data = await self._make_request("inject", "POST", {
+            "targetClass": target_class,
+            "methodName": method_name,
+            "code": code,
+            "language": language
+        })
+
+        return data.get("success", False)
+
+    # Snapshot and Rollback Methods
+
+    async def create_snapshot(self, name: str = "manual", lazy: bool = False) -> str:
+        """Create a system snapshot for rollback, lazy as for AIROSClient.create_snapshot"""
+        payload = {"name": name, "mode": "lazy"} if lazy else {"name": name}
+        data = await self._make_request("snapshot", "POST", payload)
+
+        if data.get("success"):
+            snapshot_id = data["snapshotId"]
+            logger.info(f"Created {data.get('mode', 'full')} snapshot: {snapshot_id}")
+            return snapshot_id
+        else:
+            raise Exception("Failed to create snapshot")
+
+    @contextmanager
+    def journaling(self, snapshot_id: Optional[str]) -> Iterator[None]:
+        """Journal this task's execute_command calls into a lazy snapshot"""
+        token = self.journal.set(snapshot_id)
+        try:
+            yield
+        finally:
+            self.journal.reset(token)
+
+    async def release_snapshot(self, snapshot_id: str) -> bool:
+        """Discard a lazy snapshot's undo journal once it is no longer needed"""
+        try:
+            data = await self._make_request("snapshot/release", "POST", {"snapshotId": snapshot_id})
+        except Exception as e:
+            logger.warning(f"Could not release snapshot {snapshot_id}: {e}")
+            return False
+        return data.get("success", False)
+
+    async def rollback(self, snapshot_id: str) -> bool:
+        """Rollback system to a previous snapshot"""
+        data = await self._make_request("rollback", "POST", {"snapshotId": snapshot_id})
+        self._invalidate("rollback")
+
+        success = data.get("success", False)
+        if success:
+            logger.info(f"Successfully rolled back to: {snapshot_id}")
+        else:
+            logger.error(f"Rollback failed for: {snapshot_id}")
+
+        return success
+
+    # Application Management Methods
+
+    async def list_apps(self) -> List[Dict]:
+        """List all installed applications"""
+        data = await self._cached("apps/list", "", lambda: self._make_request("apps/list"))
+        return list(data.get("apps", []))
+
+    async def modify_app(self, package_name: str, modification: str) -> bool:
+        """Modify an installed application"""
+        data = await self._make_request("apps/modify", "POST", {
+            "packageName": package_name,
+            "modification": modification
+        })
+        self._invalidate("modify_app")
+
+        return data.get("success", False)
+
+    async def install_app(self, apk_path: str) -> bool:
+        """Install an APK file"""
+        result = await self.execute_command(f"pm install -r {apk_path}")
+        self._invalidate("install_app")
+        return result.success
+
+    async def uninstall_app(self, package_name: str) -> bool:
+        """Uninstall an application"""
+        result = await self.execute_command(f"pm uninstall {package_name}")
+        self._invalidate("uninstall_app")
+        return result.success
+
+    # Service Management Methods
+
+    async def start_service(self, service_name: str) -> bool:
+        """Start an Android service"""
+        result = await self.execute_command(f"am startservice {service_name}")
+        return result.success
+
+    async def stop_service(self, service_name: str) -> bool:
+        """Stop an Android service"""
+        result = await self.execute_command(f"am stopservice {service_name}")
+        return result.success
+
+    async def restart_service(self, service_name: str) -> bool:
+        """Restart an Android service"""
+        await self.stop_service(service_name)
+        await asyncio.sleep(1)
+        return await self.start_service(service_name)
+
+    # Debug Methods
+
+    async def get_logs(self, lines: int = 100, filter: str = "AIROS") -> List[str]:
+        """Get system logs"""
+        data = await self._make_request("debug/logs", "POST", {
+            "lines": lines,
+            "filter": filter
+        })
+
+        return data.get("logs", [])
+
+    async def dump_system_service(self, service: str) -> str:
+        """Dump information from a system service"""
+        result = await self._cached(
+            "dumpsys", service,
+            lambda: self.execute_command(f"dumpsys {service}"),
+            cache_if=lambda r: r.success
+        )
+        return result.output
+
+    # WebSocket Real-time Monitoring
+
+    async def start_monitoring(self, on_message: Optional[Callable] = None,
+                               on_error: Optional[Callable] = None,
+                               reconnect: bool = True, max_backoff: float = 30.0):
+        """
+        Start WebSocket monitoring with automatic reconnect and resume
+
+        Args:
+            on_message: Callback (plain or async) for incoming messages
+            on_error: Callback for errors
+            reconnect: Reconnect with exponential backoff after a drop
+            max_backoff: Upper bound in seconds for the reconnect delay
+        """
+        self.ws_task = asyncio.create_task(
+            self._monitor(on_message, on_error, reconnect, max_backoff)
+        )
+        logger.info("Started real-time monitoring")
+
+    async def _monitor(self, on_message: Optional[Callable], on_error: Optional[Callable],
+                       reconnect: bool, max_backoff: float):
+        """Connection loop: connect, authenticate, resubscribe, receive"""
+        backoff = 1.0
+        while True:
+            url = self.ws_url
+            if self.last_seq is not None:
+                url = f"{self.ws_url}/?since={self.last_seq}"
+                if self.epoch:
+                    url += f"&epoch={self.epoch}"
+
+            try:
+                self.ws = await self.session.ws_connect(url, heartbeat=30)
+                logger.info("WebSocket connection opened")
+                backoff = 1.0
+
+                await self.ws.send_json({
+                    "action": "authenticate",
+                    "token": self.auth_token
+                })
+                for event_type in list(self.event_handlers):
+                    await self.ws.send_json({"action": "subscribe", "eventType": event_type})
+
+                await self._receive_events(on_message, on_error)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Anything but cancellation reconnects; the monitor never dies silently
+                logger.error(f"WebSocket error: {e}")
+                self._notify_error(on_error, e)
+
+            if not reconnect:
+                break
+            logger.info(f"Reconnecting in {backoff:.0f}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+
+    async def _receive_events(self, on_message: Optional[Callable],
+                              on_error: Optional[Callable]):
+        """Dispatch incoming WebSocket messages to handlers"""
+        async for msg in self.ws:
+            if msg.type == aiohttp.WSMsgType.ERROR:
+                logger.error(f"WebSocket error: {self.ws.exception()}")
+                self._notify_error(on_error, self.ws.exception())
+                break
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+
+            try:
+                data = json.loads(msg.data)
+            except json.JSONDecodeError:
+                logger.error(f"Invalid JSON message: {msg.data}")
+                continue
+
+            logger.debug(f"WebSocket message: {data}")
+            if data.get("action") == "resume":
+                self._on_resume(data)
+            elif "seq" in data and not data.get("snapshot"):
+                if self._restarted(data):
+                    self.last_seq, self.epoch = 0, data["epoch"]
+                if self.last_seq is not None and data["seq"] <= self.last_seq:
+                    continue  # Already delivered before the reconnect
+                self.last_seq = data["seq"]
+
+            handlers = ([on_message] if on_message else []) + \
+                self.event_handlers.get(data.get("eventType"), [])
+            for handler in handlers:
+                try:
+                    result = handler(data)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception:
+                    logger.exception(f"Event handler {getattr(handler, '__name__', handler)} failed")
+
+        logger.info("WebSocket connection closed")
+
+    @staticmethod
+    def _notify_error(on_error: Optional[Callable], error: BaseException):
+        """Pass an error to the user's callback without letting it stop the monitor"""
+        if on_error:
+            try:
+                on_error(error)
+            except Exception:
+                logger.exception("on_error handler failed")
+
+    def _on_resume(self, data: Dict):
+        """Set the replay cursor from the agent's greeting"""
+        if self.last_seq is None:
+            self.last_seq = data.get("seq")
+        elif self._restarted(data) or data.get("seq", 0) < self.last_seq:
+            # Agent restarted and numbers from 1 again; take its whole backlog
+            self.last_seq = 0
+        self.epoch = data.get("epoch", self.epoch)
+        if data.get("status") == "gap":
+            logger.warning(f"Events after seq {data.get('since')} were lost while disconnected")
+
+    def _restarted(self, data: Dict) -> bool:
+        """Whether a message comes from a later run of the agent than the cursor"""
+        return self.epoch is not None and data.get("epoch", self.epoch) != self.epoch
+
+    async def stop_monitoring(self):
+        """Stop WebSocket monitoring"""
+        if self.ws_task:
+            self.ws_task.cancel()
+            await asyncio.gather(self.ws_task, return_exceptions=True)
+            self.ws_task = None
+        if self.ws:
+            await self.ws.close()
+            self.ws = None
+            logger.info("Stopped real-time monitoring")
+
+    async def subscribe_to_event(self, event_type: str, handler: Callable):
+        """Subscribe to specific system events"""
+        if event_type not in self.event_handlers:
+            self.event_handlers[event_type] = []
+
+        self.event_handlers[event_type].append(handler)
+
+        # Send subscription request
+        if self.ws and not self.ws.closed:
+            await self.ws.send_json({
+                "action": "subscribe",
+                "eventType": event_type
+            })
+
+    # High-level Helper Methods
+
+    async def safe_execute(self, operation: Callable, *args, **kwargs) -> Any:
+        """Execute a coroutine function with automatic snapshot and rollback on failure"""
+        lazy = self.snapshot_mode == "lazy"
+        snapshot_id = await self.create_snapshot(f"before_{operation.__name__}", lazy=lazy)
+
+        try:
+            with self.journaling(snapshot_id if lazy else None):
+                result = await operation(*args, **kwargs)
+            logger.info(f"Operation {operation.__name__} completed successfully")
+            if lazy:
+                await self.release_snapshot(snapshot_id)
+            return result
+
+        except Exception as e:
+            logger.error(f"Operation failed: {e}")
+            logger.info("Initiating rollback...")
+
+            if await self.rollback(snapshot_id):
+                logger.info("System restored to previous state")
+            else:
+                logger.error("Rollback failed - manual intervention may be required")
+
+            raise
+
+    async def run_experiment(self, name: str, setup: Callable, test: Callable,
+                             cleanup: Optional[Callable] = None) -> Dict:
+        """Run an experiment whose setup, test and cleanup are coroutine functions"""
+        logger.info(f"Starting experiment: {name}")
+
+        results = {
+            "name": name,
+            "start_time": time.time(),
+            "success": False,
+            "error": None,
+            "output": None
+        }
+
+        lazy = self.snapshot_mode == "lazy"
+        snapshot_id = await self.create_snapshot(f"experiment_{name}", lazy=lazy)
+
+        try:
+            with self.journaling(snapshot_id if lazy else None):
+                logger.info("Running setup...")
+                await setup()
+
+                logger.info("Running test...")
+                results["output"] = await test()
+            results["success"] = True
+            if lazy:
+                await self.release_snapshot(snapshot_id)
+
+        except Exception as e:
+            logger.error(f"Experiment failed: {e}")
+            results["error"] = str(e)
+
+            logger.info("Rolling back due to failure...")
+            await self.rollback(snapshot_id)
+
+        finally:
+            if cleanup:
+                logger.info("Running cleanup...")
+                try:
+                    await cleanup()
+                except Exception as e:
+                    logger.error(f"Cleanup failed: {e}")
+
+            results["end_time"] = time.time()
+            results["duration"] = results["end_time"] - results["start_time"]
+
+        logger.info(f"Experiment completed: {results['success']}")
+        return results
+
+    async def close(self):
+        """Close all connections"""
+        await self.stop_monitoring()
+        if self.session:
+            await self.session.close()
+            self.session = None
+        logger.info("Client closed")
+
+
+# Example usage
+if __name__ == "__main__":
+    DEVICE_IP = "192.168.1.100"
+    AUTH_TOKEN = "your-auth-token-here"
+
+    async def main():
+        async with AsyncAIROSClient(DEVICE_IP, AUTH_TOKEN) as client:
+            # Query a batch of properties concurrently over the shared pool
+            props = ["ro.build.version.release", "ro.product.model", "ro.build.id"]
+            results = await client.execute_many(f"getprop {p}" for p in props)
+            for prop, result in zip(props, results):
+                print(f"{prop}: {result.output.strip()}")
+
+    asyncio.run(main())
@@ -8,14 +8,22 @@ import json
 import time
 import threading
 import logging
-from typing import Dict, List, Optional, Any, Callable
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Callable, Union, Iterator, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
 import requests
 import websocket
+from urllib3.util.request import ACCEPT_ENCODING
 from websocket import WebSocketApp
 
+from payload_codec import (
+    JSON_TYPE, MSGPACK_TYPE, CBOR_TYPE, available_formats, accept_headers, decode
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -53,10 +61,327 @@ class CommandResult:
     execution_time: float = 0.0
 
 
+@dataclass
+class OutputChunk:
+    """Frame of streamed command output"""
+    stream: str  # "stdout", "stderr", or "exit" for the final frame
+    data: str = ""
+    status: Optional[str] = None
+    exit_code: Optional[int] = None
+    error: Optional[str] = None
+
+
+def output_chunk(frame: Dict) -> OutputChunk:
+    """OutputChunk from one execute_stream NDJSON frame"""
+    return OutputChunk(
+        stream=frame.get("stream", "stdout"),
+        data=frame.get("data", ""),
+        status=frame.get("status"),
+        exit_code=frame.get("exit_code"),
+        error=frame.get("error")
+    )
+
+
+def batch_payload(commands: List[Union[str, Dict]], parallel: bool,
+                  stop_on_error: bool, timeout: int) -> Dict:
+    """Request body for the execute_batch endpoint"""
+    return {
+        "commands": commands,
+        "mode": "parallel" if parallel else "sequential",
+        "stop_on_error": stop_on_error,
+        "timeout": timeout
+    }
+
+
+def batch_http_timeout(commands: List[Union[str, Dict]], timeout: int,
+                       request_timeout: float) -> float:
+    """Worst-case wait for a batch: every command running to its timeout in turn"""
+    total_ms = sum(
+        c.get("timeout", timeout) if isinstance(c, dict) else timeout
+        for c in commands
+    )
+    return total_ms / 1000 + request_timeout
+
+
+def batch_results(data: Dict) -> List[CommandResult]:
+    """CommandResults, in request order, from an execute_batch response"""
+    return [
+        CommandResult(
+            success=item.get("success", False),
+            output=item.get("output", ""),
+            exit_code=item["exit_code"] if item.get("exit_code") is not None else -1,
+            error=item.get("error") or (
+                "Skipped after earlier failure" if item.get("status") == "skipped" else None
+            ),
+            execution_time=item.get("duration", 0.0)
+        )
+        for item in data.get("results", [])
+    ]
+
+
+# Response body formats a client can ask the agent for
+PAYLOAD_FORMATS = {
+    "json": JSON_TYPE,
+    "msgpack": MSGPACK_TYPE,
+    "cbor": CBOR_TYPE
+}
+
+
+def payload_type(payload_format: str) -> str:
+    """Media type for a payload_format name, checking its codec is installed"""
+    content_type = PAYLOAD_FORMATS.get(payload_format)
+    if content_type is None:
+        raise ValueError(f"Unknown payload format: {payload_format}")
+    if content_type not in available_formats():
+        raise ValueError(f"Payload format {payload_format} needs its Python package installed")
+    return content_type
+
+
+# "full" captures device state up front; "lazy" has the agent journal undo
+# entries for each command run until the snapshot is released or rolled back
+SNAPSHOT_MODES = ("full", "lazy")
+
+
+# Seconds each read-only query is cached for with AIROSClient(cache=True)
+DEFAULT_CACHE_TTLS = {
+    "system/info": 5.0,
+    "apps/list": 30.0,
+    "dumpsys": 2.0
+}
+
+# Cached queries made stale by each mutating call (None: all of them)
+CACHE_INVALIDATIONS = {
+    "install_app": ("apps/list", "dumpsys"),
+    "uninstall_app": ("apps/list", "dumpsys"),
+    "modify_app": ("apps/list", "dumpsys"),
+    "rollback": None
+}
+
+
+class ResponseCache:
+    """TTL cache for read-only device queries, grouped by endpoint"""
+    
+    def __init__(self, ttls: Dict[str, float]):
+        self.ttls = dict(ttls)
+        self.entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self.lock = threading.Lock()
+        # Bumped by every invalidation so loads that started before it are
+        # not stored afterwards
+        self.generation = 0
+        self.counters: Dict[str, Dict[str, int]] = {
+            group: {"hits": 0, "misses": 0} for group in self.ttls
+        }
+        self.invalidations = 0
+    
+    def enabled(self, group: str) -> bool:
+        return self.ttls.get(group, 0) > 0
+    
+    def lookup(self, group: str, key: str = "") -> Tuple[bool, Any, int]:
+        """
+        Look up a cached value
+        
+        Returns:
+            (hit, value, generation) - pass generation to store() after a miss
+        """
+        with self.lock:
+            entry = self.entries.get((group, key))
+            if entry and entry[0] > time.monotonic():
+                self.counters[group]["hits"] += 1
+                return True, entry[1], self.generation
+            self.counters.setdefault(group, {"hits": 0, "misses": 0})["misses"] += 1
+            return False, None, self.generation
+    
+    def store(self, group: str, key: str, value: Any, generation: int):
+        with self.lock:
+            if generation == self.generation:
+                self.entries[(group, key)] = (time.monotonic() + self.ttls[group], value)
+    
+    def get_or_load(self, group: str, key: str, loader: Callable[[], Any],
+                    cache_if: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Cached value of group/key, calling loader on a miss"""
+        if not self.enabled(group):
+            return loader()
+        
+        hit, value, generation = self.lookup(group, key)
+        if hit:
+            return value
+        
+        value = loader()
+        if cache_if is None or cache_if(value):
+            self.store(group, key, value, generation)
+        return value
+    
+    def invalidate(self, *groups: str):
+        """Drop cached entries of the given groups, or all entries"""
+        with self.lock:
+            self.generation += 1
+            self.invalidations += 1
+            if not groups:
+                self.entries.clear()
+            else:
+                for entry_key in [k for k in self.entries if k[0] in groups]:
+                    del self.entries[entry_key]
+    
+    def invalidate_for(self, operation: str):
+        """Fire the invalidation registered for a mutating client call"""
+        groups = CACHE_INVALIDATIONS.get(operation, ())
+        if groups is None:
+            self.invalidate()
+        elif groups:
+            self.invalidate(*groups)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per endpoint group and overall"""
+        with self.lock:
+            hits = sum(c["hits"] for c in self.counters.values())
+            misses = sum(c["misses"] for c in self.counters.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+                "endpoints": {g: dict(c) for g, c in self.counters.items()}
+            }
+
+
+def cache_ttls(cache: Union[bool, Dict[str, float]]) -> Optional[Dict[str, float]]:
+    """TTL table for a client's cache argument, or None when caching is off"""
+    if not cache:
+        return None
+    ttls = dict(DEFAULT_CACHE_TTLS)
+    if isinstance(cache, dict):
+        ttls.update(cache)
+    return ttls
+
+
+class EventDispatcher:
+    """
+    Runs event handlers on a thread pool instead of the WebSocket thread
+    
+    Events of one type are handled in arrival order, one at a time; different
+    types run concurrently. Each type queues at most queue_size events. When
+    full, "drop_oldest" discards the oldest queued event and "block" makes the
+    WebSocket thread wait, pushing back on the agent.
+    """
+    
+    # Events one worker handles before yielding to other event types
+    DRAIN_BATCH = 32
+    
+    def __init__(self, max_workers: int = 4, queue_size: int = 1000,
+                 overflow: str = "drop_oldest"):
+        if overflow not in ("drop_oldest", "block"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="airos-events")
+        self.queues: Dict[str, deque] = {}
+        self.scheduled = set()
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.closed = False
+        self.dispatched = 0
+        self.dropped = 0
+        self.latency: Dict[str, Dict[str, float]] = {}
+    
+    def dispatch(self, event_type: str, handlers: List[Callable], data: Dict):
+        """Queue data for handlers, keeping order within event_type"""
+        with self.not_full:
+            queue = self.queues.setdefault(event_type, deque())
+            while len(queue) >= self.queue_size and not self.closed:
+                if self.overflow == "drop_oldest":
+                    queue.popleft()
+                    self.dropped += 1
+                else:
+                    self.not_full.wait()
+            if self.closed:
+                return
+            
+            queue.append((list(handlers), data))
+            self.dispatched += 1
+            if event_type not in self.scheduled:
+                self.scheduled.add(event_type)
+                self.executor.submit(self._drain, event_type)
+    
+    def _drain(self, event_type: str):
+        """Handle queued events of one type; reschedule if more remain"""
+        for _ in range(self.DRAIN_BATCH):
+            with self.not_full:
+                queue = self.queues[event_type]
+                if not queue:
+                    self.scheduled.discard(event_type)
+                    return
+                handlers, data = queue.popleft()
+                self.not_full.notify_all()
+            
+            for handler in handlers:
+                self._call(event_type, handler, data)
+        
+        # Give other event types a turn; this type stays scheduled
+        try:
+            self.executor.submit(self._drain, event_type)
+        except RuntimeError:
+            with self.lock:
+                self.scheduled.discard(event_type)
+    
+    def _call(self, event_type: str, handler: Callable, data: Dict):
+        start = time.perf_counter()
+        failed = False
+        try:
+            handler(data)
+        except Exception as e:
+            failed = True
+            logger.error(f"Event handler {getattr(handler, '__qualname__', handler)} failed: {e}")
+        elapsed = time.perf_counter() - start
+        
+        key = f"{event_type}:{getattr(handler, '__qualname__', repr(handler))}"
+        with self.lock:
+            counters = self.latency.setdefault(
+                key, {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            counters["calls"] += 1
+            counters["errors"] += failed
+            counters["total_seconds"] += elapsed
+            counters["max_seconds"] = max(counters["max_seconds"], elapsed)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Dispatch counters, queue depths and per-handler latency"""
+        with self.lock:
+            return {
+                "dispatched": self.dispatched,
+                "dropped": self.dropped,
+                "queued": {t: len(q) for t, q in self.queues.items() if q},
+                "handlers": {
+                    key: dict(c, avg_seconds=c["total_seconds"] / c["calls"])
+                    for key, c in self.latency.items()
+                }
+            }
+    
+    def shutdown(self, wait: bool = False):
+        """Stop accepting events; with wait, finish the queued ones first"""
+        with self.not_full:
+            self.closed = True
+            if not wait:
+                for queue in self.queues.values():
+                    queue.clear()
+            self.not_full.notify_all()
+        self.executor.shutdown(wait=wait)
+
+
 class AIROSClient:
-    """Main client for connecting to AIROS-enabled Android devices"""
+    """
+    Main client for connecting to AIROS-enabled Android devices
+    
+    It speaks the HTTP API of the AIAgentService in the AIROS ROM. The
+    Python agents in airos-agent serve execute_batch and execute_stream
+    with the same bodies, but the rest of their API differs and this client
+    does not connect to them.
+    """
     
-    def __init__(self, device_ip: str, auth_token: str, port: int = 8080, ws_port: int = 8081):
+    def __init__(self, device_ip: str, auth_token: str, port: int = 8080, ws_port: int = 8081,
+                 request_timeout: float = 10.0, cache: Union[bool, Dict[str, float]] = False,
+                 payload_format: str = "json", snapshot_mode: str = "full"):
         """
         Initialize AIROS client
         
@@ -65,11 +390,26 @@ class AIROSClient:
             auth_token: Authentication token from the device
             port: HTTP API port (default 8080)
             ws_port: WebSocket port for real-time monitoring (default 8081)
+            request_timeout: Timeout per HTTP request in seconds
+            cache: Cache read-only queries - True for DEFAULT_CACHE_TTLS, or a
+                   dict of per-endpoint TTL overrides in seconds (0 disables)
+            payload_format: Response encoding to negotiate - "json", "msgpack"
+                            or "cbor"; agents without support answer in JSON
+            snapshot_mode: Snapshots taken by safe_execute and run_experiment -
+                           "full", or "lazy" to journal only what the
+                           operation changes (see create_snapshot)
         """
+        if snapshot_mode not in SNAPSHOT_MODES:
+            raise ValueError(f"Unknown snapshot mode: {snapshot_mode}")
+        
         self.device_ip = device_ip
         self.auth_token = auth_token
         self.port = port
         self.ws_port = ws_port
+        self.request_timeout = request_timeout
+        self.snapshot_mode = snapshot_mode
+        # Lazy snapshot each thread's commands are journaled into (see journaling)
+        self.journal = threading.local()
         
         self.base_url = f"http://{device_ip}:{port}/api"
         self.ws_url = f"ws://{device_ip}:{ws_port}"
@@ -77,14 +417,25 @@ class AIROSClient:
         self.session = requests.Session()
         self.session.headers.update({
             "Authorization": f"Bearer {auth_token}",
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            "Accept": accept_headers(payload_type(payload_format))["Accept"],
+            # Every coding urllib3 transparently decodes (zstd when installed)
+            "Accept-Encoding": ACCEPT_ENCODING
         })
         
         self.ws_app: Optional[WebSocketApp] = None
         self.ws_thread: Optional[threading.Thread] = None
         self.event_handlers: Dict[str, List[Callable]] = {}
+        self.last_seq: Optional[int] = None
+        self.epoch: Optional[str] = None  # agent run last_seq belongs to
+        self.dispatcher: Optional[EventDispatcher] = None
+        self._monitor_stop = threading.Event()
+        self._backoff = 1.0
+        
+        ttls = cache_ttls(cache)
+        self.cache: Optional[ResponseCache] = ResponseCache(ttls) if ttls else None
         
-        # Verify connection
+        # Verify connection (with caching on, this primes system/info)
         self._verify_connection()
     
     def _verify_connection(self):
@@ -96,24 +447,26 @@ class AIROSClient:
             raise ConnectionError(f"Failed to connect to device: {e}")
     
     def _make_request(self, endpoint: str, method: str = "GET", 
-                     data: Optional[Dict] = None) -> Dict:
+                     data: Optional[Dict] = None, timeout: Optional[float] = None) -> Dict:
         """Make HTTP request to the device"""
         url = f"{self.base_url}/{endpoint}"
+        if timeout is None:
+            timeout = self.request_timeout
         
         try:
             if method == "GET":
-                response = self.session.get(url)
+                response = self.session.get(url, timeout=timeout)
             elif method == "POST":
-                response = self.session.post(url, json=data or {})
+                response = self.session.post(url, json=data or {}, timeout=timeout)
             elif method == "PUT":
-                response = self.session.put(url, json=data or {})
+                response = self.session.put(url, json=data or {}, timeout=timeout)
             elif method == "DELETE":
-                response = self.session.delete(url)
+                response = self.session.delete(url, timeout=timeout)
             else:
                 raise ValueError(f"Unsupported method: {method}")
             
             response.raise_for_status()
-            return response.json()
+            return decode(response.content, response.headers.get("Content-Type"))
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed: {e}")
@@ -121,9 +474,20 @@ class AIROSClient:
     
     # System Information Methods
     
+    def _cached(self, group: str, key: str, loader: Callable[[], Any],
+                cache_if: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Serve a read-only query from the response cache when enabled"""
+        if self.cache is None:
+            return loader()
+        return self.cache.get_or_load(group, key, loader, cache_if)
+    
+    def _invalidate(self, operation: str):
+        if self.cache is not None:
+            self.cache.invalidate_for(operation)
+    
     def get_system_info(self) -> DeviceInfo:
         """Get device system information"""
-        data = self._make_request("system/info")
+        data = self._cached("system/info", "", lambda: self._make_request("system/info"))
         return DeviceInfo(
             device=data["device"],
             model=data["model"],
@@ -150,10 +514,13 @@ class AIROSClient:
         """
         start_time = time.time()
         
-        data = self._make_request("execute", "POST", {
-            "command": command,
-            "timeout": timeout
-        })
+        payload = {"command": command, "timeout": timeout}
+        snapshot_id = getattr(self.journal, "snapshot_id", None)
+        if snapshot_id:
+            payload["snapshotId"] = snapshot_id
+        
+        data = self._make_request("execute", "POST", payload,
+                                  timeout=timeout / 1000 + self.request_timeout)
         
         execution_time = time.time() - start_time
         
@@ -165,6 +532,56 @@ class AIROSClient:
             execution_time=execution_time
         )
     
+    def execute_batch(self, commands: List[Union[str, Dict]], parallel: bool = False,
+                      stop_on_error: bool = False, timeout: int = 5000) -> List[CommandResult]:
+        """
+        Execute several shell commands in one round trip
+        
+        The ROM service ignores "in_waydroid" overrides, as it runs on the
+        device itself.
+        
+        Args:
+            commands: Command strings, or dicts with "command" and optional
+                      "timeout" (ms) and "in_waydroid" overrides
+            parallel: Run commands concurrently instead of in order
+            stop_on_error: Skip the remaining commands after the first failure
+            timeout: Default per-command timeout in milliseconds
+            
+        Returns:
+            One CommandResult per command, in request order
+        """
+        data = self._make_request(
+            "execute_batch", "POST",
+            batch_payload(commands, parallel, stop_on_error, timeout),
+            timeout=batch_http_timeout(commands, timeout, self.request_timeout)
+        )
+        return batch_results(data)
+    
+    def execute_stream(self, command: str, timeout: int = 30000,
+                       in_waydroid: bool = False) -> Iterator[OutputChunk]:
+        """
+        Execute a long-running command and yield its output as it is produced
+        
+        Args:
+            command: Shell command to execute
+            timeout: Timeout in milliseconds
+            in_waydroid: Run inside the Waydroid container (Linux agent only;
+                         the ROM service runs on the device itself)
+            
+        Yields:
+            stdout/stderr OutputChunks, then one "exit" chunk with the exit code
+        """
+        url = f"{self.base_url}/execute_stream"
+        payload = {"command": command, "timeout": timeout, "in_waydroid": in_waydroid}
+        
+        with self.session.post(url, json=payload, stream=True,
+                               timeout=(self.request_timeout,
+                                        timeout / 1000 + self.request_timeout)) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield output_chunk(json.loads(line))
+    
     def execute_as_root(self, command: str, timeout: int = 5000) -> CommandResult:
         """Execute command with root privileges"""
         return self.execute_command(f"su -c '{command}'", timeout)
@@ -196,29 +613,61 @@ class AIROSClient:
     
     # Snapshot and Rollback Methods
     
-    def create_snapshot(self, name: str = "manual") -> str:
+    def create_snapshot(self, name: str = "manual", lazy: bool = False) -> str:
         """
         Create a system snapshot for rollback
         
+        A full snapshot covers system properties and running services only;
+        rolling back to it does not restore installed packages.
+        
+        A lazy snapshot captures nothing up front: the agent records how to
+        undo each command run through execute_command inside journaling()
+        for it, until the snapshot is released or rolled back. Commands run
+        outside it (or by other clients) are not rolled back with it.
+        Release it once it is no longer needed.
+        
         Args:
             name: Snapshot name/description
+            lazy: Journal changes instead of capturing full state
             
         Returns:
             Snapshot ID
         """
-        data = self._make_request("snapshot", "POST", {"name": name})
+        payload = {"name": name, "mode": "lazy"} if lazy else {"name": name}
+        data = self._make_request("snapshot", "POST", payload)
         
         if data.get("success"):
             snapshot_id = data["snapshotId"]
-            logger.info(f"Created snapshot: {snapshot_id}")
+            logger.info(f"Created {data.get('mode', 'full')} snapshot: {snapshot_id}")
             return snapshot_id
         else:
             raise Exception("Failed to create snapshot")
     
+    @contextmanager
+    def journaling(self, snapshot_id: Optional[str]) -> Iterator[None]:
+        """Journal this thread's execute_command calls into a lazy snapshot"""
+        previous = getattr(self.journal, "snapshot_id", None)
+        self.journal.snapshot_id = snapshot_id
+        try:
+            yield
+        finally:
+            self.journal.snapshot_id = previous
+    
+    def release_snapshot(self, snapshot_id: str) -> bool:
+        """Discard a lazy snapshot's undo journal once it is no longer needed"""
+        try:
+            data = self._make_request("snapshot/release", "POST", {"snapshotId": snapshot_id})
+        except Exception as e:
+            logger.warning(f"Could not release snapshot {snapshot_id}: {e}")
+            return False
+        return data.get("success", False)
+    
     def rollback(self, snapshot_id: str) -> bool:
         """
         Rollback system to a previous snapshot
         
+        Fails if any entry of the snapshot could not be restored.
+        
         Args:
             snapshot_id: ID of snapshot to restore
             
@@ -226,6 +675,7 @@ class AIROSClient:
             Success status
         """
         data = self._make_request("rollback", "POST", {"snapshotId": snapshot_id})
+        self._invalidate("rollback")
         
         success = data.get("success", False)
         if success:
@@ -239,8 +689,8 @@ class AIROSClient:
     
     def list_apps(self) -> List[Dict]:
         """List all installed applications"""
-        data = self._make_request("apps/list")
-        return data.get("apps", [])
+        data = self._cached("apps/list", "", lambda: self._make_request("apps/list"))
+        return list(data.get("apps", []))
     
     def modify_app(self, package_name: str, modification: str) -> bool:
         """
@@ -257,17 +707,20 @@ class AIROSClient:
             "packageName": package_name,
             "modification": modification
         })
+        self._invalidate("modify_app")
         
         return data.get("success", False)
     
     def install_app(self, apk_path: str) -> bool:
         """Install an APK file"""
         result = self.execute_command(f"pm install -r {apk_path}")
+        self._invalidate("install_app")
         return result.success
     
     def uninstall_app(self, package_name: str) -> bool:
         """Uninstall an application"""
         result = self.execute_command(f"pm uninstall {package_name}")
+        self._invalidate("uninstall_app")
         return result.success
     
     # Service Management Methods
@@ -310,33 +763,61 @@ class AIROSClient:
     
     def dump_system_service(self, service: str) -> str:
         """Dump information from a system service"""
-        result = self.execute_command(f"dumpsys {service}")
+        result = self._cached(
+            "dumpsys", service,
+            lambda: self.execute_command(f"dumpsys {service}"),
+            cache_if=lambda r: r.success
+        )
         return result.output
     
     # WebSocket Real-time Monitoring
     
     def start_monitoring(self, on_message: Optional[Callable] = None,
-                        on_error: Optional[Callable] = None):
+                        on_error: Optional[Callable] = None,
+                        reconnect: bool = True, max_backoff: float = 30.0,
+                        workers: int = 4, queue_size: int = 1000,
+                        overflow: str = "drop_oldest"):
         """
         Start WebSocket connection for real-time monitoring
         
+        The connection is re-established with exponential backoff when it
+        drops. Each reconnect re-authenticates, re-subscribes every event type
+        in event_handlers and resumes after the last sequence number seen, so
+        events published during the gap are delivered once.
+        
+        Callbacks run on an EventDispatcher pool, so a slow handler does not
+        stall the socket; see dispatcher.stats() for per-handler latency.
+        
         Args:
             on_message: Callback for incoming messages
             on_error: Callback for errors
+            reconnect: Reconnect after the connection drops
+            max_backoff: Upper bound in seconds for the reconnect delay
+            workers: Handler threads
+            queue_size: Events queued per event type before overflow applies
+            overflow: "drop_oldest" or "block"
         """
         def _on_message(ws, message):
             try:
                 data = json.loads(message)
                 logger.debug(f"WebSocket message: {data}")
                 
+                if data.get("action") == "resume":
+                    self._on_resume(data)
+                elif "seq" in data and not data.get("snapshot"):
+                    if self._restarted(data):
+                        self.last_seq, self.epoch = 0, data["epoch"]
+                    if self.last_seq is not None and data["seq"] <= self.last_seq:
+                        return  # Already delivered before the reconnect
+                    self.last_seq = data["seq"]
+                
                 if on_message:
-                    on_message(data)
+                    self.dispatcher.dispatch("*", [on_message], data)
                 
                 # Dispatch to event handlers
                 event_type = data.get("eventType")
                 if event_type in self.event_handlers:
-                    for handler in self.event_handlers[event_type]:
-                        handler(data)
+                    self.dispatcher.dispatch(event_type, self.event_handlers[event_type], data)
                         
             except json.JSONDecodeError:
                 logger.error(f"Invalid JSON message: {message}")
@@ -348,34 +829,76 @@ class AIROSClient:
         
         def _on_open(ws):
             logger.info("WebSocket connection opened")
+            self._backoff = 1.0
             # Send authentication
             ws.send(json.dumps({
                 "action": "authenticate",
                 "token": self.auth_token
             }))
+            # Restore subscriptions lost with the previous connection
+            for event_type in list(self.event_handlers):
+                ws.send(json.dumps({
+                    "action": "subscribe",
+                    "eventType": event_type
+                }))
         
-        def _on_close(ws):
+        def _on_close(ws, *args):
             logger.info("WebSocket connection closed")
         
-        self.ws_app = WebSocketApp(
-            self.ws_url,
-            on_message=_on_message,
-            on_error=_on_error,
-            on_open=_on_open,
-            on_close=_on_close
-        )
+        def _run():
+            while not self._monitor_stop.is_set():
+                url = self.ws_url
+                if self.last_seq is not None:
+                    url = f"{self.ws_url}/?since={self.last_seq}"
+                    if self.epoch:
+                        url += f"&epoch={self.epoch}"
+                
+                self.ws_app = WebSocketApp(
+                    url,
+                    on_message=_on_message,
+                    on_error=_on_error,
+                    on_open=_on_open,
+                    on_close=_on_close
+                )
+                self.ws_app.run_forever(ping_interval=30, ping_timeout=10)
+                
+                if not reconnect:
+                    break
+                logger.info(f"Reconnecting in {self._backoff:.0f}s")
+                self._monitor_stop.wait(self._backoff)
+                self._backoff = min(self._backoff * 2, max_backoff)
         
-        self.ws_thread = threading.Thread(target=self.ws_app.run_forever)
+        self._monitor_stop.clear()
+        self._backoff = 1.0
+        self.dispatcher = EventDispatcher(workers, queue_size, overflow)
+        self.ws_thread = threading.Thread(target=_run)
         self.ws_thread.daemon = True
         self.ws_thread.start()
         
         logger.info("Started real-time monitoring")
     
+    def _on_resume(self, data: Dict):
+        """Set the replay cursor from the agent's greeting"""
+        if self.last_seq is None:
+            self.last_seq = data.get("seq")
+        elif self._restarted(data) or data.get("seq", 0) < self.last_seq:
+            # Agent restarted and numbers from 1 again; take its whole backlog
+            self.last_seq = 0
+        self.epoch = data.get("epoch", self.epoch)
+        if data.get("status") == "gap":
+            logger.warning(f"Events after seq {data.get('since')} were lost while disconnected")
+    
+    def _restarted(self, data: Dict) -> bool:
+        """Whether a message comes from a later run of the agent than the cursor"""
+        return self.epoch is not None and data.get("epoch", self.epoch) != self.epoch
+    
     def stop_monitoring(self):
         """Stop WebSocket monitoring"""
         if self.ws_app:
+            self._monitor_stop.set()
             self.ws_app.close()
             self.ws_thread.join(timeout=5)
+            self.dispatcher.shutdown()
             logger.info("Stopped real-time monitoring")
     
     def subscribe_to_event(self, event_type: str, handler: Callable):
@@ -391,8 +914,8 @@ class AIROSClient:
         
         self.event_handlers[event_type].append(handler)
         
-        # Send subscription request
-        if self.ws_app:
+        # Send subscription request; a later reconnect re-sends it
+        if self.ws_app and self.ws_app.sock and self.ws_app.sock.connected:
             self.ws_app.send(json.dumps({
                 "action": "subscribe",
                 "eventType": event_type
@@ -413,14 +936,18 @@ class AIROSClient:
             Result of the operation
         """
         # Create snapshot
-        snapshot_id = self.create_snapshot(f"before_{operation.__name__}")
+        lazy = self.snapshot_mode == "lazy"
+        snapshot_id = self.create_snapshot(f"before_{operation.__name__}", lazy=lazy)
         
         try:
             # Execute operation
-            result = operation(*args, **kwargs)
+            with self.journaling(snapshot_id if lazy else None):
+                result = operation(*args, **kwargs)
             
             # If successful, return result
             logger.info(f"Operation {operation.__name__} completed successfully")
+            if lazy:
+                self.release_snapshot(snapshot_id)
             return result
             
         except Exception as e:
@@ -460,17 +987,21 @@ class AIROSClient:
         }
         
         # Create snapshot before experiment
-        snapshot_id = self.create_snapshot(f"experiment_{name}")
+        lazy = self.snapshot_mode == "lazy"
+        snapshot_id = self.create_snapshot(f"experiment_{name}", lazy=lazy)
         
         try:
-            # Setup phase
-            logger.info("Running setup...")
-            setup()
-            
-            # Test phase
-            logger.info("Running test...")
-            results["output"] = test()
+            with self.journaling(snapshot_id if lazy else None):
+                # Setup phase
+                logger.info("Running setup...")
+                setup()
+                
+                # Test phase
+                logger.info("Running test...")
+                results["output"] = test()
             results["success"] = True
+            if lazy:
+                self.release_snapshot(snapshot_id)
             
         except Exception as e:
             logger.error(f"Experiment failed: {e}")
@@ -6,28 +6,38 @@ Provides deep system integration for Linux phones with Android app support
 
 import os
 import sys
-import json
 import time
 import shutil
+import re
 import hashlib
-import sqlite3
 import asyncio
 import logging
 import subprocess
+import shlex
 import tempfile
+import zipfile
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, asdict
-from enum import Enum
-from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Set, Tuple, Callable
+from dataclasses import dataclass, asdict, replace
+from collections import OrderedDict
 
 import aiohttp
 from aiohttp import web
-import dbus
-import psutil
 import yaml
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+
+from command_runner import CommandSpec, run_command, write_ndjson
+from event_bus import EventBus
+import dex_index
+import microg_coverage
+from microg_coverage import CoverageDecision
+from pm_batch import PmBatch, PmResult
+from airos_core import (
+    AppFixType, AppIssue, AppFix, AndroidBackend, AgentCore, IssueStore, load_config, download_apk
+)
+from logcat_ingest import (
+    LogcatEvent, LogcatIngester, PidPackageIndex,
+    LOGCAT_BUFFERS, LOGCAT_FILTERS, IDLE_FLUSH_SECONDS
+)
 
 # Configure logging
 logging.basicConfig(
@@ -36,41 +46,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger('AIROS-Linux')
 
+# Line numbers, PIDs and addresses that vary between otherwise identical crashes
+_SIGNATURE_NUMBERS = re.compile(r'0x[0-9a-fA-F]+|\d+')
 
-class AppFixType(Enum):
-    """Types of app fixes that can be applied"""
-    PERMISSION = "permission"
-    LIBRARY = "library"
-    SERVICE = "service"
-    SIGNATURE = "signature"
-    FRAMEWORK = "framework"
-    NATIVE = "native"
-
-
-@dataclass
-class AppIssue:
-    """Detected app compatibility issue"""
-    package_name: str
-    issue_type: AppFixType
-    description: str
-    stack_trace: Optional[str] = None
-    missing_component: Optional[str] = None
-    severity: str = "medium"
-
-
-@dataclass
-class AppFix:
-    """Applied fix for app compatibility"""
-    issue: AppIssue
-    fix_type: str
-    patch_data: Dict[str, Any]
-    success: bool
-    timestamp: float
+# MicroG artifacts and where they go in the Waydroid system image; the
+# release asset each comes from and its SHA-256 are pinned per version
+# in the config (microg.releases)
+MICROG_ARTIFACTS = {
+    "GmsCore.apk": "priv-app/GmsCore"
+}
+MICROG_MIRROR = "https://github.com/microg/GmsCore/releases/download/v{version}/{name}"
+CHUNK_SIZE = 1 << 20
 
 
-class WaydroidManager:
+class WaydroidManager(AndroidBackend):
     """Manages Waydroid Android container"""
     
+    name = "waydroid"
+    
     def __init__(self):
         self.waydroid_path = Path("/var/lib/waydroid")
         self.apps_path = self.waydroid_path / "data" / "app"
@@ -164,6 +157,18 @@ class WaydroidManager:
         except subprocess.CalledProcessError:
             return {}
     
+    def apk_paths(self, package_name: str) -> List[Path]:
+        """Host paths of an installed app's base and split APKs"""
+        success, output = self.execute_shell(f"pm path {shlex.quote(package_name)}")
+        if not success:
+            return []
+        
+        # pm path prints container paths such as package:/data/app/<dir>/base.apk
+        return [
+            self.waydroid_path / line[len("package:/"):].strip()
+            for line in output.splitlines() if line.startswith("package:/")
+        ]
+    
     def execute_shell(self, command: str) -> Tuple[bool, str]:
         """Execute shell command in Waydroid"""
         try:
@@ -178,67 +183,193 @@ class WaydroidManager:
             return False, e.stderr
 
 
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_matches(path: Path, sha256: str) -> bool:
+    """Whether a file exists with the given SHA-256"""
+    return path.is_file() and file_sha256(path) == sha256.lower()
+
+
+def write_hashing(dest, digest, chunk: bytes):
+    digest.update(chunk)
+    dest.write(chunk)
+
+
+def copy_hashing(source: Path, dest, digest):
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            dest.write(chunk)
+
+
+def install_file(source: Path, target: Path):
+    """
+    Copy next to the target, then rename over it so it is never half written
+
+    The system image is root-owned, so this goes through sudo like the
+    chmod of its directories; the file itself gets mode 644.
+    """
+    staging = target.with_name(f".{target.name}.airos-tmp")
+    try:
+        subprocess.run(["sudo", "install", "-D", "-m", "644", str(source), str(staging)], check=True)
+        subprocess.run(["sudo", "mv", "-f", str(staging), str(target)], check=True)
+    except Exception:
+        subprocess.run(["sudo", "rm", "-f", str(staging)])
+        raise
+
+
+async def read_source(source: str) -> bytes:
+    """Contents of a URL or local path"""
+    if source.startswith(("http://", "https://")):
+        async with aiohttp.ClientSession() as session:
+            async with session.get(source) as resp:
+                resp.raise_for_status()
+                return await resp.read()
+    return await asyncio.to_thread(Path(source).read_bytes)
+
+
 class MicroGManager:
     """Manages MicroG services for Google Services compatibility"""
     
-    def __init__(self, waydroid_mgr: WaydroidManager):
+    def __init__(self, waydroid_mgr: WaydroidManager, config: Optional[Dict] = None):
+        config = config or {}
         self.waydroid = waydroid_mgr
-        self.microg_repo = "https://github.com/microg/GmsCore/releases"
+        self.version = config.get('version', microg_coverage.LATEST)
+        self.mirror = config.get('mirror', MICROG_MIRROR)
+        self.cache_dir = Path(config.get('cache_dir', "/var/cache/airos/microg")) / self.version
+        self.releases = config.get('releases') or {}
+        self.install_lock = asyncio.Lock()
         self.config_path = Path("/etc/airos/microg.yml")
+    
+    async def install_microg(self) -> bool:
+        """
+        Install MicroG in Waydroid
         
-    def install_microg(self) -> bool:
-        """Install MicroG in Waydroid"""
-        try:
-            # Download latest MicroG APKs
-            apks = [
-                "GmsCore.apk",
-                "GsfProxy.apk",
-                "FakeStore.apk",
-                "com.google.android.maps.jar"
-            ]
-            
-            temp_dir = tempfile.mkdtemp()
-            for apk in apks:
-                # Download APK (simplified - would need proper release fetching)
-                apk_path = Path(temp_dir) / apk
-                # subprocess.run(["wget", f"{self.microg_repo}/latest/{apk}", "-O", str(apk_path)])
+        Idempotent: artifacts already in place with the expected SHA-256 are
+        left alone. The rest come from the local cache, or from the mirror
+        into the cache, are verified, then copied into the system image
+        concurrently and given their permissions in one batch, all as root.
+        """
+        async with self.install_lock:
+            try:
+                hashes = await self.expected_hashes()
+                targets = {name: self.waydroid.system_path / subdir / name
+                           for name, subdir in MICROG_ARTIFACTS.items()}
                 
-                # Install as system app
-                self.install_system_app(apk_path)
-            
-            # Enable signature spoofing
-            self.enable_signature_spoofing()
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to install MicroG: {e}")
-            return False
+                current = await asyncio.gather(*[
+                    asyncio.to_thread(file_matches, target, hashes[name])
+                    for name, target in targets.items()
+                ])
+                stale = [name for name, ok in zip(targets, current) if not ok]
+                if not stale:
+                    logger.info(f"MicroG {self.version} already installed")
+                    return True
+                
+                await asyncio.to_thread(self.cache_dir.mkdir, parents=True, exist_ok=True)
+                async with aiohttp.ClientSession() as session:
+                    cached = await asyncio.gather(*[
+                        self.fetch_artifact(session, name, hashes[name]) for name in stale
+                    ])
+                
+                await asyncio.gather(*[
+                    asyncio.to_thread(install_file, source, targets[name])
+                    for name, source in zip(stale, cached)
+                ])
+                
+                # One chmod (755) for every directory that got a new file
+                await asyncio.to_thread(
+                    subprocess.run,
+                    ["sudo", "chmod", "u=rwx,go=rx"] + sorted({str(targets[name].parent) for name in stale}),
+                    check=True
+                )
+                logger.info(f"Installed MicroG {self.version}: {', '.join(stale)}")
+                
+                # Enable signature spoofing
+                self.enable_signature_spoofing()
+                
+                return True
+                
+            except Exception as e:
+                logger.error(f"Failed to install MicroG: {e}")
+                return False
+    
+    def artifact(self, name: str) -> Tuple[str, Optional[str]]:
+        """(release asset, pinned SHA-256 or None) of an artifact in this version"""
+        pinned = (self.releases.get(self.version) or {}).get(name) or {}
+        return pinned.get('asset', name), pinned.get('sha256')
+    
+    def remote(self) -> bool:
+        return self.mirror.startswith(("http://", "https://"))
+    
+    async def expected_hashes(self) -> Dict[str, str]:
+        """
+        SHA-256 per artifact, pinned for this version in the config
+        
+        A local mirror may vouch for its files with a SHA256SUMS next to
+        them. A remote one may not: checksums fetched from the same place
+        as the files verify nothing, so unpinned remote artifacts are refused.
+        """
+        hashes = {}
+        for name in MICROG_ARTIFACTS:
+            _, sha256 = self.artifact(name)
+            if sha256:
+                hashes[name] = sha256.lower()
+        
+        if len(hashes) < len(MICROG_ARTIFACTS) and not self.remote():
+            sums = {}
+            for line in (await read_source(self.artifact_url("SHA256SUMS"))).decode().splitlines():
+                digest, _, asset = line.strip().partition(" ")
+                sums[asset.strip().lstrip("*")] = digest.lower()
+            for name in MICROG_ARTIFACTS:
+                asset, _ = self.artifact(name)
+                if name not in hashes and asset in sums:
+                    hashes[name] = sums[asset]
+        
+        missing = set(MICROG_ARTIFACTS) - set(hashes)
+        if missing:
+            raise ValueError(f"No pinned SHA-256 for {', '.join(sorted(missing))} of microG "
+                             f"{self.version} (microg.releases); refusing to install")
+        return hashes
     
-    def install_system_app(self, apk_path: Path) -> bool:
-        """Install APK as system app with elevated privileges"""
+    def artifact_url(self, asset: str) -> str:
+        return self.mirror.format(version=self.version, name=asset)
+    
+    async def fetch_artifact(self, session: aiohttp.ClientSession, name: str, sha256: str) -> Path:
+        """Verified cache path of an artifact, downloading or copying it from the mirror if needed"""
+        cached = self.cache_dir / name
+        if await asyncio.to_thread(file_matches, cached, sha256):
+            return cached
+        
+        # A private partial file, so concurrent installs never truncate each other's
+        fd, partial = await asyncio.to_thread(
+            tempfile.mkstemp, dir=self.cache_dir, prefix=f".{name}.", suffix=".part"
+        )
+        partial = Path(partial)
+        digest = hashlib.sha256()
+        source = self.artifact_url(self.artifact(name)[0])
         try:
-            # Extract APK
-            extract_dir = tempfile.mkdtemp()
-            subprocess.run(["unzip", str(apk_path), "-d", extract_dir], check=True)
-            
-            # Copy to Waydroid system
-            system_app_path = self.waydroid.system_path / "priv-app" / apk_path.stem
-            system_app_path.mkdir(parents=True, exist_ok=True)
-            
-            shutil.copy(apk_path, system_app_path / apk_path.name)
+            with os.fdopen(fd, 'wb') as f:
+                if source.startswith(("http://", "https://")):
+                    async with session.get(source) as resp:
+                        resp.raise_for_status()
+                        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                            await asyncio.to_thread(write_hashing, f, digest, chunk)
+                else:
+                    await asyncio.to_thread(copy_hashing, Path(source), f, digest)
             
-            # Set permissions
-            subprocess.run([
-                "sudo", "chmod", "644",
-                str(system_app_path / apk_path.name)
-            ], check=True)
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to install system app: {e}")
-            return False
+            if digest.hexdigest() != sha256.lower():
+                raise ValueError(f"{name} from {source} does not match its SHA-256")
+            await asyncio.to_thread(partial.replace, cached)
+        finally:
+            await asyncio.to_thread(partial.unlink, missing_ok=True)
+        
+        return cached
     
     def enable_signature_spoofing(self) -> bool:
         """Enable signature spoofing for MicroG"""
@@ -256,120 +387,87 @@ class MicroGManager:
             logger.error(f"Failed to enable signature spoofing: {e}")
             return False
     
-    def configure_services(self, config: Dict) -> bool:
-        """Configure MicroG services"""
+    def installed_version(self) -> Optional[str]:
+        """Version name of the installed GmsCore, None if microG is not installed"""
+        version = self.waydroid.get_app_info(microg_coverage.MICROG_PACKAGE).get("version")
+        return version if version and version != "unknown" else None
+    
+    def coverage_decision(self, apis: List[str]) -> CoverageDecision:
+        """Whether the installed (or to be installed) GmsCore covers these GMS APIs"""
+        return microg_coverage.decide(apis, self.installed_version(), self.version)
+    
+    async def enable(self, decision: CoverageDecision) -> bool:
+        """Install MicroG if it is missing and make sure GmsCore is enabled"""
+        if decision.installed_version is None and not await self.install_microg():
+            return False
+        success, _ = await asyncio.to_thread(
+            self.waydroid.execute_shell, f"pm enable {microg_coverage.MICROG_PACKAGE}"
+        )
+        return success
+    
+    def configure_services(self, config: Dict) -> Tuple[bool, List[PmResult]]:
+        """Configure MicroG services; every service is enabled, or none is"""
         try:
             # Write configuration
             with open(self.config_path, 'w') as f:
                 yaml.dump(config, f)
             
-            # Apply settings via shell commands
+            # Apply settings in one shell invocation
+            batch = PmBatch(atomic=True)
             for service, enabled in config.get('services', {}).items():
                 if enabled:
-                    self.waydroid.execute_shell(
-                        f"pm enable com.google.android.gms/{service}"
-                    )
+                    batch.enable(f"{microg_coverage.MICROG_PACKAGE}/{service}")
+            results = batch.run(self.waydroid)
             
-            return True
+            return all(r.success for r in results), results
             
         except Exception as e:
             logger.error(f"Failed to configure MicroG: {e}")
-            return False
+            return False, []
 
 
-class AppCompatibilityFixer:
-    """AI-powered app compatibility fixing system"""
+class CrashAnalyzer:
+    """Base class for pluggable crash-analysis backends"""
     
-    def __init__(self, waydroid_mgr: WaydroidManager):
-        self.waydroid = waydroid_mgr
-        self.fixes_db = Path("/var/lib/airos/app_fixes.db")
-        self.patches_dir = Path("/var/lib/airos/patches")
-        self.patches_dir.mkdir(parents=True, exist_ok=True)
-        
-        self.init_database()
-        
-    def init_database(self):
-        """Initialize fixes database"""
-        conn = sqlite3.connect(self.fixes_db)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS app_issues (
-                id INTEGER PRIMARY KEY,
-                package_name TEXT,
-                issue_type TEXT,
-                description TEXT,
-                stack_trace TEXT,
-                missing_component TEXT,
-                severity TEXT,
-                detected_at TIMESTAMP,
-                fixed BOOLEAN DEFAULT FALSE
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS app_fixes (
-                id INTEGER PRIMARY KEY,
-                issue_id INTEGER,
-                fix_type TEXT,
-                patch_data TEXT,
-                success BOOLEAN,
-                applied_at TIMESTAMP,
-                FOREIGN KEY (issue_id) REFERENCES app_issues(id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+    name = "base"
     
-    async def monitor_app_crashes(self):
-        """Monitor Waydroid logs for app crashes"""
-        log_monitor = subprocess.Popen(
-            ["waydroid", "logcat", "-b", "crash"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+    async def analyze_batch(self, crashes: List[str]) -> List[Optional[AppIssue]]:
+        """
+        Classify several crash logs in one call
         
-        while True:
-            line = log_monitor.stdout.readline()
-            if not line:
-                break
-                
-            if "FATAL EXCEPTION" in line or "AndroidRuntime" in line:
-                # Capture crash details
-                crash_data = await self.capture_crash_context(log_monitor)
-                
-                # Analyze crash
-                issue = self.analyze_crash(crash_data)
-                
-                if issue:
-                    # Store issue
-                    self.store_issue(issue)
-                    
-                    # Attempt automatic fix
-                    fix = await self.auto_fix_issue(issue)
-                    
-                    if fix and fix.success:
-                        logger.info(f"Successfully fixed {issue.package_name}: {issue.description}")
-                    else:
-                        logger.warning(f"Could not auto-fix {issue.package_name}: {issue.description}")
-    
-    async def capture_crash_context(self, log_process) -> str:
-        """Capture full crash context from logcat"""
-        crash_lines = []
-        for _ in range(100):  # Capture next 100 lines
-            line = log_process.stdout.readline()
-            if not line:
-                break
-            crash_lines.append(line)
-        return '\n'.join(crash_lines)
+        Args:
+            crashes: Captured crash contexts
+            
+        Returns:
+            One AppIssue (or None when unclassified) per crash, in order;
+            crashes past the end of a short list got no answer
+            
+        Raises:
+            Any exception when the backend could not be reached; nothing
+            from a failed call is cached
+        """
+        raise NotImplementedError
     
-    def analyze_crash(self, crash_data: str) -> Optional[AppIssue]:
-        """Analyze crash data to identify the issue"""
+    async def close(self):
+        """Release backend resources"""
+        pass
+
+
+class RuleBasedAnalyzer(CrashAnalyzer):
+    """String-matching analyzer for known crash signatures"""
+    
+    name = "rules"
+    
+    def analyze(self, crash_data: str, package_name: Optional[str] = None) -> Optional[AppIssue]:
+        """
+        Analyze crash data to identify the issue
+        
+        Args:
+            crash_data: Captured crash, tombstone or ANR lines
+            package_name: Package the crash was attributed to, if known
+        """
         lines = crash_data.splitlines()
         
-        package_name = None
         issue_type = None
         description = None
         missing_component = None
@@ -377,7 +475,7 @@ class AppCompatibilityFixer:
         for line in lines:
             # Extract package name
             if "Process:" in line:
-                package_name = line.split("Process:")[1].strip().split()[0]
+                package_name = package_name or line.split("Process:")[1].strip().split()[0].rstrip(",")
             
             # Detect missing library
             elif "UnsatisfiedLinkError" in line or "couldn't find" in line:
@@ -391,6 +489,22 @@ class AppCompatibilityFixer:
                 issue_type = AppFixType.SERVICE
                 description = "Missing or incompatible service"
             
+            # Detect ANR while a service was starting
+            elif "Reason: executing service" in line:
+                issue_type = AppFixType.SERVICE
+                description = "Service timed out (ANR)"
+            
+            # Detect native crash from a tombstone
+            elif "signal " in line and "(SIG" in line:
+                issue_type = AppFixType.NATIVE
+                description = "Native crash"
+            
+            # Faulting library is the top backtrace frame
+            elif "#00 pc " in line and issue_type == AppFixType.NATIVE:
+                frame = line.split("#00 pc ")[1].split()
+                if len(frame) > 1:
+                    missing_component = frame[1].rsplit("/", 1)[-1]
+            
             # Detect permission issue
             elif "SecurityException" in line or "Permission denied" in line:
                 issue_type = AppFixType.PERMISSION
@@ -408,32 +522,360 @@ class AppCompatibilityFixer:
                 description=description,
                 stack_trace=crash_data[:1000],  # Limit stack trace size
                 missing_component=missing_component,
-                severity="high" if "FATAL" in crash_data else "medium"
+                severity="high" if "FATAL" in crash_data or issue_type == AppFixType.NATIVE else "medium"
             )
         
         return None
     
-    def store_issue(self, issue: AppIssue):
-        """Store detected issue in database"""
-        conn = sqlite3.connect(self.fixes_db)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO app_issues 
-            (package_name, issue_type, description, stack_trace, missing_component, severity, detected_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            issue.package_name,
-            issue.issue_type.value,
-            issue.description,
-            issue.stack_trace,
-            issue.missing_component,
-            issue.severity,
-            time.time()
-        ))
-        
-        conn.commit()
-        conn.close()
+    async def analyze_batch(self, crashes: List[str]) -> List[Optional[AppIssue]]:
+        return [self.analyze(crash_data) for crash_data in crashes]
+
+
+class LocalHTTPAnalyzer(CrashAnalyzer):
+    """
+    Crash analyzer backed by a local inference server
+    
+    The server receives {"crashes": [{"signature": ..., "log": ...}, ...]} and
+    answers {"results": [...]} with one entry per crash, either null or an
+    object with package_name, issue_type (an AppFixType value), description
+    and optional missing_component/severity.
+    """
+    
+    name = "http"
+    
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session: Optional[aiohttp.ClientSession] = None
+    
+    async def analyze_batch(self, crashes: List[str]) -> List[Optional[AppIssue]]:
+        if self.session is None:
+            self.session = aiohttp.ClientSession(timeout=self.timeout)
+        
+        payload = {
+            "crashes": [
+                {"signature": CrashAnalysisPipeline.crash_signature(c), "log": c}
+                for c in crashes
+            ]
+        }
+        
+        try:
+            async with self.session.post(self.url, json=payload) as resp:
+                resp.raise_for_status()
+                results = (await resp.json()).get("results", [])
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Crash analysis backend failed: {e}")
+            raise
+        
+        return [self._parse_result(crash_data, result) for crash_data, result in zip(crashes, results)]
+    
+    def _parse_result(self, crash_data: str, result: Optional[Dict]) -> Optional[AppIssue]:
+        """Convert one backend result into an AppIssue"""
+        if not result or not result.get("package_name"):
+            return None
+        
+        try:
+            issue_type = AppFixType(result.get("issue_type"))
+        except ValueError:
+            logger.warning(f"Backend returned unknown issue type: {result.get('issue_type')}")
+            return None
+        
+        return AppIssue(
+            package_name=result["package_name"],
+            issue_type=issue_type,
+            description=result.get("description") or "Issue identified by crash model",
+            stack_trace=crash_data[:1000],
+            missing_component=result.get("missing_component"),
+            severity=result.get("severity", "medium")
+        )
+    
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+
+class CrashAnalysisPipeline:
+    """
+    Rule fast path in front of a batched, cached model backend
+    
+    Known signatures are handled by RuleBasedAnalyzer. Novel crashes are
+    cached by signature and queued until batch_size crashes are pending or
+    batch_window seconds have passed, then sent to the backend in one call.
+    """
+    
+    def __init__(self, rules: Optional[RuleBasedAnalyzer] = None,
+                 backend: Optional[CrashAnalyzer] = None,
+                 batch_size: int = 8, batch_window: float = 0.5,
+                 cache_size: int = 512):
+        self.rules = rules or RuleBasedAnalyzer()
+        self.backend = backend
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.cache_size = cache_size
+        
+        self.cache: "OrderedDict[str, Optional[AppIssue]]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.pending: List[Tuple[str, str]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.flush_tasks: Set[asyncio.Task] = set()
+        self.stats = {
+            "rule_hits": 0,
+            "cache_hits": 0,
+            "model_calls": 0,
+            "model_crashes": 0
+        }
+    
+    @staticmethod
+    def crash_signature(crash_data: str, package_name: Optional[str] = None) -> str:
+        """Stable signature of a crash: package, exceptions and top frames"""
+        parts = [package_name] if package_name else []
+        frames = 0
+        
+        for line in crash_data.splitlines():
+            # Drop the threadtime prefix (date, time, pid, tid, priority)
+            message = line.split(": ", 1)[1] if ": " in line else line
+            message = message.strip()
+            
+            if message.startswith("Process:"):
+                parts.append(message.split(",")[0])
+            elif message.startswith(("at ", "#")) and frames < 8:
+                parts.append(_SIGNATURE_NUMBERS.sub("#", message))
+                frames += 1
+            elif "Exception" in message or "Error" in message or "signal " in message:
+                parts.append(_SIGNATURE_NUMBERS.sub("#", message))
+        
+        return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+    
+    async def analyze(self, crash_data: str, package_name: Optional[str] = None) -> Optional[AppIssue]:
+        """Analyze one crash, consulting the model only for novel signatures"""
+        issue = self.rules.analyze(crash_data, package_name)
+        if issue:
+            self.stats["rule_hits"] += 1
+            return issue
+        if not self.backend:
+            return None
+        
+        signature = self.crash_signature(crash_data, package_name)
+        
+        if signature in self.cache:
+            self.cache.move_to_end(signature)
+            self.stats["cache_hits"] += 1
+            template = self.cache[signature]
+        elif signature in self.inflight:
+            template = await asyncio.shield(self.inflight[signature])
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.inflight[signature] = future
+            self.pending.append((signature, crash_data))
+            self._schedule_flush()
+            template = await asyncio.shield(future)
+        
+        if template is None:
+            return None
+        return replace(template, stack_trace=crash_data[:1000])
+    
+    def _schedule_flush(self):
+        """Flush now if the batch is full, otherwise after batch_window"""
+        loop = asyncio.get_running_loop()
+        
+        if len(self.pending) >= self.batch_size:
+            if self.flush_handle:
+                self.flush_handle.cancel()
+                self.flush_handle = None
+            self._start_flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.batch_window, self._start_flush)
+    
+    def _start_flush(self):
+        """Run _flush as a task the pipeline holds until it finishes"""
+        task = asyncio.get_running_loop().create_task(self._flush())
+        self.flush_tasks.add(task)
+        task.add_done_callback(self.flush_tasks.discard)
+    
+    async def _flush(self):
+        """Send every pending crash to the backend in one call"""
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch = self.pending[:self.batch_size]
+        self.pending = self.pending[self.batch_size:]
+        if not batch:
+            return
+        if self.pending:
+            self._schedule_flush()
+        
+        self.stats["model_calls"] += 1
+        self.stats["model_crashes"] += len(batch)
+        
+        try:
+            issues = await self.backend.analyze_batch([crash for _, crash in batch])
+        except Exception as e:
+            logger.error(f"Crash analysis batch failed: {e}")
+            issues = []
+        
+        # Waiters get None for crashes the backend did not answer, but only
+        # real answers are cached, so an outage is retried on the next crash
+        for i, (signature, _) in enumerate(batch):
+            issue = issues[i] if i < len(issues) else None
+            if i < len(issues):
+                self.cache[signature] = issue
+            future = self.inflight.pop(signature, None)
+            if future and not future.done():
+                future.set_result(issue)
+        
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+    
+    async def close(self):
+        if self.backend:
+            await self.backend.close()
+
+
+def build_crash_analyzer(config: Dict) -> CrashAnalysisPipeline:
+    """Build the analysis pipeline from the ai_agent.analyzer config section"""
+    backend = None
+    if config.get("backend") == "http":
+        backend = LocalHTTPAnalyzer(
+            config.get("url", "http://127.0.0.1:8090/v1/crash/analyze"),
+            timeout=config.get("timeout", 10.0)
+        )
+    
+    return CrashAnalysisPipeline(
+        backend=backend,
+        batch_size=config.get("batch_size", 8),
+        batch_window=config.get("batch_window", 0.5),
+        cache_size=config.get("cache_size", 512)
+    )
+
+
+class AppCompatibilityFixer:
+    """AI-powered app compatibility fixing system"""
+    
+    def __init__(self, waydroid_mgr: WaydroidManager, data_dir: Optional[Path] = None,
+                 analyzer: Optional[CrashAnalysisPipeline] = None,
+                 events: Optional[EventBus] = None,
+                 microg: Optional[MicroGManager] = None):
+        self.waydroid = waydroid_mgr
+        self.microg = microg
+        self.analyzer = analyzer or CrashAnalysisPipeline()
+        self.events = events
+        data_dir = data_dir or Path("/var/lib/airos")
+        self.patches_dir = data_dir / "patches"
+        self.patches_dir.mkdir(parents=True, exist_ok=True)
+        self.store = IssueStore(data_dir / "app_fixes.db")
+    
+    async def monitor_app_crashes(self):
+        """Monitor Waydroid crash, main and system logs for app crashes"""
+        index = PidPackageIndex()
+        
+        # Attribute processes that were started before ingestion began
+        success, output = self.waydroid.execute_shell("ps -A -o PID,NAME")
+        if success:
+            index.seed(output)
+        
+        log_monitor = await asyncio.create_subprocess_exec(
+            "waydroid", "logcat", "-b", LOGCAT_BUFFERS, "-v", "threadtime",
+            *LOGCAT_FILTERS,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        
+        await self.process_crash_stream(log_monitor.stdout, ingester=LogcatIngester(index))
+    
+    async def process_crash_stream(self, stream,
+                                   on_crash: Optional[Callable] = None,
+                                   ingester: Optional[LogcatIngester] = None):
+        """
+        Run the detect -> analyze -> fix pipeline over a logcat stream
+        
+        Each crash is analyzed in its own task so novel crashes can be
+        batched into a single inference call while reading continues.
+        
+        Args:
+            stream: Any object with a readline() method, sync or async,
+                producing `logcat -v threadtime` lines (live logcat pipe
+                or a recorded buffer)
+            on_crash: Optional callback invoked as
+                on_crash(sequence, event, issue, fix) for every crash
+            ingester: LogcatIngester carrying the PID index to use
+        """
+        ingester = ingester or LogcatIngester()
+        pending = set()
+        sequence = 0
+        
+        while True:
+            try:
+                line = await self._read_line(stream, timeout=IDLE_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                # Logcat went quiet, so any open crash block is complete
+                events = ingester.flush(idle=IDLE_FLUSH_SECONDS)
+            else:
+                if not line:
+                    break
+                events = ingester.feed(line)
+            
+            for event in events:
+                task = asyncio.create_task(
+                    self.handle_crash(event, sequence, on_crash)
+                )
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                sequence += 1
+        
+        for event in ingester.flush():
+            pending.add(asyncio.create_task(
+                self.handle_crash(event, sequence, on_crash)
+            ))
+            sequence += 1
+        
+        if pending:
+            await asyncio.gather(*pending)
+    
+    async def handle_crash(self, event: LogcatEvent, sequence: int = 0,
+                           on_crash: Optional[Callable] = None) -> Tuple[Optional[AppIssue], Optional[AppFix]]:
+        """Analyze one logcat crash event, then store and fix the resulting issue"""
+        self.publish("crash", {"kind": event.kind, "pid": event.pid}, event.package_name)
+        
+        issue = await self.analyzer.analyze(event.text, event.package_name)
+        fix = None
+        
+        if issue:
+            # Store issue
+            self.store.store_issue(issue)
+            self.publish("issue", {
+                "issue_type": issue.issue_type.value,
+                "description": issue.description,
+                "missing_component": issue.missing_component,
+                "severity": issue.severity
+            }, issue.package_name)
+            
+            # Attempt automatic fix
+            fix = await self.auto_fix_issue(issue)
+            
+            if fix and fix.success:
+                logger.info(f"Successfully fixed {issue.package_name}: {issue.description}")
+            else:
+                logger.warning(f"Could not auto-fix {issue.package_name}: {issue.description}")
+        
+        if on_crash:
+            on_crash(sequence, event, issue, fix)
+        
+        return issue, fix
+    
+    @staticmethod
+    async def _read_line(stream, timeout: Optional[float] = None) -> str:
+        """Read one line from a sync or asyncio stream as text"""
+        line = stream.readline()
+        if asyncio.iscoroutine(line):
+            line = await asyncio.wait_for(line, timeout)
+        if isinstance(line, bytes):
+            line = line.decode(errors='replace')
+        return line
+    
+    def analyze_crash(self, crash_data: str, package_name: Optional[str] = None) -> Optional[AppIssue]:
+        """Analyze crash data with the rule-based fast path only"""
+        return self.analyzer.rules.analyze(crash_data, package_name)
     
     async def auto_fix_issue(self, issue: AppIssue) -> Optional[AppFix]:
         """Attempt to automatically fix the detected issue"""
@@ -449,10 +891,58 @@ class AppCompatibilityFixer:
             fix = await self.fix_framework_issue(issue)
         
         if fix:
-            self.store_fix(fix)
+            self.store.store_fix(fix)
+            self.publish("fix", {
+                "issue_type": issue.issue_type.value,
+                "fix_type": fix.fix_type,
+                "success": fix.success
+            }, issue.package_name)
         
         return fix
     
+    async def fix_package(self, package_name: str) -> Tuple[List[AppIssue], List[AppFix]]:
+        """Check an installed app for known issues and fix them"""
+        issues = []
+        
+        # Check for Google Services dependency in the app's bytecode
+        apis = await self.gms_apis(package_name)
+        if apis:
+            issues.append(AppIssue(
+                package_name=package_name,
+                issue_type=AppFixType.FRAMEWORK,
+                description=f"References Google Play Services APIs: {', '.join(apis)}",
+                missing_component="com.google.android.gms",
+                severity="high"
+            ))
+        
+        return issues, await self.fix_issues(issues)
+    
+    async def gms_apis(self, package_name: str) -> List[str]:
+        """GMS/Firebase APIs referenced by an installed app's DEX files"""
+        try:
+            return await asyncio.to_thread(
+                lambda: dex_index.gms_apis(self.waydroid.apk_paths(package_name))
+            )
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            logger.warning(f"Could not index the DEX files of {package_name}: {e}")
+            return []
+    
+    async def fix_issues(self, issues: List[AppIssue]) -> List[AppFix]:
+        """Store and fix issues found without a crash (inspection or APK analysis)"""
+        fixes = []
+        for issue in issues:
+            self.store.store_issue(issue)
+            fix = await self.auto_fix_issue(issue)
+            if fix:
+                fixes.append(fix)
+        
+        return fixes
+    
+    def publish(self, topic: str, data: Dict[str, Any], package_name: Optional[str] = None):
+        """Publish to the agent event bus, if one is attached"""
+        if self.events:
+            self.events.publish(topic, data, package_name)
+    
     async def fix_missing_library(self, issue: AppIssue) -> Optional[AppFix]:
         """Fix missing native library issue"""
         if not issue.missing_component:
@@ -589,23 +1079,28 @@ class AppCompatibilityFixer:
             for line in issue.stack_trace.splitlines():
                 if "android.permission." in line:
                     perm = line.split("android.permission.")[1].split()[0]
-                    permissions_to_grant.append(f"android.permission.{perm}")
+                    if f"android.permission.{perm}" not in permissions_to_grant:
+                        permissions_to_grant.append(f"android.permission.{perm}")
             
-            # Grant permissions
+            # Grant permissions in one shell invocation; each is granted or not on its own
+            batch = PmBatch()
             for permission in permissions_to_grant:
-                success, _ = self.waydroid.execute_shell(
-                    f"pm grant {issue.package_name} {permission}"
-                )
-                
-                if success:
-                    logger.info(f"Granted {permission} to {issue.package_name}")
+                batch.grant(issue.package_name, permission)
+            results = await asyncio.to_thread(batch.run, self.waydroid)
+            
+            granted = [p for p, r in zip(permissions_to_grant, results) if r.success]
+            if granted:
+                logger.info(f"Granted {', '.join(granted)} to {issue.package_name}")
             
             if permissions_to_grant:
                 return AppFix(
                     issue=issue,
                     fix_type="grant_permissions",
-                    patch_data={"permissions": permissions_to_grant},
-                    success=True,
+                    patch_data={
+                        "permissions": permissions_to_grant,
+                        "results": {p: r.status for p, r in zip(permissions_to_grant, results)}
+                    },
+                    success=len(granted) == len(permissions_to_grant),
                     timestamp=time.time()
                 )
                 
@@ -619,7 +1114,34 @@ class AppCompatibilityFixer:
         logger.info(f"Attempting to fix framework issue for: {issue.package_name}")
         
         try:
-            # Strategy 1: Patch APK to remove Google Services dependency
+            # Strategy 1: Let microG serve the app when it covers every GMS API it uses
+            decision = None
+            apis = await self.gms_apis(issue.package_name) if self.microg else []
+            if apis:
+                decision = await asyncio.to_thread(self.microg.coverage_decision, apis)
+                logger.info(f"MicroG {decision.microg_version} coverage for {issue.package_name}: "
+                            f"{decision.action} ({len(decision.covered)} covered, "
+                            f"{len(decision.partial)} partial, {len(decision.unsupported)} unsupported)")
+                
+                if decision.action == microg_coverage.ENABLE_MICROG:
+                    return AppFix(
+                        issue=issue,
+                        fix_type="microg",
+                        patch_data=decision.to_dict(),
+                        success=await self.microg.enable(decision),
+                        timestamp=time.time()
+                    )
+                if decision.action == microg_coverage.UNSUPPORTED:
+                    # Patching cannot replace attestation or payment backends
+                    return AppFix(
+                        issue=issue,
+                        fix_type="unsupported",
+                        patch_data=decision.to_dict(),
+                        success=False,
+                        timestamp=time.time()
+                    )
+            
+            # Strategy 2: Patch APK to remove Google Services dependency
             apk_path = await self.extract_installed_apk(issue.package_name)
             if apk_path:
                 patched_apk = await self.patch_apk_framework(apk_path, issue)
@@ -627,10 +1149,13 @@ class AppCompatibilityFixer:
                     # Reinstall patched APK
                     self.waydroid.install_app(str(patched_apk))
                     
+                    patch_data = {"patched_apk": str(patched_apk)}
+                    if decision:
+                        patch_data["microg"] = decision.to_dict()
                     return AppFix(
                         issue=issue,
                         fix_type="apk_patch",
-                        patch_data={"patched_apk": str(patched_apk)},
+                        patch_data=patch_data,
                         success=True,
                         timestamp=time.time()
                     )
@@ -716,131 +1241,250 @@ class AppCompatibilityFixer:
         # the app's requirements without actual functionality
         # Implementation would be complex and require smali patching
         return False
+
+
+@dataclass
+class CompatibilityResult:
+    """Outcome of installing, launching and observing one app"""
+    package_name: str
+    status: str  # "compatible", "fixed", "needs_attention", "install_failed", "not_installed" or "error"
+    issues_found: int = 0
+    fixes_applied: int = 0
+    crashes: int = 0
+    running: bool = False
+    install_time: float = 0.0
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+class CompatibilityTester:
+    """Bulk app compatibility testing on a bounded pool of concurrent workers"""
     
-    def store_fix(self, fix: AppFix):
-        """Store applied fix in database"""
-        conn = sqlite3.connect(self.fixes_db)
-        cursor = conn.cursor()
+    # Package names are interpolated into Waydroid shell commands
+    PACKAGE_NAME = re.compile(r'^[A-Za-z][\w]*(\.[A-Za-z][\w]*)+$')
+    # Upper bound on the workers a request may ask for
+    MAX_WORKERS = 32
+    
+    def __init__(self, backend: AndroidBackend, events: EventBus, workers: int = 4,
+                 observe_seconds: float = 10.0, install_timeout_ms: int = 120000):
+        self.backend = backend
+        self.events = events
+        self.workers = workers
+        self.observe_seconds = observe_seconds
+        self.install_timeout_ms = install_timeout_ms
+    
+    async def catalog(self) -> List[str]:
+        """Third-party packages installed in the container"""
+        outcome = await run_command(CommandSpec("pm list packages -3", in_waydroid=True))
+        return [
+            line[len("package:"):].strip() for line in outcome.output.splitlines()
+            if line.startswith("package:")
+        ]
+    
+    async def run(self, apps: List[Dict[str, Any]], workers: Optional[int] = None,
+                  observe_seconds: Optional[float] = None):
+        """
+        Test apps concurrently, yielding each CompatibilityResult as it finishes
         
-        # Get issue ID
-        cursor.execute(
-            "SELECT id FROM app_issues WHERE package_name = ? ORDER BY detected_at DESC LIMIT 1",
-            (fix.issue.package_name,)
-        )
-        issue_id = cursor.fetchone()[0]
-        
-        # Store fix
-        cursor.execute('''
-            INSERT INTO app_fixes 
-            (issue_id, fix_type, patch_data, success, applied_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            issue_id,
-            fix.fix_type,
-            json.dumps(fix.patch_data),
-            fix.success,
-            fix.timestamp
-        ))
-        
-        # Mark issue as fixed if successful
-        if fix.success:
-            cursor.execute(
-                "UPDATE app_issues SET fixed = TRUE WHERE id = ?",
-                (issue_id,)
+        Args:
+            apps: {"package_name", optional "apk_url"} dicts
+            workers: Apps tested at once (default from config)
+            observe_seconds: How long each app is watched after launch
+        """
+        semaphore = asyncio.Semaphore(max(1, workers or self.workers))
+        observe = self.observe_seconds if observe_seconds is None else observe_seconds
+        
+        async def limited(app: Dict[str, Any]) -> CompatibilityResult:
+            async with semaphore:
+                return await self.test_app(app, observe)
+        
+        tasks = [asyncio.create_task(limited(app)) for app in apps]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def test_app(self, app: Dict[str, Any], observe_seconds: float) -> CompatibilityResult:
+        """Install (if an APK is given), launch and watch one app for crashes"""
+        package_name = app['package_name']
+        start = time.monotonic()
+        # Subscribe before launching so no crash of this app is missed
+        subscription = self.events.subscribe(("crash", "issue", "fix"), [package_name])
+        
+        try:
+            if app.get('apk_url'):
+                install_start = time.monotonic()
+                installed = await self.install(app)
+                install_time = time.monotonic() - install_start
+                if not installed:
+                    return CompatibilityResult(package_name, "install_failed",
+                                               install_time=install_time,
+                                               duration=time.monotonic() - start)
+            else:
+                install_time = 0.0
+                if not await self.is_installed(package_name):
+                    return CompatibilityResult(package_name, "not_installed",
+                                               duration=time.monotonic() - start)
+            
+            await run_command(CommandSpec(
+                f"monkey -p {package_name} -c android.intent.category.LAUNCHER 1",
+                in_waydroid=True
+            ))
+            
+            crashes, issues, fixes = await self.observe(subscription, observe_seconds)
+            running = await self.is_running(package_name)
+            await run_command(CommandSpec(f"am force-stop {package_name}", in_waydroid=True))
+            
+            if crashes == 0 and running:
+                status = "compatible"
+            elif fixes:
+                status = "fixed"
+            else:
+                status = "needs_attention"
+            
+            return CompatibilityResult(
+                package_name, status,
+                issues_found=issues,
+                fixes_applied=fixes,
+                crashes=crashes,
+                running=running,
+                install_time=install_time,
+                duration=time.monotonic() - start
             )
         
-        conn.commit()
-        conn.close()
+        except Exception as e:
+            logger.error(f"Compatibility test of {package_name} failed: {e}")
+            return CompatibilityResult(package_name, "error", error=str(e),
+                                       duration=time.monotonic() - start)
+        finally:
+            self.events.unsubscribe(subscription)
+    
+    async def observe(self, subscription, seconds: float) -> Tuple[int, int, int]:
+        """Count crash, issue and successful fix events until the window closes"""
+        crashes = issues = fixes = 0
+        deadline = time.monotonic() + seconds
+        
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                event = await subscription.get(timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if event is None:
+                # Dropped as a slow consumer; counts so far are a lower bound
+                break
+            if event["eventType"] == "crash":
+                crashes += 1
+            elif event["eventType"] == "issue":
+                issues += 1
+            elif event["eventType"] == "fix" and event["data"].get("success"):
+                fixes += 1
+        
+        return crashes, issues, fixes
+    
+    async def install(self, app: Dict[str, Any]) -> bool:
+        """Download an app's APK and install it through the backend"""
+        try:
+            temp_apk = await download_apk(app['apk_url'])
+        except aiohttp.ClientError as e:
+            logger.error(f"Failed to download {app['apk_url']}: {e}")
+            return False
+        
+        package_name = app['package_name']
+        try:
+            self.events.publish("install", {"status": "installing"}, package_name)
+            try:
+                success = await asyncio.wait_for(self.backend.install(package_name, temp_apk),
+                                                 self.install_timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                logger.error(f"Installing {package_name} timed out")
+                success = False
+            self.events.publish("install", {
+                "status": "installed" if success else "failed"
+            }, package_name)
+            return success
+        finally:
+            temp_apk.unlink(missing_ok=True)
+    
+    async def is_installed(self, package_name: str) -> bool:
+        outcome = await run_command(CommandSpec(f"pm path {package_name}", in_waydroid=True))
+        return outcome.success and "package:" in outcome.output
+    
+    async def is_running(self, package_name: str) -> bool:
+        outcome = await run_command(CommandSpec(f"pidof {package_name}", in_waydroid=True))
+        return outcome.success and outcome.output.strip() != ""
+
+
+def compatibility_matrix(results: List[CompatibilityResult], wall_time: float) -> Dict[str, Any]:
+    """Summary of a bulk compatibility run: packages per status and timing"""
+    matrix: Dict[str, List[str]] = {}
+    for result in results:
+        matrix.setdefault(result.status, []).append(result.package_name)
+    serial_time = sum(r.duration for r in results)
+    
+    return {
+        'total_apps': len(results),
+        'compatible': len(matrix.get('compatible', [])),
+        'fixed': len(matrix.get('fixed', [])),
+        'issues': len(matrix.get('needs_attention', [])),
+        'failed': sum(len(matrix.get(s, [])) for s in ('install_failed', 'not_installed', 'error')),
+        'matrix': {status: sorted(packages) for status, packages in matrix.items()},
+        'duration': wall_time,
+        'serial_time': serial_time
+    }
 
 
-class AIROSLinuxAgent:
+class AIROSLinuxAgent(AgentCore):
     """Main AIROS Linux Agent service"""
     
+    mode = "linux"
+    
     def __init__(self):
         self.port = 8080
         self.ws_port = 8081
-        self.waydroid = WaydroidManager()
-        self.microg = MicroGManager(self.waydroid)
-        self.app_fixer = AppCompatibilityFixer(self.waydroid)
-        self.app = web.Application()
-        self.setup_routes()
+        self.events_app = web.Application()
+        # Package listing shells into the container, so sample less often
+        super().__init__(load_config(), WaydroidManager(), state_interval=5.0)
+        self.microg = MicroGManager(self.waydroid, self.config.get('microg', {}))
+        self.fixer = AppCompatibilityFixer(
+            self.waydroid,
+            analyzer=build_crash_analyzer(
+                self.config.get('ai_agent', {}).get('analyzer', {})
+            ),
+            events=self.events,
+            microg=self.microg
+        )
+        compatibility = self.config.get('compatibility', {})
+        self.compat_tester = CompatibilityTester(
+            self.waydroid,
+            self.events,
+            workers=compatibility.get('workers', 4),
+            observe_seconds=compatibility.get('observe_seconds', 10.0)
+        )
         
     def setup_routes(self):
         """Setup HTTP API routes"""
-        self.app.router.add_post('/api/execute', self.handle_execute)
-        self.app.router.add_post('/api/install_app', self.handle_install_app)
-        self.app.router.add_post('/api/fix_app', self.handle_fix_app)
-        self.app.router.add_get('/api/system_info', self.handle_system_info)
-        self.app.router.add_get('/api/app_issues', self.handle_get_issues)
-        self.app.router.add_post('/api/waydroid/start', self.handle_waydroid_start)
-        self.app.router.add_post('/api/waydroid/stop', self.handle_waydroid_stop)
+        super().setup_routes()
+        self.app.router.add_post('/api/test_compatibility', self.handle_test_compatibility)
         self.app.router.add_post('/api/microg/configure', self.handle_microg_config)
-    
-    async def handle_execute(self, request):
-        """Execute system command"""
-        data = await request.json()
-        command = data.get('command')
-        in_waydroid = data.get('in_waydroid', False)
-        
-        if in_waydroid:
-            success, output = self.waydroid.execute_shell(command)
-        else:
-            try:
-                result = subprocess.run(
-                    command,
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                success = result.returncode == 0
-                output = result.stdout + result.stderr
-            except subprocess.TimeoutExpired:
-                success = False
-                output = "Command timeout"
         
-        return web.json_response({
-            'success': success,
-            'output': output
-        })
+        # Dedicated event stream port used by AIROSClient.start_monitoring
+        self.events.add_routes(self.events_app)
     
-    async def handle_install_app(self, request):
-        """Install and automatically fix an app"""
-        data = await request.json()
-        apk_url = data.get('apk_url')
-        package_name = data.get('package_name')
-        
-        # Download APK
-        temp_apk = Path(tempfile.mktemp(suffix='.apk'))
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(apk_url) as resp:
-                    temp_apk.write_bytes(await resp.read())
-            
-            # Pre-patch if needed
-            if data.get('pre_patch'):
-                # Analyze APK for potential issues
-                # This would involve parsing the APK and checking for
-                # known incompatibilities
-                pass
-            
-            # Install
-            success = self.waydroid.install_app(str(temp_apk))
-            
-            # Start monitoring for crashes
-            if success:
-                asyncio.create_task(
-                    self.monitor_app_launch(package_name)
-                )
-            
-            return web.json_response({
-                'success': success,
-                'package_name': package_name
-            })
-            
-        finally:
-            temp_apk.unlink(missing_ok=True)
+    def system_info(self) -> Dict:
+        """Body of /api/system_info, with crash analyzer counters"""
+        info = super().system_info()
+        info['crash_analyzer'] = self.fixer.analyzer.stats
+        return info
+    
+    def after_install(self, package_name: str):
+        """Start monitoring the new app for crashes"""
+        asyncio.create_task(self.monitor_app_launch(package_name))
     
     async def monitor_app_launch(self, package_name: str):
         """Monitor app launch and fix issues in real-time"""
@@ -852,95 +1496,70 @@ class AIROSLinuxAgent:
         # Monitor for crashes for 30 seconds
         await asyncio.sleep(30)
     
-    async def handle_fix_app(self, request):
-        """Manually trigger app fixing"""
-        data = await request.json()
-        package_name = data.get('package_name')
-        
-        # Get app info
-        app_info = self.waydroid.get_app_info(package_name)
-        
-        # Check for issues
-        issues = []
+    async def handle_test_compatibility(self, request):
+        """
+        Install, launch and observe a list of apps on a bounded worker pool
         
-        # Check for Google Services dependency
-        if 'com.google.android.gms' in str(app_info):
-            issue = AppIssue(
-                package_name=package_name,
-                issue_type=AppFixType.FRAMEWORK,
-                description="Google Services dependency detected"
-            )
-            issues.append(issue)
+        Body: {"apps": [package name or {"package_name", "apk_url"}],
+        "workers", "observe_seconds", "stream"}. Without "apps" every installed
+        third-party package is tested. Streamed (the default) as NDJSON: one
+        {"type": "result"} frame per app as it finishes, then {"type": "summary"}.
+        """
+        data = await request.json()
+        apps = data.get('apps')
+        if apps is None:
+            apps = await self.compat_tester.catalog()
+        if not isinstance(apps, list):
+            return web.json_response({'error': "'apps' must be a list"}, status=400)
         
-        # Apply fixes
-        fixes = []
-        for issue in issues:
-            fix = await self.app_fixer.auto_fix_issue(issue)
-            if fix:
-                fixes.append(asdict(fix))
-        
-        return web.json_response({
-            'package_name': package_name,
-            'issues_found': len(issues),
-            'fixes_applied': fixes
-        })
-    
-    async def handle_system_info(self, request):
-        """Get system information"""
-        info = {
-            'os': 'AIROS-Linux',
-            'version': '0.1.0-alpha',
-            'kernel': os.uname().release,
-            'waydroid_running': self.waydroid.is_running(),
-            'installed_packages': len(self.waydroid.list_packages()),
-            'cpu_percent': psutil.cpu_percent(),
-            'memory_percent': psutil.virtual_memory().percent,
-            'disk_usage': psutil.disk_usage('/').percent
-        }
+        apps = [{'package_name': app} if isinstance(app, str) else app for app in apps]
+        for app in apps:
+            if not isinstance(app, dict) or not CompatibilityTester.PACKAGE_NAME.match(
+                    str(app.get('package_name', ''))):
+                return web.json_response({'error': f"invalid app entry: {app}"}, status=400)
+            if 'apk_path' in app:
+                # Host paths from unauthenticated requests are not installed
+                return web.json_response({'error': "apk_path is not supported, give an apk_url"},
+                                         status=400)
         
-        return web.json_response(info)
-    
-    async def handle_get_issues(self, request):
-        """Get detected app issues from database"""
-        conn = sqlite3.connect(self.app_fixer.fixes_db)
-        cursor = conn.cursor()
+        # Checked up front: once streaming starts, errors can only truncate the stream
+        workers, observe_seconds = data.get('workers'), data.get('observe_seconds')
+        if workers is not None and (type(workers) is not int
+                                    or not 1 <= workers <= CompatibilityTester.MAX_WORKERS):
+            return web.json_response({
+                'error': f"'workers' must be an integer from 1 to {CompatibilityTester.MAX_WORKERS}"
+            }, status=400)
+        if observe_seconds is not None and (type(observe_seconds) not in (int, float)
+                                            or not 0 < observe_seconds < float('inf')):
+            return web.json_response({'error': "'observe_seconds' must be a positive number"}, status=400)
         
-        cursor.execute('''
-            SELECT package_name, issue_type, description, severity, fixed
-            FROM app_issues
-            ORDER BY detected_at DESC
-            LIMIT 100
-        ''')
+        results = self.compat_tester.run(apps, workers, observe_seconds)
+        start = time.monotonic()
         
-        issues = []
-        for row in cursor.fetchall():
-            issues.append({
-                'package_name': row[0],
-                'issue_type': row[1],
-                'description': row[2],
-                'severity': row[3],
-                'fixed': bool(row[4])
-            })
+        if not data.get('stream', True):
+            finished = [result async for result in results]
+            summary = compatibility_matrix(finished, time.monotonic() - start)
+            order = {app['package_name']: i for i, app in enumerate(apps)}
+            finished.sort(key=lambda r: order[r.package_name])
+            return web.json_response({'test_results': [asdict(r) for r in finished], **summary})
         
-        conn.close()
+        async def frames():
+            finished = []
+            try:
+                async for result in results:
+                    finished.append(result)
+                    yield {'type': 'result', **asdict(result)}
+                yield {'type': 'summary', **compatibility_matrix(finished, time.monotonic() - start)}
+            finally:
+                await results.aclose()
         
-        return web.json_response(issues)
-    
-    async def handle_waydroid_start(self, request):
-        """Start Waydroid container"""
-        success = self.waydroid.start()
-        return web.json_response({'success': success})
-    
-    async def handle_waydroid_stop(self, request):
-        """Stop Waydroid container"""
-        success = self.waydroid.stop()
-        return web.json_response({'success': success})
+        return await write_ndjson(request, frames())
     
     async def handle_microg_config(self, request):
         """Configure MicroG services"""
         data = await request.json()
-        success = self.microg.configure_services(data)
-        return web.json_response({'success': success})
+        success, results = await asyncio.to_thread(self.microg.configure_services, data)
+        return web.json_response({'success': success, 'results': [r.to_dict() for r in results]})
     
     async def start(self):
         """Start the AI agent service"""
@@ -950,17 +1569,22 @@ class AIROSLinuxAgent:
         if not self.waydroid.is_running():
             logger.info("Starting Waydroid container...")
             self.waydroid.start()
+            await self.publish_waydroid_state()
         
         # Start crash monitor
-        asyncio.create_task(self.app_fixer.monitor_app_crashes())
+        asyncio.create_task(self.fixer.monitor_app_crashes())
         
         # Start HTTP server
-        runner = web.AppRunner(self.app)
-        await runner.setup()
-        site = web.TCPSite(runner, '0.0.0.0', self.port)
-        await site.start()
+        await self.serve(self.port)
+        
+        # Start event stream server
+        events_runner = web.AppRunner(self.events_app)
+        await events_runner.setup()
+        events_site = web.TCPSite(events_runner, '0.0.0.0', self.ws_port)
+        await events_site.start()
         
         logger.info(f"AIROS Linux Agent running on port {self.port}")
+        logger.info(f"Event stream on ws://0.0.0.0:{self.ws_port}/ and /events")
         
         # Keep running
         while True:
@@ -7,18 +7,24 @@ Provides demo functionality without actual hardware dependencies
 import os
 import sys
 import json
+import math
 import time
+import random
+import shutil
 import asyncio
 import logging
-import sqlite3
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
-from enum import Enum
+from typing import Dict, List, Optional, Any, Tuple
 
-import yaml
 from aiohttp import web
-import psutil
+
+from command_runner import CommandSpec, CommandOutcome
+from event_bus import EventBus
+from pm_batch import PmBatch, PmResult
+from airos_core import (
+    AppFixType, AppIssue, AppFix, AndroidBackend, AgentCore, IssueStore,
+    InjectedFault, load_config
+)
 
 # Configure logging - create log directory if needed
 log_dir = Path('/var/log/airos')
@@ -40,42 +46,128 @@ logging.basicConfig(
 logger = logging.getLogger('AIROS-Virtual')
 
 
-class AppFixType(Enum):
-    """Types of app fixes that can be applied"""
-    PERMISSION = "permission"
-    LIBRARY = "library"
-    SERVICE = "service"
-    SIGNATURE = "signature"
-    FRAMEWORK = "framework"
-    NATIVE = "native"
-
-
-@dataclass
-class AppIssue:
-    """Detected app compatibility issue"""
-    package_name: str
-    issue_type: AppFixType
-    description: str
-    stack_trace: Optional[str] = None
-    missing_component: Optional[str] = None
-    severity: str = "medium"
-
-
-@dataclass
-class AppFix:
-    """Applied fix for app compatibility"""
-    issue: AppIssue
-    fix_type: str
-    patch_data: Dict[str, Any]
-    success: bool
-    timestamp: float
-
+# Simulated latency and failure rate of each mock operation, by profile.
+# Delays are seconds or a distribution (see MockBehavior.sample); "instant"
+# is for unit tests, "demo" keeps the original fixed delays, "phone" is
+# roughly what a mid-range phone under Waydroid shows
+MOCK_OPERATIONS = (
+    "status", "system_info", "install_app", "auto_fix", "fix_app", "simulate_crash",
+    "test_compatibility", "shell", "execute_stream", "waydroid_start", "waydroid_stop"
+)
 
-class VirtualWaydroidManager:
+MOCK_PROFILES = {
+    "instant": {},
+    "demo": {
+        "install_app": {"delay": 1.0},
+        "auto_fix": {"delay": 1.0},
+        "fix_app": {"delay": 2.0},
+        "simulate_crash": {"delay": 1.0},
+        "test_compatibility": {"delay": 0.5},
+        "shell": {"delay": 0.1},
+        "execute_stream": {"chunk_delay": 0.1}
+    },
+    "phone": {
+        "status": {"delay": {"distribution": "lognormal", "median": 0.005, "sigma": 0.6}},
+        "system_info": {"delay": {"distribution": "lognormal", "median": 0.02, "sigma": 0.6}},
+        "install_app": {"delay": {"distribution": "lognormal", "median": 4.0, "sigma": 0.5, "max": 30},
+                        "error_rate": 0.02},
+        "auto_fix": {"delay": {"distribution": "lognormal", "median": 1.5, "sigma": 0.5}},
+        "fix_app": {"delay": {"distribution": "lognormal", "median": 2.5, "sigma": 0.5},
+                    "error_rate": 0.01},
+        "simulate_crash": {"delay": {"distribution": "lognormal", "median": 1.0, "sigma": 0.4}},
+        "test_compatibility": {"delay": {"distribution": "lognormal", "median": 1.5, "sigma": 0.6},
+                               "error_rate": 0.02},
+        "shell": {"delay": {"distribution": "exponential", "mean": 0.15, "max": 5}},
+        "execute_stream": {"chunk_delay": {"distribution": "exponential", "mean": 0.05},
+                           "stall_rate": 0.01, "stall": 3.0},
+        "waydroid_start": {"delay": {"distribution": "uniform", "low": 5.0, "high": 12.0}},
+        "waydroid_stop": {"delay": {"distribution": "uniform", "low": 1.0, "high": 3.0}}
+    }
+}
+
+
+class MockBehavior:
+    """Per-operation simulated latency, failures and streaming pace"""
+
+    def __init__(self, virtual_config: Optional[Dict] = None):
+        config = virtual_config or {}
+        profile = os.environ.get('AIROS_VIRTUAL_PROFILE') or config.get('profile', 'demo')
+        if profile not in MOCK_PROFILES:
+            raise ValueError(f"Unknown virtual_mode profile: {profile}")
+
+        self.profile = profile
+        self.rng = random.Random(config.get('seed'))
+        self.operations: Dict[str, Dict[str, Any]] = {}
+        overrides = config.get('operations') or {}
+        for operation in set(MOCK_PROFILES[profile]) | set(overrides):
+            if operation not in MOCK_OPERATIONS:
+                raise ValueError(f"Unknown mock operation: {operation}")
+            self.operations[operation] = {
+                **MOCK_PROFILES[profile].get(operation, {}),
+                **(overrides.get(operation) or {})
+            }
+        self.faults = {operation: 0 for operation in MOCK_OPERATIONS}
+
+    def sample(self, spec: Any) -> float:
+        """
+        Seconds drawn from a delay spec
+
+        A number is a fixed delay. A dict names a distribution: fixed (value),
+        uniform (low, high), normal (mean, stddev), lognormal (median, sigma)
+        or exponential (mean), optionally capped by max.
+        """
+        if not spec:
+            return 0.0
+        if isinstance(spec, (int, float)):
+            return float(spec)
+
+        distribution = spec.get('distribution', 'fixed')
+        if distribution == 'fixed':
+            value = spec.get('value', 0.0)
+        elif distribution == 'uniform':
+            value = self.rng.uniform(spec['low'], spec['high'])
+        elif distribution == 'normal':
+            value = self.rng.gauss(spec['mean'], spec['stddev'])
+        elif distribution == 'lognormal':
+            value = self.rng.lognormvariate(math.log(spec['median']), spec['sigma'])
+        elif distribution == 'exponential':
+            value = self.rng.expovariate(1.0 / spec['mean'])
+        else:
+            raise ValueError(f"Unknown delay distribution: {distribution}")
+
+        return max(0.0, min(value, spec.get('max', value)))
+
+    async def simulate(self, operation: str):
+        """Wait out the operation's delay, then fail it at its error rate"""
+        behavior = self.operations.get(operation, {})
+        delay = self.sample(behavior.get('delay'))
+        if delay:
+            await asyncio.sleep(delay)
+        if self.rng.random() < behavior.get('error_rate', 0.0):
+            self.faults[operation] += 1
+            raise InjectedFault(operation, behavior.get('error_status', 503))
+
+    async def pace(self, operation: str):
+        """Delay before the next streamed chunk, with occasional stalls"""
+        behavior = self.operations.get(operation, {})
+        delay = self.sample(behavior.get('chunk_delay'))
+        if self.rng.random() < behavior.get('stall_rate', 0.0):
+            delay += self.sample(behavior.get('stall', 0.0))
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class VirtualWaydroidManager(AndroidBackend):
     """Mock Waydroid manager for virtual testing"""
 
-    def __init__(self):
+    name = "virtual"
+    needs_apk = False
+
+    def __init__(self, behavior: Optional[MockBehavior] = None, apps_dir: Optional[Path] = None):
         self.running = True
+        self.behavior = behavior
+        # APKs installed from a file are kept here, like /data/app in a real container
+        self.apps_dir = apps_dir or Path.home() / '.airos-virtual' / 'apps'
         self.mock_packages = [
             "com.whatsapp",
             "com.instagram.android",
@@ -112,70 +204,101 @@ class VirtualWaydroidManager:
             "activities": ["MainActivity"]
         }
 
+    def apk_paths(self, package_name: str) -> List[Path]:
+        apk = self.apps_dir / package_name / "base.apk"
+        return [apk] if apk.exists() else []
+
     def execute_shell(self, command: str) -> tuple[bool, str]:
         logger.info(f"Mock shell command: {command}")
         return True, f"Mock output for: {command}"
 
+    def run_pm_batch(self, batch: PmBatch) -> List[PmResult]:
+        logger.info(f"Mock pm batch: {len(batch)} operations")
+        return [PmResult(op.target, op.command, "ok", exit_code=0, output=f"Mock output for: {op.command}")
+                for op in batch.operations]
+
+    async def simulate(self, operation: str):
+        """Apply the configured latency and failures, if any"""
+        if self.behavior:
+            await self.behavior.simulate(operation)
+
+    async def install(self, package_name: str, apk_path: Optional[Path] = None) -> bool:
+        """Add the package to the mock, from the APK when one was given"""
+        await self.simulate('install_app')
+        if apk_path is not None:
+            self.install_app(str(apk_path))
+            await asyncio.to_thread(self.keep_apk, package_name, Path(apk_path))
+        if package_name not in self.mock_packages:
+            self.mock_packages.append(package_name)
+        return True
 
-class VirtualCompatibilityFixer:
-    """Mock app compatibility fixer for demonstrations"""
+    def keep_apk(self, package_name: str, apk_path: Path):
+        """Store an installed APK where apk_paths() finds it"""
+        target = self.apps_dir / package_name / "base.apk"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(apk_path, target)
 
-    def __init__(self):
-        # Use home directory for virtual testing to avoid permission issues
-        data_dir = Path.home() / '.airos-virtual' / 'data'
-        data_dir.mkdir(parents=True, exist_ok=True)
-        self.fixes_db = data_dir / "virtual_fixes.db"
-        self.init_database()
-
-    def init_database(self):
-        """Initialize mock database"""
-        conn = sqlite3.connect(self.fixes_db)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS virtual_issues (
-                id INTEGER PRIMARY KEY,
-                package_name TEXT,
-                issue_type TEXT,
-                description TEXT,
-                severity TEXT,
-                fixed BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS virtual_fixes (
-                id INTEGER PRIMARY KEY,
-                issue_id INTEGER,
-                fix_type TEXT,
-                success BOOLEAN,
-                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (issue_id) REFERENCES virtual_issues(id)
-            )
-        ''')
+    async def run(self, spec: CommandSpec) -> CommandOutcome:
+        """Simulate a command through the mock Waydroid shell"""
+        start = time.monotonic()
+        try:
+            await self.simulate('shell')
+        except InjectedFault as e:
+            return CommandOutcome(spec.command, "failed", exit_code=1, error=str(e),
+                                  duration=time.monotonic() - start)
+        success, output = self.execute_shell(spec.command)
+        return CommandOutcome(
+            spec.command,
+            "ok" if success else "failed",
+            exit_code=0 if success else 1,
+            output=output,
+            duration=time.monotonic() - start
+        )
 
-        # Insert some demo data
-        demo_issues = [
-            ("com.whatsapp", "FRAMEWORK", "Google Services dependency", "high"),
-            ("com.spotify.music", "PERMISSION", "Storage permission required", "medium"),
-            ("com.instagram.android", "LIBRARY", "Missing native library", "medium"),
-        ]
+    async def stream(self, spec: CommandSpec):
+        """Simulate streamed output through the mock Waydroid shell"""
+        start = time.monotonic()
+        try:
+            await self.simulate('execute_stream')
+        except InjectedFault as e:
+            yield {'stream': 'exit', 'status': 'error', 'exit_code': None,
+                   'error': str(e), 'duration': time.monotonic() - start}
+            return
+        success, output = self.execute_shell(spec.command)
+        for line in output.splitlines(keepends=True):
+            if self.behavior:
+                await self.behavior.pace('execute_stream')  # Output arriving over time
+            yield {'stream': 'stdout', 'data': line}
+        yield {
+            'stream': 'exit',
+            'status': 'ok' if success else 'failed',
+            'exit_code': 0 if success else 1,
+            'error': None,
+            'duration': time.monotonic() - start
+        }
 
-        for package, issue_type, desc, severity in demo_issues:
-            cursor.execute('''
-                INSERT OR IGNORE INTO virtual_issues
-                (package_name, issue_type, description, severity)
-                VALUES (?, ?, ?, ?)
-            ''', (package, issue_type, desc, severity))
 
-        conn.commit()
-        conn.close()
+# Issues shown by a fresh virtual install
+DEMO_ISSUES = [
+    AppIssue("com.whatsapp", AppFixType.FRAMEWORK, "Google Services dependency", severity="high"),
+    AppIssue("com.spotify.music", AppFixType.PERMISSION, "Storage permission required"),
+    AppIssue("com.instagram.android", AppFixType.LIBRARY, "Missing native library"),
+]
 
-    async def simulate_fix(self, package_name: str) -> List[AppFix]:
-        """Simulate applying fixes to an app"""
-        fixes = []
 
+class VirtualCompatibilityFixer:
+    """Mock app compatibility fixer for demonstrations"""
+
+    def __init__(self, events: Optional[EventBus] = None, data_dir: Optional[Path] = None):
+        # Use home directory for virtual testing to avoid permission issues
+        data_dir = data_dir or Path.home() / '.airos-virtual' / 'data'
+        data_dir.mkdir(parents=True, exist_ok=True)
+        self.events = events
+        self.store = IssueStore(data_dir / "virtual_fixes.db")
+        self.store.seed(DEMO_ISSUES)
+
+    async def fix_package(self, package_name: str) -> Tuple[List[AppIssue], List[AppFix]]:
+        """Simulate finding and fixing an app's issues"""
         # Mock different types of fixes based on package
         if "whatsapp" in package_name.lower():
             issue = AppIssue(
@@ -183,14 +306,7 @@ class VirtualCompatibilityFixer:
                 issue_type=AppFixType.FRAMEWORK,
                 description="Google Services dependency"
             )
-            fix = AppFix(
-                issue=issue,
-                fix_type="microg_patch",
-                patch_data={"microg_enabled": True},
-                success=True,
-                timestamp=time.time()
-            )
-            fixes.append(fix)
+            fix_type, patch_data = "microg_patch", {"microg_enabled": True}
 
         elif "spotify" in package_name.lower():
             issue = AppIssue(
@@ -198,14 +314,7 @@ class VirtualCompatibilityFixer:
                 issue_type=AppFixType.PERMISSION,
                 description="Storage permission required"
             )
-            fix = AppFix(
-                issue=issue,
-                fix_type="grant_permission",
-                patch_data={"permission": "WRITE_EXTERNAL_STORAGE"},
-                success=True,
-                timestamp=time.time()
-            )
-            fixes.append(fix)
+            fix_type, patch_data = "grant_permission", {"permission": "WRITE_EXTERNAL_STORAGE"}
 
         elif "instagram" in package_name.lower():
             issue = AppIssue(
@@ -213,206 +322,80 @@ class VirtualCompatibilityFixer:
                 issue_type=AppFixType.LIBRARY,
                 description="Missing native library"
             )
-            fix = AppFix(
-                issue=issue,
-                fix_type="library_shim",
-                patch_data={"library": "libinstagram.so"},
-                success=True,
-                timestamp=time.time()
-            )
-            fixes.append(fix)
-
-        # Store fixes in database
-        if fixes:
-            self.store_fixes(fixes)
-
-        return fixes
-
-    def store_fixes(self, fixes: List[AppFix]):
-        """Store demo fixes in database"""
-        conn = sqlite3.connect(self.fixes_db)
-        cursor = conn.cursor()
-
-        for fix in fixes:
-            cursor.execute('''
-                INSERT INTO virtual_fixes (issue_id, fix_type, success)
-                VALUES (1, ?, ?)
-            ''', (fix.fix_type, fix.success))
-
-        conn.commit()
-        conn.close()
-
-    def get_issues(self) -> List[Dict]:
-        """Get demo issues from database"""
-        conn = sqlite3.connect(self.fixes_db)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT package_name, issue_type, description, severity, fixed
-            FROM virtual_issues
-            ORDER BY created_at DESC
-        ''')
-
-        issues = []
-        for row in cursor.fetchall():
-            issues.append({
-                'package_name': row[0],
-                'issue_type': row[1],
-                'description': row[2],
-                'severity': row[3],
-                'fixed': bool(row[4])
-            })
-
-        conn.close()
-        return issues
+            fix_type, patch_data = "library_shim", {"library": "libinstagram.so"}
 
-
-class AIROSVirtualAgent:
+        else:
+            return [], []
+
+        return [issue], [self.apply(issue, fix_type, patch_data)]
+
+    async def fix_issues(self, issues: List[AppIssue]) -> List[AppFix]:
+        """Pretend to fix predicted issues"""
+        return [self.apply(issue, f"mock_{issue.issue_type.value}",
+                           {"missing_component": issue.missing_component})
+                for issue in issues]
+
+    def apply(self, issue: AppIssue, fix_type: str, patch_data: Dict[str, Any]) -> AppFix:
+        """Record a successful mock fix"""
+        fix = AppFix(
+            issue=issue,
+            fix_type=fix_type,
+            patch_data=patch_data,
+            success=True,
+            timestamp=time.time()
+        )
+        self.store.store_issue(issue)
+        self.store.store_fix(fix)
+        if self.events:
+            self.events.publish('fix', {
+                'issue_type': issue.issue_type.value,
+                'fix_type': fix.fix_type,
+                'success': fix.success
+            }, issue.package_name)
+        return fix
+
+
+class AIROSVirtualAgent(AgentCore):
     """Virtual AIROS agent for testing and demonstrations"""
 
+    mode = "virtual"
+    version = "0.1.0-alpha-virtual"
+    os_name = "AIROS-Linux-Virtual"
+
     def __init__(self):
         self.port = 8082
-        self.waydroid = VirtualWaydroidManager()
-        self.fixer = VirtualCompatibilityFixer()
-        self.app = web.Application()
-        self.start_time = time.time()
-        self.setup_routes()
-
-        # Load configuration
-        self.config = self.load_config()
+        config = load_config()
+        self.behavior = MockBehavior(config.get('virtual_mode'))
+        super().__init__(config, VirtualWaydroidManager(self.behavior))
+        self.fixer = VirtualCompatibilityFixer(self.events)
 
-        logger.info("AIROS Virtual Agent initialized")
-
-    def load_config(self) -> Dict:
-        """Load configuration file"""
-        config_path = Path("/etc/airos/airos.yml")
-        if config_path.exists():
-            with open(config_path, 'r') as f:
-                return yaml.safe_load(f)
-        return {}
+        logger.info(f"AIROS Virtual Agent initialized ({self.behavior.profile} profile)")
 
     def setup_routes(self):
         """Setup HTTP API routes"""
-        # Core API routes
-        self.app.router.add_get('/api/status', self.handle_status)
-        self.app.router.add_get('/api/system_info', self.handle_system_info)
-        self.app.router.add_post('/api/install_app', self.handle_install_app)
-        self.app.router.add_post('/api/fix_app', self.handle_fix_app)
-        self.app.router.add_get('/api/app_issues', self.handle_get_issues)
+        super().setup_routes()
 
         # Virtual-specific routes
         self.app.router.add_post('/api/demo/simulate_crash', self.handle_simulate_crash)
         self.app.router.add_post('/api/demo/test_compatibility', self.handle_test_compatibility)
 
-        # Waydroid mock routes
-        self.app.router.add_post('/api/waydroid/start', self.handle_waydroid_start)
-        self.app.router.add_post('/api/waydroid/stop', self.handle_waydroid_stop)
-        self.app.router.add_get('/api/waydroid/status', self.handle_waydroid_status)
-
-    async def handle_status(self, request):
-        """Get agent status"""
-        uptime = time.time() - self.start_time
-        return web.json_response({
-            'status': 'running',
-            'mode': 'virtual',
-            'uptime_seconds': uptime,
-            'version': '0.1.0-alpha-virtual',
-            'waydroid_running': self.waydroid.is_running(),
-            'features': {
-                'auto_fix': True,
-                'demo_mode': True,
-                'learning': False,
-                'community_sharing': False
-            }
+    def status(self) -> Dict:
+        """Body of /api/status, with the mock profile and injected fault counts"""
+        status = super().status()
+        status['features'].update({
+            'demo_mode': True,
+            'learning': False,
+            'community_sharing': False
         })
+        status['mock_profile'] = self.behavior.profile
+        status['injected_faults'] = self.behavior.faults
+        return status
 
-    async def handle_system_info(self, request):
-        """Get system information"""
-        info = {
-            'os': 'AIROS-Linux-Virtual',
-            'version': '0.1.0-alpha',
-            'mode': 'development',
-            'kernel': os.uname().release,
-            'waydroid_running': self.waydroid.is_running(),
-            'installed_packages': len(self.waydroid.list_packages()),
-            'cpu_percent': psutil.cpu_percent(),
-            'memory_percent': psutil.virtual_memory().percent,
-            'disk_usage': psutil.disk_usage('/').percent,
-            'uptime': time.time() - self.start_time
-        }
-
-        return web.json_response(info)
-
-    async def handle_install_app(self, request):
-        """Simulate app installation"""
-        data = await request.json()
-        package_name = data.get('package_name', 'com.example.app')
-
-        logger.info(f"Simulating installation of {package_name}")
-
-        # Simulate installation delay
-        await asyncio.sleep(1)
-
-        # Add to mock packages
-        if package_name not in self.waydroid.mock_packages:
-            self.waydroid.mock_packages.append(package_name)
-
-        # Simulate auto-fix if requested
-        fixes = []
-        if data.get('auto_fix', True):
-            await asyncio.sleep(1)  # Simulation delay
-            fixes = await self.fixer.simulate_fix(package_name)
-
-        # Convert fixes to JSON-serializable format
-        fixes_data = []
-        for fix in fixes:
-            fix_dict = asdict(fix)
-            # Convert enum to string
-            fix_dict['issue']['issue_type'] = fix.issue.issue_type.value
-            fixes_data.append(fix_dict)
-
-        return web.json_response({
-            'success': True,
-            'package_name': package_name,
-            'fixes_applied': len(fixes),
-            'fixes': fixes_data
-        })
-
-    async def handle_fix_app(self, request):
-        """Manually trigger app fixing"""
-        data = await request.json()
-        package_name = data.get('package_name')
-
-        if not package_name:
-            return web.json_response({'error': 'package_name required'}, status=400)
-
-        logger.info(f"Applying fixes to {package_name}")
-
-        # Simulate fix analysis and application
-        await asyncio.sleep(2)  # Simulate AI analysis time
-        fixes = await self.fixer.simulate_fix(package_name)
-
-        # Convert fixes to JSON-serializable format
-        fixes_data = []
-        for fix in fixes:
-            fix_dict = asdict(fix)
-            fix_dict['issue']['issue_type'] = fix.issue.issue_type.value
-            fixes_data.append(fix_dict)
-
-        return web.json_response({
-            'package_name': package_name,
-            'issues_found': len(fixes),
-            'fixes_applied': fixes_data,
-            'success': True
-        })
-
-    async def handle_get_issues(self, request):
-        """Get detected app issues"""
-        issues = self.fixer.get_issues()
-        return web.json_response({
-            'issues': issues,
-            'total': len(issues)
-        })
+    def system_info(self) -> Dict:
+        """Body of /api/system_info"""
+        info = super().system_info()
+        info['mode'] = 'development'
+        return info
 
     async def handle_simulate_crash(self, request):
         """Simulate app crash for demo purposes"""
@@ -442,26 +425,23 @@ class AIROSVirtualAgent:
             description=description,
             severity="high"
         )
+        self.events.publish('crash', {'kind': 'simulated', 'crash_type': crash_type}, package_name)
+        self.events.publish('issue', {
+            'issue_type': issue_type.value,
+            'description': description,
+            'severity': issue.severity
+        }, package_name)
 
         # Simulate auto-fix
-        await asyncio.sleep(1)
-        fix = await self.fixer.simulate_fix(package_name)
-
-        # Convert to JSON-serializable format
-        issue_dict = asdict(issue)
-        issue_dict['issue_type'] = issue.issue_type.value
-
-        fixes_data = []
-        for f in fix:
-            fix_dict = asdict(f)
-            fix_dict['issue']['issue_type'] = f.issue.issue_type.value
-            fixes_data.append(fix_dict)
+        await self.waydroid.simulate('simulate_crash')
+        _, fixes = await self.fixer.fix_package(package_name)
+        self.record_fixes(fixes)
 
         return web.json_response({
             'crash_simulated': True,
-            'issue': issue_dict,
-            'auto_fix_applied': len(fix) > 0,
-            'fixes': fixes_data
+            'issue': issue.to_dict(),
+            'auto_fix_applied': len(fixes) > 0,
+            'fixes': [fix.to_dict() for fix in fixes]
         })
 
     async def handle_test_compatibility(self, request):
@@ -473,12 +453,18 @@ class AIROSVirtualAgent:
 
         for app in apps:
             logger.info(f"Testing compatibility for {app}")
-            await asyncio.sleep(0.5)  # Simulate testing time
+            try:
+                await self.waydroid.simulate('test_compatibility')
+            except InjectedFault:
+                results.append({'package_name': app, 'status': 'error',
+                                'issues_found': 0, 'fixes_applied': 0})
+                continue
 
             # Simulate different outcomes
             if 'whatsapp' in app:
                 issues = 1
-                fixes = await self.fixer.simulate_fix(app)
+                _, fixes = await self.fixer.fix_package(app)
+                self.record_fixes(fixes)
                 status = 'fixed'
             elif 'netflix' in app:
                 issues = 2
@@ -504,24 +490,6 @@ class AIROSVirtualAgent:
             'issues': len([r for r in results if r['status'] == 'needs_attention'])
         })
 
-    async def handle_waydroid_start(self, request):
-        """Start Waydroid container"""
-        success = self.waydroid.start()
-        return web.json_response({'success': success})
-
-    async def handle_waydroid_stop(self, request):
-        """Stop Waydroid container"""
-        success = self.waydroid.stop()
-        return web.json_response({'success': success})
-
-    async def handle_waydroid_status(self, request):
-        """Get Waydroid status"""
-        return web.json_response({
-            'running': self.waydroid.is_running(),
-            'packages': self.waydroid.list_packages(),
-            'total_packages': len(self.waydroid.list_packages())
-        })
-
     async def start(self):
         """Start the virtual agent service"""
         logger.info("Starting AIROS Virtual Agent...")
@@ -532,10 +500,7 @@ class AIROSVirtualAgent:
         (data_dir / 'logs').mkdir(exist_ok=True)
 
         # Start HTTP server
-        runner = web.AppRunner(self.app)
-        await runner.setup()
-        site = web.TCPSite(runner, '0.0.0.0', self.port)
-        await site.start()
+        await self.serve(self.port)
 
         logger.info(f"🚀 AIROS Virtual Agent running on port {self.port}")
         logger.info(f"📱 Virtual Waydroid: {'Running' if self.waydroid.is_running() else 'Stopped'}")
@@ -0,0 +1,702 @@
+#!/usr/bin/env python3
+"""
+AIROS Core - Shared records, backend interface, storage and HTTP API
+The Linux agent (Waydroid) and the virtual agent (mock container) are both
+an AgentCore over an AndroidBackend, so a request takes the same handler,
+storage and serialization path whichever container is behind it
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple, AsyncIterator
+from dataclasses import dataclass
+from enum import Enum
+
+import aiohttp
+from aiohttp import web
+import psutil
+import yaml
+
+from command_runner import (
+    CommandSpec, CommandOutcome, DEFAULT_TIMEOUT_MS, run_command, parse_batch,
+    run_batch, stream_command, write_ndjson
+)
+from event_bus import EventBus, StatePublisher
+from payload_codec import codec_middleware, COMPRESS_THRESHOLD
+from apk_analyzer import ApkAnalyzer, ApkReport
+
+logger = logging.getLogger('AIROS-Core')
+
+CONFIG_PATH = Path("/etc/airos/airos.yml")
+OS_VERSION = "0.1.0-alpha"
+
+
+class AppFixType(Enum):
+    """Types of app fixes that can be applied"""
+    PERMISSION = "permission"
+    LIBRARY = "library"
+    SERVICE = "service"
+    SIGNATURE = "signature"
+    FRAMEWORK = "framework"
+    NATIVE = "native"
+
+
+# Records are slotted and serialize through explicit field lists: asdict()
+# deep-copies recursively and cannot convert the enum
+
+
+@dataclass(slots=True)
+class AppIssue:
+    """Detected app compatibility issue"""
+    package_name: str
+    issue_type: AppFixType
+    description: str
+    stack_trace: Optional[str] = None
+    missing_component: Optional[str] = None
+    severity: str = "medium"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form, with the issue type as its value"""
+        return {
+            'package_name': self.package_name,
+            'issue_type': self.issue_type.value,
+            'description': self.description,
+            'stack_trace': self.stack_trace,
+            'missing_component': self.missing_component,
+            'severity': self.severity
+        }
+
+
+@dataclass(slots=True)
+class AppFix:
+    """Applied fix for app compatibility"""
+    issue: AppIssue
+    fix_type: str
+    patch_data: Dict[str, Any]
+    success: bool
+    timestamp: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form, including the fixed issue (patch_data is shared, not copied)"""
+        return {
+            'issue': self.issue.to_dict(),
+            'fix_type': self.fix_type,
+            'patch_data': self.patch_data,
+            'success': self.success,
+            'timestamp': self.timestamp
+        }
+
+
+class InjectedFault(Exception):
+    """Failure injected into a backend operation (virtual backend only)"""
+
+    def __init__(self, operation: str, status: int = 503):
+        super().__init__(f"Injected failure in {operation}")
+        self.operation = operation
+        self.status = status
+
+
+@web.middleware
+async def fault_middleware(request, handler):
+    """Answer requests whose backend operation failed with the configured status"""
+    try:
+        return await handler(request)
+    except InjectedFault as e:
+        logger.warning(str(e))
+        return web.json_response({'error': str(e), 'injected': True}, status=e.status)
+
+
+def predict_issues(report: ApkReport, package_name: str) -> List[AppIssue]:
+    """Issues an analyzed APK will hit, in the form the fixers take"""
+    issues = []
+
+    if report.gms_apis:
+        issues.append(AppIssue(
+            package_name=package_name,
+            issue_type=AppFixType.FRAMEWORK,
+            description=f"References Google Play Services APIs: {', '.join(report.gms_apis)}",
+            missing_component="com.google.android.gms",
+            severity="high"
+        ))
+
+    if report.abis and not report.abi:
+        issues.append(AppIssue(
+            package_name=package_name,
+            issue_type=AppFixType.NATIVE,
+            description=f"Native code only for {', '.join(report.abis)}",
+            severity="high"
+        ))
+
+    for library, needed_by in report.missing_libraries.items():
+        issues.append(AppIssue(
+            package_name=package_name,
+            issue_type=AppFixType.LIBRARY,
+            description=f"{library} needed by {', '.join(needed_by)} is not bundled",
+            missing_component=library
+        ))
+
+    if report.runtime_permissions:
+        issues.append(AppIssue(
+            package_name=package_name,
+            issue_type=AppFixType.PERMISSION,
+            description=f"Requests {len(report.runtime_permissions)} runtime permissions",
+            # One per line, the way fix_permission_issue reads a crash trace
+            stack_trace="\n".join(report.runtime_permissions),
+            severity="low"
+        ))
+
+    return issues
+
+
+def load_config(path: Path = CONFIG_PATH) -> Dict:
+    """Load the agent configuration file"""
+    if path.exists():
+        with open(path, 'r') as f:
+            return yaml.safe_load(f) or {}
+    return {}
+
+
+def write_temp_file(data: bytes, suffix: str = '.apk') -> Path:
+    """Write data to a new, uniquely named temporary file the caller removes"""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return Path(path)
+
+
+async def download_apk(apk_url: str) -> Path:
+    """
+    Fetch an APK to a temporary file the caller removes
+
+    Raises:
+        aiohttp.ClientError: The download failed or returned an error status
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(apk_url) as resp:
+            resp.raise_for_status()
+            data = await resp.read()
+    return await asyncio.to_thread(write_temp_file, data)
+
+
+class AndroidBackend:
+    """Base class for the Android container an agent drives"""
+
+    name = "base"
+    # Whether install() needs an APK, or can provide the package itself
+    needs_apk = True
+
+    def is_running(self) -> bool:
+        raise NotImplementedError
+
+    def start(self) -> bool:
+        raise NotImplementedError
+
+    def stop(self) -> bool:
+        raise NotImplementedError
+
+    def install_app(self, apk_path: str) -> bool:
+        raise NotImplementedError
+
+    def list_packages(self) -> List[str]:
+        raise NotImplementedError
+
+    def get_app_info(self, package_name: str) -> Dict:
+        raise NotImplementedError
+
+    def apk_paths(self, package_name: str) -> List[Path]:
+        """Host paths of an installed app's APKs (base and splits), empty if unknown"""
+        raise NotImplementedError
+
+    def execute_shell(self, command: str) -> Tuple[bool, str]:
+        raise NotImplementedError
+
+    def run_pm_batch(self, batch) -> List:
+        """Apply a pm_batch.PmBatch, returning one PmResult per operation"""
+        return batch.run_in_shell(self)
+
+    async def install(self, package_name: str, apk_path: Optional[Path] = None) -> bool:
+        """Install a package without blocking the event loop"""
+        if apk_path is None:
+            return False
+        return await asyncio.to_thread(self.install_app, str(apk_path))
+
+    async def run(self, spec: CommandSpec) -> CommandOutcome:
+        """Run one command of an execute or execute_batch request"""
+        return await run_command(spec)
+
+    def stream(self, spec: CommandSpec) -> AsyncIterator[Dict[str, Any]]:
+        """Output frames of one execute_stream request"""
+        return stream_command(spec)
+
+    async def simulate(self, operation: str):
+        """
+        Model the latency and failures of an API operation
+
+        Real containers pay these costs for real, so this is a no-op unless
+        the backend is a mock. May raise InjectedFault.
+        """
+        pass
+
+
+class IssueStore:
+    """SQLite store of detected issues and the fixes applied to them"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.init_database()
+
+    def init_database(self):
+        """Create the issue and fix tables"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS app_issues (
+                id INTEGER PRIMARY KEY,
+                package_name TEXT,
+                issue_type TEXT,
+                description TEXT,
+                stack_trace TEXT,
+                missing_component TEXT,
+                severity TEXT,
+                detected_at TIMESTAMP,
+                fixed BOOLEAN DEFAULT FALSE
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS app_fixes (
+                id INTEGER PRIMARY KEY,
+                issue_id INTEGER,
+                fix_type TEXT,
+                patch_data TEXT,
+                success BOOLEAN,
+                applied_at TIMESTAMP,
+                FOREIGN KEY (issue_id) REFERENCES app_issues(id)
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _insert_issue(cursor, issue: AppIssue) -> int:
+        cursor.execute('''
+            INSERT INTO app_issues
+            (package_name, issue_type, description, stack_trace, missing_component, severity, detected_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            issue.package_name,
+            issue.issue_type.value,
+            issue.description,
+            issue.stack_trace,
+            issue.missing_component,
+            issue.severity,
+            time.time()
+        ))
+        return cursor.lastrowid
+
+    def store_issue(self, issue: AppIssue):
+        """Store detected issue in database"""
+        conn = sqlite3.connect(self.db_path)
+        self._insert_issue(conn.cursor(), issue)
+        conn.commit()
+        conn.close()
+
+    def store_fix(self, fix: AppFix):
+        """Store applied fix, recording its issue first if it was never stored"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT id FROM app_issues WHERE package_name = ? ORDER BY detected_at DESC LIMIT 1",
+            (fix.issue.package_name,)
+        )
+        row = cursor.fetchone()
+        issue_id = row[0] if row else self._insert_issue(cursor, fix.issue)
+
+        cursor.execute('''
+            INSERT INTO app_fixes
+            (issue_id, fix_type, patch_data, success, applied_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (
+            issue_id,
+            fix.fix_type,
+            json.dumps(fix.patch_data),
+            fix.success,
+            fix.timestamp
+        ))
+
+        # Mark issue as fixed if successful
+        if fix.success:
+            cursor.execute(
+                "UPDATE app_issues SET fixed = TRUE WHERE id = ?",
+                (issue_id,)
+            )
+
+        conn.commit()
+        conn.close()
+
+    def seed(self, issues: List[AppIssue]):
+        """Store sample issues, once, into an empty database"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM app_issues")
+        if cursor.fetchone()[0] == 0:
+            for issue in issues:
+                self._insert_issue(cursor, issue)
+            conn.commit()
+        conn.close()
+
+    def list_issues(self, limit: int = 100) -> List[Dict]:
+        """Most recently detected issues first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT package_name, issue_type, description, severity, fixed
+            FROM app_issues
+            ORDER BY detected_at DESC
+            LIMIT ?
+        ''', (limit,))
+
+        issues = []
+        for row in cursor.fetchall():
+            issues.append({
+                'package_name': row[0],
+                'issue_type': row[1],
+                'description': row[2],
+                'severity': row[3],
+                'fixed': bool(row[4])
+            })
+
+        conn.close()
+        return issues
+
+
+class AgentCore:
+    """
+    HTTP API shared by the Linux and virtual agents
+
+    Subclasses pass their backend, assign `fixer` (an object with an
+    IssueStore at `.store`, an async fix_package(package_name) returning
+    (issues, fixes) and an async fix_issues(issues) returning fixes) and
+    add their own routes in setup_routes().
+    """
+
+    mode = "core"
+    version = OS_VERSION
+    os_name = "AIROS-Linux"
+
+    def __init__(self, config: Dict, waydroid: AndroidBackend, state_interval: float = 2.0):
+        self.config = config
+        self.waydroid = waydroid
+        self.fixer = None
+        self.start_time = time.time()
+        self.fixes_applied = 0
+        self.auto_fix = config.get('ai_agent', {}).get('auto_fix_enabled', True)
+
+        # Push channel for the web UI and monitoring clients
+        self.events = EventBus(
+            queue_size=config.get('websocket', {}).get('queue_size', 256),
+            replay_size=config.get('websocket', {}).get('replay_size', 1024)
+        )
+        self.state = StatePublisher(self.events, self.sample_state, interval=state_interval)
+        self.state_task: Optional[asyncio.Task] = None
+
+        # Pre-install scans for install_app's pre_patch; processes start on first use
+        analysis = config.get('apk_analysis', {})
+        self.apk_analyzer = ApkAnalyzer(workers=analysis.get('workers'),
+                                        device_abis=analysis.get('abis'))
+
+        self.app = web.Application(middlewares=[codec_middleware(
+            config.get('api', {}).get('compression_threshold', COMPRESS_THRESHOLD)
+        ), fault_middleware])
+        self.app.on_cleanup.append(self.on_cleanup)
+        self.setup_routes()
+
+    def setup_routes(self):
+        """Setup HTTP API routes"""
+        self.app.router.add_get('/api/status', self.handle_status)
+        self.app.router.add_get('/api/system_info', self.handle_system_info)
+        self.app.router.add_post('/api/execute', self.handle_execute)
+        self.app.router.add_post('/api/execute_batch', self.handle_execute_batch)
+        self.app.router.add_post('/api/execute_stream', self.handle_execute_stream)
+        self.app.router.add_post('/api/install_app', self.handle_install_app)
+        self.app.router.add_post('/api/fix_app', self.handle_fix_app)
+        self.app.router.add_get('/api/app_issues', self.handle_get_issues)
+        self.app.router.add_post('/api/waydroid/start', self.handle_waydroid_start)
+        self.app.router.add_post('/api/waydroid/stop', self.handle_waydroid_stop)
+        self.app.router.add_get('/api/waydroid/status', self.handle_waydroid_status)
+
+        # Event stream (WebSocket and Server-Sent Events)
+        self.events.add_routes(self.app, ws_path='/api/ws', sse_path='/api/events')
+
+    def status(self) -> Dict:
+        """Body of /api/status; blocking, handlers call it in a thread"""
+        return {
+            'status': 'running',
+            'mode': self.mode,
+            'uptime_seconds': time.time() - self.start_time,
+            'version': self.version,
+            'waydroid_running': self.waydroid.is_running(),
+            'features': {'auto_fix': self.auto_fix}
+        }
+
+    def system_info(self) -> Dict:
+        """Body of /api/system_info; blocking, handlers call it in a thread"""
+        return {
+            'os': self.os_name,
+            'version': OS_VERSION,
+            'kernel': os.uname().release,
+            'waydroid_running': self.waydroid.is_running(),
+            'installed_packages': len(self.waydroid.list_packages()),
+            'cpu_percent': psutil.cpu_percent(),
+            'memory_percent': psutil.virtual_memory().percent,
+            'disk_usage': psutil.disk_usage('/').percent,
+            'uptime': time.time() - self.start_time
+        }
+
+    def sample_state(self) -> Dict:
+        """Dashboard state pushed to subscribers as deltas"""
+        return {
+            'status': 'running',
+            'mode': self.mode,
+            'version': self.version,
+            'start_time': self.start_time,
+            'waydroid_running': self.waydroid.is_running(),
+            'installed_packages': len(self.waydroid.list_packages()),
+            'fixes_applied': self.fixes_applied,
+            'cpu_percent': round(psutil.cpu_percent(), 1),
+            'memory_percent': round(psutil.virtual_memory().percent, 1)
+        }
+
+    def record_fixes(self, fixes: List[AppFix]):
+        """Count applied fixes and push the new state"""
+        self.fixes_applied += len(fixes)
+        self.state.refresh()
+
+    async def publish_waydroid_state(self):
+        """Publish the current container state"""
+        running = await asyncio.to_thread(self.waydroid.is_running)
+        self.events.publish('waydroid', {'running': running})
+        self.state.refresh()
+
+    def after_install(self, package_name: str):
+        """Called once a package is installed; the Linux agent launches it"""
+        pass
+
+    async def handle_status(self, request):
+        """Get agent status"""
+        await self.waydroid.simulate('status')
+        return web.json_response(await asyncio.to_thread(self.status))
+
+    async def handle_system_info(self, request):
+        """Get system information"""
+        await self.waydroid.simulate('system_info')
+        return web.json_response(await asyncio.to_thread(self.system_info))
+
+    @staticmethod
+    def command_spec(data: Dict) -> CommandSpec:
+        return CommandSpec(
+            data['command'],
+            int(data.get('timeout', DEFAULT_TIMEOUT_MS)),
+            data.get('in_waydroid', False)
+        )
+
+    async def handle_execute(self, request):
+        """Execute system command"""
+        data = await request.json()
+        if not data.get('command'):
+            return web.json_response({'error': 'command required'}, status=400)
+
+        outcome = await self.waydroid.run(self.command_spec(data))
+
+        return web.json_response({
+            'success': outcome.success,
+            'output': outcome.error if outcome.status == "timeout" else outcome.output,
+            'exit_code': outcome.exit_code
+        })
+
+    async def handle_execute_batch(self, request):
+        """Execute an ordered list of commands in one round trip"""
+        data = await request.json()
+        try:
+            specs, parallel, stop_on_error = parse_batch(data)
+        except (ValueError, TypeError) as e:
+            return web.json_response({'error': str(e)}, status=400)
+
+        start = time.monotonic()
+        results = await run_batch(specs, self.waydroid.run, parallel, stop_on_error)
+
+        return web.json_response({
+            'success': all(r.success for r in results),
+            'mode': 'parallel' if parallel else 'sequential',
+            'results': [r.to_dict() for r in results],
+            'duration': time.monotonic() - start
+        })
+
+    async def handle_execute_stream(self, request):
+        """Execute a command, streaming stdout/stderr frames and the exit code"""
+        data = await request.json()
+        if not data.get('command'):
+            return web.json_response({'error': 'command required'}, status=400)
+
+        return await write_ndjson(request, self.waydroid.stream(self.command_spec(data)))
+
+    async def handle_install_app(self, request):
+        """Install an app and, when auto-fix is on, fix its known issues"""
+        data = await request.json()
+        package_name = data.get('package_name')
+        apk_url = data.get('apk_url')
+
+        if not package_name:
+            return web.json_response({'error': 'package_name required'}, status=400)
+        if self.waydroid.needs_apk and not apk_url:
+            return web.json_response({'error': 'apk_url required'}, status=400)
+
+        temp_apk = None
+        analysis = None
+        try:
+            if apk_url:
+                try:
+                    temp_apk = await download_apk(apk_url)
+                except aiohttp.ClientError as e:
+                    return web.json_response({'error': f'APK download failed: {e}'}, status=502)
+
+            # Pre-patch: scan the APK on the process pool while it installs
+            if data.get('pre_patch') and temp_apk:
+                analysis = asyncio.create_task(self.analyze_apk(temp_apk, package_name))
+
+            self.events.publish('install', {'status': 'installing'}, package_name)
+            try:
+                success = await self.waydroid.install(package_name, temp_apk)
+            except InjectedFault:
+                self.events.publish('install', {'status': 'failed'}, package_name)
+                raise
+            finally:
+                predicted = await analysis if analysis else []
+            self.events.publish('install', {
+                'status': 'installed' if success else 'failed'
+            }, package_name)
+        finally:
+            if temp_apk:
+                temp_apk.unlink(missing_ok=True)
+
+        fixes = []
+        if success:
+            # Fix what the scan predicted before the app first runs
+            if predicted:
+                fixes = await self.fixer.fix_issues(predicted)
+            self.after_install(package_name)
+            if data.get('auto_fix', self.auto_fix):
+                await self.waydroid.simulate('auto_fix')
+                _, found = await self.fixer.fix_package(package_name)
+                fixes.extend(found)
+            self.record_fixes(fixes)
+
+        response = {
+            'success': success,
+            'package_name': package_name,
+            'fixes_applied': len(fixes),
+            'fixes': [fix.to_dict() for fix in fixes]
+        }
+        if analysis:
+            response['predicted_issues'] = [issue.to_dict() for issue in predicted]
+        return web.json_response(response)
+
+    async def analyze_apk(self, apk_path: Path, package_name: str) -> List[AppIssue]:
+        """Predicted issues of an APK; an unreadable APK predicts none"""
+        try:
+            report = await self.apk_analyzer.analyze(apk_path)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            logger.warning(f"Pre-install analysis of {package_name} failed: {e}")
+            return []
+        logger.info(f"Analyzed {package_name} in {report.duration:.2f}s: "
+                    f"{len(report.gms_apis)} GMS APIs, ABI {report.abi}, "
+                    f"{len(report.missing_libraries)} missing libraries")
+        return predict_issues(report, package_name)
+
+    async def handle_fix_app(self, request):
+        """Manually trigger app fixing"""
+        data = await request.json()
+        package_name = data.get('package_name')
+
+        if not package_name:
+            return web.json_response({'error': 'package_name required'}, status=400)
+
+        logger.info(f"Applying fixes to {package_name}")
+        await self.waydroid.simulate('fix_app')
+        issues, fixes = await self.fixer.fix_package(package_name)
+        self.record_fixes(fixes)
+
+        return web.json_response({
+            'package_name': package_name,
+            'issues_found': len(issues),
+            'fixes_applied': [fix.to_dict() for fix in fixes],
+            'success': True
+        })
+
+    async def handle_get_issues(self, request):
+        """Get detected app issues from database"""
+        issues = self.fixer.store.list_issues()
+        return web.json_response({
+            'issues': issues,
+            'total': len(issues)
+        })
+
+    async def handle_waydroid_start(self, request):
+        """Start Waydroid container"""
+        try:
+            await self.waydroid.simulate('waydroid_start')
+            success = await asyncio.to_thread(self.waydroid.start)
+        except InjectedFault:
+            success = False
+        await self.publish_waydroid_state()
+        return web.json_response({'success': success})
+
+    async def handle_waydroid_stop(self, request):
+        """Stop Waydroid container"""
+        try:
+            await self.waydroid.simulate('waydroid_stop')
+            success = await asyncio.to_thread(self.waydroid.stop)
+        except InjectedFault:
+            success = False
+        await self.publish_waydroid_state()
+        return web.json_response({'success': success})
+
+    async def handle_waydroid_status(self, request):
+        """Get Waydroid status"""
+        packages, running = await asyncio.gather(
+            asyncio.to_thread(self.waydroid.list_packages),
+            asyncio.to_thread(self.waydroid.is_running)
+        )
+        return web.json_response({
+            'running': running,
+            'packages': packages,
+            'total_packages': len(packages)
+        })
+
+    async def on_cleanup(self, app):
+        """Stop the state publisher and the analyzer's worker processes with the app"""
+        if self.state_task:
+            self.state_task.cancel()
+            await asyncio.gather(self.state_task, return_exceptions=True)
+            self.state_task = None
+        await self.apk_analyzer.close()
+
+    async def serve(self, port: int) -> web.AppRunner:
+        """Start the HTTP API and push state deltas while anyone is subscribed"""
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        site = web.TCPSite(runner, '0.0.0.0', port)
+        await site.start()
+        self.state_task = asyncio.create_task(self.state.run())
+        return runner
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+AIROS APK Analyzer - Pre-install static analysis on a process pool
+Parses the binary manifest, native libraries and DEX type tables of an
+APK across all cores, reporting what the app will need under Waydroid
+(GMS APIs, a loadable ABI, unbundled libraries, runtime permissions)
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import asyncio
+import logging
+import zipfile
+import argparse
+import platform
+from pathlib import Path
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Any, Sequence, Tuple
+
+from dex_index import ApkDexIndex, gms_api
+
+logger = logging.getLogger('AIROS-APK')
+
+# Android ABIs the container can load, best first, by host machine
+HOST_ABIS = {
+    "aarch64": ("arm64-v8a", "armeabi-v7a", "armeabi"),
+    "armv7l": ("armeabi-v7a", "armeabi"),
+    "x86_64": ("x86_64", "x86"),
+    "i686": ("x86",)
+}
+
+# NDK libraries every Android system image provides
+SYSTEM_LIBRARIES = frozenset({
+    "libc.so", "libm.so", "libdl.so", "liblog.so", "libz.so", "libstdc++.so",
+    "libandroid.so", "libjnigraphics.so", "libEGL.so", "libGLESv1_CM.so",
+    "libGLESv2.so", "libGLESv3.so", "libvulkan.so", "libOpenSLES.so",
+    "libOpenMAXAL.so", "libmediandk.so", "libcamera2ndk.so", "libaaudio.so",
+    "libamidi.so", "libnativewindow.so", "libneuralnetworks.so", "libsync.so",
+    "libbinder_ndk.so", "libicu.so"
+})
+
+# Runtime permissions Waydroid does not grant at install time
+RUNTIME_PERMISSIONS = frozenset({
+    "android.permission.CAMERA", "android.permission.RECORD_AUDIO",
+    "android.permission.ACCESS_FINE_LOCATION", "android.permission.ACCESS_COARSE_LOCATION",
+    "android.permission.ACCESS_BACKGROUND_LOCATION", "android.permission.READ_CONTACTS",
+    "android.permission.WRITE_CONTACTS", "android.permission.READ_CALENDAR",
+    "android.permission.WRITE_CALENDAR", "android.permission.READ_PHONE_STATE",
+    "android.permission.CALL_PHONE", "android.permission.READ_SMS",
+    "android.permission.SEND_SMS", "android.permission.READ_EXTERNAL_STORAGE",
+    "android.permission.WRITE_EXTERNAL_STORAGE", "android.permission.READ_MEDIA_IMAGES",
+    "android.permission.READ_MEDIA_VIDEO", "android.permission.READ_MEDIA_AUDIO",
+    "android.permission.POST_NOTIFICATIONS", "android.permission.BODY_SENSORS",
+    "android.permission.BLUETOOTH_CONNECT", "android.permission.BLUETOOTH_SCAN",
+    "android.permission.NEARBY_WIFI_DEVICES"
+})
+
+# Binary XML (AXML) chunk types and value types
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_START_ELEMENT_TYPE = 0x0102
+UTF8_FLAG = 1 << 8
+NO_ENTRY = 0xFFFFFFFF
+TYPE_STRING = 0x03
+TYPE_INT_BOOLEAN = 0x12
+
+# ELF section and dynamic entry types
+SHT_DYNAMIC = 6
+DT_NULL = 0
+DT_NEEDED = 1
+
+
+def host_abis() -> Tuple[str, ...]:
+    return HOST_ABIS.get(platform.machine(), HOST_ABIS["aarch64"])
+
+
+def _string_pool(data: bytes, offset: int) -> List[str]:
+    header_size, = struct.unpack_from('<H', data, offset + 2)
+    count, _, flags, strings_start = struct.unpack_from('<IIII', data, offset + 8)
+    offsets = struct.unpack_from(f'<{count}I', data, offset + header_size)
+    base = offset + strings_start
+    strings = []
+
+    for relative in offsets:
+        pos = base + relative
+        if flags & UTF8_FLAG:
+            pos += 2 if data[pos] & 0x80 else 1  # UTF-16 length, unused
+            length = data[pos]
+            if length & 0x80:
+                length = ((length & 0x7F) << 8) | data[pos + 1]
+                pos += 1
+            pos += 1
+            strings.append(data[pos:pos + length].decode('utf-8', 'replace'))
+        else:
+            length, = struct.unpack_from('<H', data, pos)
+            pos += 2
+            if length & 0x8000:
+                low, = struct.unpack_from('<H', data, pos)
+                length = ((length & 0x7FFF) << 16) | low
+                pos += 2
+            strings.append(data[pos:pos + length * 2].decode('utf-16-le', 'replace'))
+
+    return strings
+
+
+def parse_axml(data: bytes) -> List[Tuple[str, Dict[str, Any]]]:
+    """(tag, attributes) of every element of a binary AndroidManifest.xml"""
+    elements = []
+    strings: List[str] = []
+
+    def string(index: int) -> str:
+        return strings[index] if index < len(strings) else ""
+
+    pos, = struct.unpack_from('<H', data, 2)
+    while pos + 8 <= len(data):
+        chunk_type, header_size, size = struct.unpack_from('<HHI', data, pos)
+        if size < 8:
+            break
+
+        if chunk_type == RES_STRING_POOL_TYPE:
+            strings = _string_pool(data, pos)
+        elif chunk_type == RES_XML_START_ELEMENT_TYPE:
+            ext = pos + header_size
+            _, name, attr_start, attr_size, attr_count = struct.unpack_from('<IIHHH', data, ext)
+            attributes = {}
+            for i in range(attr_count):
+                _, attr_name, raw, _, _, value_type, value = struct.unpack_from(
+                    '<IIIHBBI', data, ext + attr_start + i * attr_size)
+                if raw != NO_ENTRY:
+                    attributes[string(attr_name)] = string(raw)
+                elif value_type == TYPE_STRING:
+                    attributes[string(attr_name)] = string(value)
+                elif value_type == TYPE_INT_BOOLEAN:
+                    attributes[string(attr_name)] = value != 0
+                else:
+                    attributes[string(attr_name)] = value
+            elements.append((string(name), attributes))
+
+        pos += size
+
+    return elements
+
+
+def scan_manifest(data: bytes) -> Dict[str, Any]:
+    """Package, permissions, libraries and GMS references of a manifest"""
+    result = {"package_name": None, "version_name": None, "permissions": [],
+              "uses_libraries": {}, "gms_apis": set()}
+
+    for tag, attributes in parse_axml(data):
+        name = attributes.get("name")
+        if tag == "manifest":
+            result["package_name"] = attributes.get("package")
+            result["version_name"] = attributes.get("versionName")
+        elif tag in ("uses-permission", "uses-permission-sdk-23") and name:
+            result["permissions"].append(name)
+        elif tag == "uses-library" and name:
+            result["uses_libraries"][name] = attributes.get("required", True)
+        elif isinstance(name, str):
+            # meta-data keys and service/receiver/provider classes
+            api = gms_api(name)
+            if api:
+                result["gms_apis"].add(api)
+
+    return result
+
+
+def scan_elf(data: bytes) -> Dict[str, Any]:
+    """DT_NEEDED libraries of a shared object"""
+    if data[:4] != b"\x7fELF":
+        raise ValueError("not an ELF file")
+
+    is_64 = data[4] == 2
+    endian = "<" if data[5] == 1 else ">"
+    if is_64:
+        shoff, = struct.unpack_from(endian + 'Q', data, 0x28)
+        shentsize, shnum = struct.unpack_from(endian + 'HH', data, 0x3A)
+        section_format, dynamic_format = endian + 'IIQQQQIIQQ', endian + 'qQ'
+    else:
+        shoff, = struct.unpack_from(endian + 'I', data, 0x20)
+        shentsize, shnum = struct.unpack_from(endian + 'HH', data, 0x2E)
+        section_format, dynamic_format = endian + 'IIIIIIIIII', endian + 'iI'
+
+    sections = [struct.unpack_from(section_format, data, shoff + i * shentsize)
+                for i in range(shnum)]
+    needed = []
+    for section in sections:
+        if section[1] != SHT_DYNAMIC:
+            continue
+        strtab_offset = sections[section[6]][4]
+        entry_size = struct.calcsize(dynamic_format)
+        for pos in range(section[4], section[4] + section[5], entry_size):
+            tag, value = struct.unpack_from(dynamic_format, data, pos)
+            if tag == DT_NULL:
+                break
+            if tag == DT_NEEDED:
+                end = data.index(b"\0", strtab_offset + value)
+                needed.append(data[strtab_offset + value:end].decode('utf-8', 'replace'))
+
+    return {"needed": needed}
+
+
+SCANNERS = {"manifest": scan_manifest, "elf": scan_elf}
+
+
+def scan_member(apk_path: str, member: str, kind: str) -> Dict[str, Any]:
+    """Process-pool job: scan one ZIP member (DEX files through their index)"""
+    if kind == "dex":
+        with ApkDexIndex(apk_path, [member]) as index:
+            return {"gms_apis": index.gms_apis()}
+
+    with zipfile.ZipFile(apk_path) as apk:
+        data = apk.read(member)
+    return SCANNERS[kind](data)
+
+
+@dataclass
+class ApkReport:
+    """What static analysis found in one APK"""
+    apk_path: str
+    package_name: Optional[str] = None
+    version_name: Optional[str] = None
+    permissions: List[str] = field(default_factory=list)
+    uses_libraries: Dict[str, bool] = field(default_factory=dict)
+    gms_apis: List[str] = field(default_factory=list)
+    abis: List[str] = field(default_factory=list)
+    abi: Optional[str] = None  # the ABI the container would load
+    native_libs: List[str] = field(default_factory=list)
+    missing_libraries: Dict[str, List[str]] = field(default_factory=dict)  # library -> needed by
+    errors: List[str] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def runtime_permissions(self) -> List[str]:
+        return [p for p in self.permissions if p in RUNTIME_PERMISSIONS]
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['runtime_permissions'] = self.runtime_permissions
+        return data
+
+
+class ApkAnalyzer:
+    """
+    Static APK analysis spread over a process pool
+
+    The manifest, every classes*.dex and the native libraries of the ABI
+    the container would load are separate jobs, so one large APK uses all
+    cores and several APKs share the same pool.
+    """
+
+    def __init__(self, workers: Optional[int] = None, device_abis: Optional[Sequence[str]] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.device_abis = tuple(device_abis or host_abis())
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def plan(self, apk_path: Path) -> Tuple[List[Tuple[str, str]], List[str], Optional[str], List[str]]:
+        """Jobs for one APK, plus the ABIs it ships, the ABI to load and its libraries"""
+        with zipfile.ZipFile(apk_path) as apk:
+            names = apk.namelist()
+
+        jobs = [(name, "dex") for name in names
+                if name.startswith("classes") and name.endswith(".dex")]
+        if "AndroidManifest.xml" in names:
+            jobs.append(("AndroidManifest.xml", "manifest"))
+
+        libs_by_abi: Dict[str, List[str]] = {}
+        for name in names:
+            parts = name.split("/")
+            if len(parts) == 3 and parts[0] == "lib" and parts[2].endswith(".so"):
+                libs_by_abi.setdefault(parts[1], []).append(name)
+
+        abi = next((a for a in self.device_abis if a in libs_by_abi), None)
+        native_libs = sorted(libs_by_abi.get(abi, []))
+        jobs.extend((name, "elf") for name in native_libs)
+        return jobs, sorted(libs_by_abi), abi, native_libs
+
+    async def analyze(self, apk_path: Path) -> ApkReport:
+        """Scan one APK; unreadable members are listed in the report's errors"""
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        jobs, abis, abi, native_libs = await asyncio.to_thread(self.plan, apk_path)
+
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        results = await asyncio.gather(*[
+            loop.run_in_executor(self.pool, scan_member, str(apk_path), member, kind)
+            for member, kind in jobs
+        ], return_exceptions=True)
+
+        report = ApkReport(str(apk_path), abis=abis, abi=abi,
+                           native_libs=[name.rsplit("/", 1)[1] for name in native_libs])
+        gms_apis = set()
+        needed: Dict[str, List[str]] = {}
+
+        for (member, kind), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Could not scan {member} of {apk_path}: {result}")
+                report.errors.append(f"{member}: {result}")
+                continue
+            gms_apis |= result.get("gms_apis", set())
+            if kind == "manifest":
+                report.package_name = result["package_name"]
+                report.version_name = result["version_name"]
+                report.permissions = result["permissions"]
+                report.uses_libraries = result["uses_libraries"]
+            elif kind == "elf":
+                for library in result["needed"]:
+                    needed.setdefault(library, []).append(member.rsplit("/", 1)[1])
+
+        bundled = set(report.native_libs)
+        report.missing_libraries = {
+            library: users for library, users in sorted(needed.items())
+            if library not in bundled and library not in SYSTEM_LIBRARIES
+        }
+        report.gms_apis = sorted(gms_apis)
+        report.duration = time.monotonic() - start
+        return report
+
+    async def close(self):
+        """Stop the worker processes"""
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+
+async def analyze_all(paths: List[Path], workers: Optional[int], abis: Optional[List[str]]) -> List[ApkReport]:
+    analyzer = ApkAnalyzer(workers, abis)
+    try:
+        return await asyncio.gather(*[analyzer.analyze(path) for path in paths])
+    finally:
+        await analyzer.close()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Predict the fixes APKs will need before install")
+    parser.add_argument('apks', type=Path, nargs='+')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--abi', action='append', default=None,
+                        help="container ABI, best first; repeatable (default: from the host)")
+    args = parser.parse_args()
+
+    reports = asyncio.run(analyze_all(args.apks, args.workers, args.abi))
+    json.dump([r.to_dict() for r in reports], sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+AIROS Load Benchmark - Seeded mixed-workload load generator
+Runs the virtual agent in a subprocess (or targets a running agent) and
+drives it with concurrent clients issuing a weighted, reproducible mix of
+API calls, reporting p50/p95/p99 latency and throughput per operation
+alongside agent RSS and CPU sampled over the run
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+import aiohttp
+import psutil
+
+from bench_ui_push import AGENT_LAUNCHER, wait_for_agent
+
+DEMO_PACKAGES = [
+    "com.whatsapp", "com.spotify.music", "com.instagram.android",
+    "com.netflix.mediaclient", "com.android.chrome"
+]
+CRASH_TYPES = ["permission", "library", "google_services", "service"]
+# install_app adds packages to the mock; a bounded name pool keeps its state flat
+INSTALL_POOL = 50
+
+# Relative operation weights per workload profile
+PROFILES = {
+    "dashboard": {"status": 5, "system_info": 5},
+    "mixed": {"status": 40, "system_info": 20, "install_app": 10, "fix_app": 10,
+              "simulate_crash": 10, "test_compatibility": 10},
+    "install": {"install_app": 50, "fix_app": 30, "status": 20},
+    "crash_storm": {"simulate_crash": 70, "status": 30}
+}
+
+
+def make_request(op: str, rng: random.Random) -> Tuple[str, str, Optional[Dict]]:
+    """(method, endpoint, body) for one operation"""
+    if op == "status":
+        return "GET", "status", None
+    if op == "system_info":
+        return "GET", "system_info", None
+    if op == "install_app":
+        return "POST", "install_app", {
+            "package_name": f"com.loadgen.app{rng.randrange(INSTALL_POOL)}",
+            "auto_fix": rng.random() < 0.5
+        }
+    if op == "fix_app":
+        return "POST", "fix_app", {"package_name": rng.choice(DEMO_PACKAGES)}
+    if op == "simulate_crash":
+        return "POST", "demo/simulate_crash", {
+            "package_name": rng.choice(DEMO_PACKAGES),
+            "crash_type": rng.choice(CRASH_TYPES)
+        }
+    if op == "test_compatibility":
+        return "POST", "demo/test_compatibility", {
+            "apps": rng.sample(DEMO_PACKAGES, rng.randint(1, 3))
+        }
+    raise ValueError(f"Unknown operation: {op}")
+
+
+def schedule(profile: Dict[str, int], count: int, seed: int) -> List[Tuple[str, str, str, Optional[Dict]]]:
+    """The fixed sequence of (op, method, endpoint, body) one client issues"""
+    rng = random.Random(seed)
+    ops, weights = zip(*sorted(profile.items()))
+    return [(op,) + make_request(op, rng) for op in rng.choices(ops, weights, k=count)]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+async def run_client(session: aiohttp.ClientSession, base_url: str,
+                     requests: List[Tuple[str, str, str, Optional[Dict]]],
+                     deadline: float, timeout: float,
+                     samples: Dict[str, List[float]], errors: Dict[str, int]):
+    """One closed-loop client: each request is sent when the previous one returns"""
+    for op, method, endpoint, body in requests:
+        if time.monotonic() >= deadline:
+            return
+        start = time.perf_counter()
+        try:
+            async with session.request(method, f"{base_url}/{endpoint}", json=body,
+                                       timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                await resp.read()
+                ok = resp.status < 400
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+        if ok:
+            samples.setdefault(op, []).append(time.perf_counter() - start)
+        else:
+            errors[op] = errors.get(op, 0) + 1
+
+
+async def sample_agent(agent: Optional[psutil.Process], interval: float,
+                       timeline: List[Dict[str, float]], began: float):
+    """Append agent RSS and CPU every interval until cancelled"""
+    if agent is None:
+        return
+    agent.cpu_percent(None)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            timeline.append({
+                "t": round(time.monotonic() - began, 2),
+                "rss_mb": agent.memory_info().rss / 1048576,
+                "cpu_percent": agent.cpu_percent(None)
+            })
+        except psutil.Error:
+            return
+
+
+async def run_load(base_url: str, agent: Optional[psutil.Process], args) -> Dict[str, Any]:
+    profile = PROFILES[args.profile]
+    samples: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    timeline: List[Dict[str, float]] = []
+
+    began = time.monotonic()
+    deadline = began + args.duration if args.duration else float("inf")
+    sampler = asyncio.create_task(sample_agent(agent, args.sample_interval, timeline, began))
+    cpu_before = sum(agent.cpu_times()[:2]) if agent else None
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*[
+            run_client(session, base_url,
+                       schedule(profile, args.requests, args.seed * 1000 + client),
+                       deadline, args.timeout, samples, errors)
+            for client in range(args.concurrency)
+        ])
+
+    wall_time = time.monotonic() - began
+    sampler.cancel()
+    await asyncio.gather(sampler, return_exceptions=True)
+
+    operations = {}
+    for op in sorted(set(samples) | set(errors)):
+        latencies = sorted(samples.get(op, []))
+        operations[op] = {
+            "count": len(latencies),
+            "errors": errors.get(op, 0),
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+            "throughput": len(latencies) / wall_time
+        }
+
+    everything = sorted(v for values in samples.values() for v in values)
+    return {
+        "profile": args.profile,
+        "seed": args.seed,
+        "concurrency": args.concurrency,
+        "wall_time": wall_time,
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "throughput": len(everything) / wall_time,
+        "p50_ms": percentile(everything, 0.50) * 1000,
+        "p95_ms": percentile(everything, 0.95) * 1000,
+        "p99_ms": percentile(everything, 0.99) * 1000,
+        "agent_cpu_seconds": sum(agent.cpu_times()[:2]) - cpu_before if agent else None,
+        "peak_rss_mb": max((s["rss_mb"] for s in timeline), default=None),
+        "operations": operations,
+        "timeline": timeline
+    }
+
+
+async def benchmark(args) -> Dict[str, Any]:
+    if args.url:
+        agent = psutil.Process(args.agent_pid) if args.agent_pid else None
+        base_url = args.url.rstrip("/")
+        await wait_for_agent(base_url)
+        return await run_load(base_url, agent, args)
+
+    base_url = f"http://127.0.0.1:{args.port}/api"
+    proc = subprocess.Popen(
+        [sys.executable, "-c", AGENT_LAUNCHER.format(port=args.port)],
+        cwd=Path(__file__).parent,
+        env={**os.environ, "AIROS_VIRTUAL_PROFILE": args.agent_profile},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        await wait_for_agent(base_url)
+        return await run_load(base_url, psutil.Process(proc.pid), args)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def regressions(baseline: Dict[str, Any], report: Dict[str, Any], tolerance: float) -> List[str]:
+    """Operations whose p95 grew by more than tolerance over the baseline"""
+    found = []
+    for op, current in report["operations"].items():
+        before = baseline.get("operations", {}).get(op)
+        if before and before["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            found.append(f"{op}: p95 {before['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+    return found
+
+
+def print_report(report: Dict[str, Any]):
+    """Print a human readable latency summary"""
+    print(f"profile {report['profile']}, {report['concurrency']} clients, seed {report['seed']}, "
+          f"{report['wall_time']:.1f}s\n")
+    print(f"{'operation':<20} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'req/s':>7}")
+    for op, r in report["operations"].items():
+        print(f"{op:<20} {r['count']:>6} {r['errors']:>6} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['throughput']:>7.1f}")
+    print(f"{'all':<20} {report['requests']:>6} {report['errors']:>6} {report['p50_ms']:>8.1f} "
+          f"{report['p95_ms']:>8.1f} {report['p99_ms']:>8.1f} {report['throughput']:>7.1f}")
+
+    if report["timeline"]:
+        print(f"\nAgent CPU:     {report['agent_cpu_seconds']:.2f}s")
+        print(f"Peak RSS:      {report['peak_rss_mb']:.1f} MiB")
+        print(f"{'t':>6} {'rss MiB':>8} {'cpu %':>6}")
+        for s in report["timeline"]:
+            print(f"{s['t']:>6.1f} {s['rss_mb']:>8.1f} {s['cpu_percent']:>6.1f}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Load test the AIROS agent API")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default="mixed")
+    parser.add_argument('--concurrency', type=int, default=8, help="concurrent clients")
+    parser.add_argument('--requests', type=int, default=100, help="requests per client")
+    parser.add_argument('--duration', type=float, default=None,
+                        help="stop after this many seconds even if requests remain")
+    parser.add_argument('--seed', type=int, default=1, help="seed for the request mix")
+    parser.add_argument('--timeout', type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument('--sample-interval', type=float, default=1.0,
+                        help="seconds between agent RSS/CPU samples")
+    parser.add_argument('--port', type=int, default=18083, help="port for the spawned agent")
+    parser.add_argument('--agent-profile', choices=("instant", "demo", "phone"), default="demo",
+                        help="simulated latency profile of the spawned virtual agent")
+    parser.add_argument('--url', default=None,
+                        help="API base URL of an already running agent, e.g. http://host:8082/api")
+    parser.add_argument('--agent-pid', type=int, default=None,
+                        help="PID of the agent at --url, to sample its RSS/CPU")
+    parser.add_argument('--json', type=Path, default=None, help="write the report as JSON")
+    parser.add_argument('--baseline', type=Path, default=None,
+                        help="earlier JSON report; exit non-zero on p95 regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed p95 growth over the baseline (fraction)")
+    args = parser.parse_args()
+
+    report = asyncio.run(benchmark(args))
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(json.load(f), report, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+AIROS Payload Codec Benchmark - Bytes on the wire and CPU per encoding
+Encodes representative list_apps, get_logs and fixes_applied responses in
+every available format/compression pair and reports body size, agent-side
+encode time and client-side decode time
+"""
+
+import time
+import random
+import argparse
+from typing import Any, Callable, Dict, List
+
+import payload_codec
+from payload_codec import (
+    JSON_TYPE, available_formats, available_encodings,
+    encode, decode, compress, decompress
+)
+
+PERMISSIONS = [
+    "android.permission.INTERNET", "android.permission.CAMERA",
+    "android.permission.RECORD_AUDIO", "android.permission.ACCESS_FINE_LOCATION",
+    "android.permission.READ_CONTACTS", "android.permission.POST_NOTIFICATIONS"
+]
+
+
+def apps_payload(rng: random.Random, count: int = 250) -> Dict[str, Any]:
+    """Shape of an apps/list response"""
+    apps = []
+    for i in range(count):
+        package = f"com.vendor{i % 40}.app{i}"
+        apps.append({
+            "packageName": package,
+            "versionName": f"{rng.randint(1, 12)}.{rng.randint(0, 30)}.{rng.randint(0, 99)}",
+            "versionCode": rng.randint(1000, 999999),
+            "enabled": rng.random() > 0.05,
+            "system": i < 80,
+            "firstInstallTime": 1760000000000 + rng.randint(0, 10**9),
+            "dataDir": f"/data/user/0/{package}",
+            "permissions": rng.sample(PERMISSIONS, rng.randint(1, 4))
+        })
+    return {"apps": apps}
+
+
+def logs_payload(rng: random.Random, count: int = 1000) -> Dict[str, Any]:
+    """Shape of a debug/logs response"""
+    tags = ["ActivityManager", "PackageManager", "AIROS", "WindowManager", "chatty"]
+    logs = [
+        f"10-18 09:{i // 60 % 60:02d}:{i % 60:02d}.{rng.randint(0, 999):03d}  "
+        f"{rng.randint(100, 9999):5d} {rng.randint(100, 9999):5d} "
+        f"{rng.choice('DIWE')} {rng.choice(tags)}: "
+        f"{rng.choice(['Start proc', 'Displayed', 'Killing', 'uid=1000 identical'])} "
+        f"com.vendor{rng.randint(0, 40)}.app{rng.randint(0, 250)} +{rng.randint(1, 900)}ms"
+        for i in range(count)
+    ]
+    return {"logs": logs}
+
+
+def fixes_payload(rng: random.Random, count: int = 40) -> Dict[str, Any]:
+    """Shape of an install_app response with its fixes_applied array"""
+    fixes = []
+    for i in range(count):
+        fixes.append({
+            "issue": {
+                "package_name": f"com.vendor{i % 40}.app{i}",
+                "issue_type": rng.choice(["framework", "permission", "library", "service"]),
+                "description": "Missing Google Play Services dependency",
+                "severity": rng.randint(1, 5),
+                "missing_component": "com.google.android.gms",
+                "suggested_fix": "Route GMS calls to MicroG"
+            },
+            "fix_type": rng.choice(["microg_redirect", "permission_grant", "library_shim"]),
+            "patch_data": {"target": "com.google.android.gms", "redirect_to": "org.microg.gms"},
+            "success": True,
+            "applied_at": 1760000000.0 + i
+        })
+    return {"success": True, "fixes_applied": len(fixes), "fixes": fixes}
+
+
+def per_call(fn: Callable[[], Any], repeat: int) -> float:
+    """Mean seconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def measure(name: str, data: Any, repeat: int, threshold: int) -> List[Dict[str, Any]]:
+    rows = []
+    for content_type in available_formats():
+        for encoding in [None] + available_encodings():
+            raw = encode(data, content_type)
+            if encoding and len(raw) < threshold:
+                continue
+            body = compress(raw, encoding) if encoding else raw
+
+            def agent_side():
+                out = encode(data, content_type)
+                return compress(out, encoding) if encoding else out
+
+            def client_side():
+                return decode(decompress(body, encoding), content_type)
+
+            assert client_side() == data
+            rows.append({
+                "payload": name,
+                "format": content_type.split("/")[1],
+                "encoding": encoding or "identity",
+                "bytes": len(body),
+                "encode_ms": per_call(agent_side, repeat) * 1000,
+                "decode_ms": per_call(client_side, repeat) * 1000
+            })
+    return rows
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Compare API payload encodings")
+    parser.add_argument('--repeat', type=int, default=50, help="timed iterations per cell")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = {
+        "list_apps": apps_payload(rng),
+        "get_logs": logs_payload(rng),
+        "fixes_applied": fixes_payload(rng)
+    }
+
+    missing = [name for name, module in (("zstandard", payload_codec.zstandard),
+                                          ("msgpack", payload_codec.msgpack),
+                                          ("cbor2", payload_codec.cbor2)) if module is None]
+    if missing:
+        print(f"Not installed, skipped: {', '.join(missing)}\n")
+
+    print(f"{'payload':<14} {'format':<8} {'encoding':<9} {'bytes':>8} {'ratio':>6} "
+          f"{'agent ms':>9} {'client ms':>10}")
+    for name, data in payloads.items():
+        rows = measure(name, data, args.repeat, payload_codec.COMPRESS_THRESHOLD)
+        baseline = next(r["bytes"] for r in rows
+                        if r["format"] == JSON_TYPE.split("/")[1] and r["encoding"] == "identity")
+        for r in rows:
+            print(f"{r['payload']:<14} {r['format']:<8} {r['encoding']:<9} {r['bytes']:>8} "
+                  f"{r['bytes'] / baseline:>6.2f} {r['encode_ms']:>9.3f} {r['decode_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+AIROS Record Benchmark - Memory and serialization cost of issue/fix records
+Builds fixes_applied responses with thousands of AppFix records and compares
+the slotted records and their to_dict() encoder against the previous
+dict-backed dataclasses serialized with asdict() plus enum patching
+"""
+
+import time
+import random
+import argparse
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional
+
+from airos_core import AppFixType, AppIssue, AppFix
+from payload_codec import encode
+
+FIX_TYPES = ["microg_patch", "grant_permission", "library_shim", "service_stub"]
+
+
+@dataclass
+class LegacyIssue:
+    """AppIssue as it was before slots"""
+    package_name: str
+    issue_type: AppFixType
+    description: str
+    stack_trace: Optional[str] = None
+    missing_component: Optional[str] = None
+    severity: str = "medium"
+
+
+@dataclass
+class LegacyFix:
+    """AppFix as it was before slots"""
+    issue: LegacyIssue
+    fix_type: str
+    patch_data: Dict[str, Any]
+    success: bool
+    timestamp: float
+
+
+def legacy_to_dict(fix: LegacyFix) -> Dict[str, Any]:
+    """The per-handler serialization the agents used to do"""
+    fix_dict = asdict(fix)
+    fix_dict['issue']['issue_type'] = fix.issue.issue_type.value
+    return fix_dict
+
+
+def make_fixes(issue_cls, fix_cls, count: int, seed: int) -> List[Any]:
+    rng = random.Random(seed)
+    types = list(AppFixType)
+    fixes = []
+    for i in range(count):
+        issue = issue_cls(
+            package_name=f"com.vendor{i % 40}.app{i}",
+            issue_type=rng.choice(types),
+            description="Missing Google Play Services dependency",
+            stack_trace="java.lang.SecurityException: ..." if rng.random() < 0.3 else None,
+            missing_component="com.google.android.gms",
+            severity=rng.choice(["low", "medium", "high"])
+        )
+        fixes.append(fix_cls(
+            issue=issue,
+            fix_type=rng.choice(FIX_TYPES),
+            patch_data={"target": "com.google.android.gms", "redirect_to": "org.microg.gms"},
+            success=True,
+            timestamp=1760000000.0 + i
+        ))
+    return fixes
+
+
+def allocated(build: Callable[[], Any]) -> int:
+    """Bytes still allocated by what build() returns"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    """Fastest of `repeat` runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(count: int, repeat: int, seed: int) -> Dict[str, Dict[str, float]]:
+    legacy = make_fixes(LegacyIssue, LegacyFix, count, seed)
+    slotted = make_fixes(AppIssue, AppFix, count, seed)
+    assert [legacy_to_dict(f) for f in legacy] == [f.to_dict() for f in slotted]
+
+    rows = {}
+    for name, fixes, issue_cls, fix_cls, to_dict in (
+            ("asdict", legacy, LegacyIssue, LegacyFix, legacy_to_dict),
+            ("slots", slotted, AppIssue, AppFix, lambda fix: fix.to_dict())):
+        rows[name] = {
+            "memory_kb": allocated(lambda: make_fixes(issue_cls, fix_cls, count, seed)) / 1024,
+            "to_dict_ms": best_of(lambda: [to_dict(f) for f in fixes], repeat) * 1000,
+            "response_ms": best_of(lambda: encode({
+                "success": True,
+                "fixes_applied": len(fixes),
+                "fixes": [to_dict(f) for f in fixes]
+            }), repeat) * 1000
+        }
+    return rows
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark issue/fix record serialization")
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 5000, 20000],
+                        help="fixes per response")
+    parser.add_argument('--repeat', type=int, default=10, help="timed runs per cell (best is kept)")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'fixes':>6} {'records':<8} {'memory KB':>10} {'to_dict ms':>11} {'response ms':>12}")
+    for count in args.counts:
+        rows = measure(count, args.repeat, args.seed)
+        for name, r in rows.items():
+            print(f"{count:>6} {name:<8} {r['memory_kb']:>10.0f} {r['to_dict_ms']:>11.2f} "
+                  f"{r['response_ms']:>12.2f}")
+        speedup = rows["asdict"]["response_ms"] / rows["slots"]["response_ms"]
+        print(f"{'':>6} {'':<8} {'':>10} {'':>11} {speedup:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+AIROS UI Push Benchmark - Dashboard polling vs server push
+Runs the virtual agent in a subprocess and measures request rate, bytes on
+the wire and agent CPU time for N dashboards polling /api/status and
+/api/system_info versus N dashboards on the /api/events stream
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from typing import Dict
+
+import aiohttp
+import psutil
+
+AGENT_LAUNCHER = (
+    "import asyncio, airos_agent_virtual as a; "
+    "agent = a.AIROSVirtualAgent(); agent.port = {port}; "
+    "asyncio.run(agent.start())"
+)
+
+
+async def wait_for_agent(base_url: str, timeout: float = 15.0):
+    """Wait until the agent answers /api/status"""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base_url}/status") as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Agent did not start")
+
+
+async def poll_dashboard(session: aiohttp.ClientSession, base_url: str,
+                         interval: float, deadline: float, counters: Dict):
+    """One dashboard doing what index.html used to do on setInterval"""
+    while time.monotonic() < deadline:
+        for endpoint in ("status", "system_info"):
+            async with session.get(f"{base_url}/{endpoint}") as resp:
+                counters["bytes"] += len(await resp.read())
+                counters["requests"] += 1
+        await asyncio.sleep(interval)
+
+
+async def push_dashboard(session: aiohttp.ClientSession, base_url: str,
+                         deadline: float, counters: Dict):
+    """One dashboard holding the event stream open"""
+    counters["requests"] += 1
+    async with session.get(f"{base_url}/events?topics=state,install,waydroid") as resp:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                chunk = await asyncio.wait_for(resp.content.readuntil(b"\n\n"), remaining)
+            except asyncio.TimeoutError:
+                return
+            counters["bytes"] += len(chunk)
+            if chunk.startswith(b"event:"):
+                counters["events"] += 1
+
+
+async def run_phase(mode: str, base_url: str, agent: psutil.Process,
+                    clients: int, interval: float, duration: float) -> Dict:
+    """Run one measurement phase and return its counters"""
+    counters = {"requests": 0, "bytes": 0, "events": 0}
+    cpu_before = sum(agent.cpu_times()[:2])
+    deadline = time.monotonic() + duration
+
+    async with aiohttp.ClientSession() as session:
+        if mode == "poll":
+            tasks = [poll_dashboard(session, base_url, interval, deadline, counters)
+                     for _ in range(clients)]
+        elif mode == "push":
+            tasks = [push_dashboard(session, base_url, deadline, counters)
+                     for _ in range(clients)]
+        else:
+            tasks = [asyncio.sleep(duration)]
+        await asyncio.gather(*tasks)
+
+    counters["cpu_seconds"] = sum(agent.cpu_times()[:2]) - cpu_before
+    counters["requests_per_minute"] = counters["requests"] * 60 / duration
+    return counters
+
+
+async def benchmark(args) -> Dict[str, Dict]:
+    base_url = f"http://127.0.0.1:{args.port}/api"
+    agent_dir = os.path.dirname(os.path.abspath(__file__))
+
+    proc = subprocess.Popen(
+        [sys.executable, "-c", AGENT_LAUNCHER.format(port=args.port)],
+        cwd=agent_dir,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    try:
+        await wait_for_agent(base_url)
+        agent = psutil.Process(proc.pid)
+        results = {}
+        for mode in ("idle", "poll", "push"):
+            results[mode] = await run_phase(
+                mode, base_url, agent, args.clients, args.interval, args.duration
+            )
+        return results
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Compare dashboard polling with server push")
+    parser.add_argument('--clients', type=int, default=5, help="simulated dashboards")
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help="polling interval in seconds (index.html used 5)")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds per phase")
+    parser.add_argument('--port', type=int, default=18082, help="port for the agent under test")
+    args = parser.parse_args()
+
+    results = asyncio.run(benchmark(args))
+
+    print(f"{args.clients} dashboards, {args.duration:.0f}s per phase, "
+          f"polling every {args.interval:g}s\n")
+    print(f"{'mode':<6} {'requests':>9} {'req/min':>9} {'events':>7} {'bytes':>9} {'agent CPU s':>12}")
+    for mode, r in results.items():
+        print(f"{mode:<6} {r['requests']:>9} {r['requests_per_minute']:>9.1f} {r['events']:>7} "
+              f"{r['bytes']:>9} {r['cpu_seconds']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
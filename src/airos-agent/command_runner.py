@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+AIROS Command Runner - Non-blocking shell execution for the agent APIs
+Runs host or Waydroid commands on asyncio subprocesses with per-command
+timeouts, individually, as ordered batches in one request, or streamed
+"""
+
+import os
+import json
+import time
+import codecs
+import signal
+import asyncio
+import logging
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple, Callable, Awaitable, AsyncIterator
+
+from aiohttp import web
+
+logger = logging.getLogger('AIROS-Commands')
+
+DEFAULT_TIMEOUT_MS = 30000
+MAX_BATCH_COMMANDS = 256
+MAX_PARALLEL = 8
+
+# Bytes read from a pipe per stream frame, and frames buffered before the
+# pipes stop being drained (which in turn pauses the command)
+STREAM_CHUNK_SIZE = 4096
+STREAM_QUEUE_SIZE = 64
+
+
+@dataclass
+class CommandSpec:
+    """One command of a request"""
+    command: str
+    timeout: int = DEFAULT_TIMEOUT_MS  # milliseconds
+    in_waydroid: bool = False
+
+
+@dataclass
+class CommandOutcome:
+    """Result of one command"""
+    command: str
+    status: str  # "ok", "failed", "timeout", "error" or "skipped"
+    exit_code: Optional[int] = None
+    output: str = ""
+    error: Optional[str] = None
+    duration: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return self.status == "ok"
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = asdict(self)
+        result['success'] = self.success
+        return result
+
+
+Runner = Callable[[CommandSpec], Awaitable[CommandOutcome]]
+
+
+async def spawn(spec: CommandSpec) -> asyncio.subprocess.Process:
+    """Start a command with piped stdout and stderr in its own process group"""
+    if spec.in_waydroid:
+        return await asyncio.create_subprocess_exec(
+            "waydroid", "shell", spec.command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+    return await asyncio.create_subprocess_shell(
+        spec.command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True
+    )
+
+
+def kill(proc: asyncio.subprocess.Process):
+    """Kill the command and its children, which would otherwise hold the pipes open"""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def run_command(spec: CommandSpec) -> CommandOutcome:
+    """Run one command to completion without blocking the event loop"""
+    start = time.monotonic()
+    try:
+        proc = await spawn(spec)
+    except OSError as e:
+        return CommandOutcome(spec.command, "error", error=str(e))
+
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), spec.timeout / 1000)
+    except asyncio.TimeoutError:
+        kill(proc)
+        await proc.wait()
+        return CommandOutcome(spec.command, "timeout", error="Command timeout",
+                              duration=time.monotonic() - start)
+    except asyncio.CancelledError:
+        kill(proc)
+        raise
+
+    return CommandOutcome(
+        spec.command,
+        "ok" if proc.returncode == 0 else "failed",
+        exit_code=proc.returncode,
+        output=stdout.decode(errors='replace') + stderr.decode(errors='replace'),
+        duration=time.monotonic() - start
+    )
+
+
+def parse_batch(data: Dict) -> Tuple[List[CommandSpec], bool, bool]:
+    """
+    Validate an execute_batch request body
+
+    Commands are strings or {"command", "timeout", "in_waydroid"} objects;
+    top-level "timeout" (ms) and "in_waydroid" are the per-command defaults.
+
+    Returns:
+        (specs, parallel, stop_on_error)
+
+    Raises:
+        ValueError: If the body is malformed
+    """
+    commands = data.get('commands')
+    if not isinstance(commands, list) or not commands:
+        raise ValueError("'commands' must be a non-empty list")
+    if len(commands) > MAX_BATCH_COMMANDS:
+        raise ValueError(f"at most {MAX_BATCH_COMMANDS} commands per batch")
+
+    default_timeout = int(data.get('timeout', DEFAULT_TIMEOUT_MS))
+    default_waydroid = bool(data.get('in_waydroid', False))
+
+    specs = []
+    for item in commands:
+        if isinstance(item, str):
+            item = {'command': item}
+        if not isinstance(item, dict) or not isinstance(item.get('command'), str):
+            raise ValueError("each command must be a string or have a 'command' string")
+        specs.append(CommandSpec(
+            item['command'],
+            int(item.get('timeout', default_timeout)),
+            bool(item.get('in_waydroid', default_waydroid))
+        ))
+
+    mode = data.get('mode', 'sequential')
+    if mode not in ('sequential', 'parallel'):
+        raise ValueError("'mode' must be 'sequential' or 'parallel'")
+
+    return specs, mode == 'parallel', bool(data.get('stop_on_error', False))
+
+
+async def run_batch(specs: List[CommandSpec], runner: Runner = run_command,
+                    parallel: bool = False, stop_on_error: bool = False,
+                    max_parallel: int = MAX_PARALLEL) -> List[CommandOutcome]:
+    """
+    Run commands in order or concurrently, returning results in input order
+
+    With stop_on_error, commands after (sequential) or still running when
+    (parallel) the first failure is seen are reported as "skipped".
+    """
+    async def guarded(spec: CommandSpec) -> CommandOutcome:
+        try:
+            return await runner(spec)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Command failed to run: {spec.command}: {e}")
+            return CommandOutcome(spec.command, "error", error=str(e))
+
+    if not parallel:
+        results = []
+        for spec in specs:
+            if stop_on_error and results and not results[-1].success:
+                results.append(CommandOutcome(spec.command, "skipped"))
+            else:
+                results.append(await guarded(spec))
+        return results
+
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def limited(spec: CommandSpec) -> CommandOutcome:
+        async with semaphore:
+            return await guarded(spec)
+
+    tasks = [asyncio.create_task(limited(spec)) for spec in specs]
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if stop_on_error and any(not task.result().success for task in done):
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    return [
+        CommandOutcome(spec.command, "skipped") if task.cancelled() else task.result()
+        for spec, task in zip(specs, tasks)
+    ]
+
+
+async def stream_command(spec: CommandSpec,
+                         chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield output frames while the command runs, then one exit frame
+
+    Output frames are {"stream": "stdout"|"stderr", "data": str}. The last
+    frame is {"stream": "exit", "status", "exit_code", "error", "duration"}
+    with the same status values as run_command. Closing the generator early
+    kills the command.
+    """
+    start = time.monotonic()
+    try:
+        proc = await spawn(spec)
+    except OSError as e:
+        yield {'stream': 'exit', 'status': 'error', 'exit_code': None,
+               'error': str(e), 'duration': 0.0}
+        return
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+    async def pump(reader: asyncio.StreamReader, name: str):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            chunk = await reader.read(chunk_size)
+            text = decoder.decode(chunk, final=not chunk)
+            if text:
+                await queue.put({'stream': name, 'data': text})
+            if not chunk:
+                break
+        await queue.put(None)
+
+    pumps = [
+        asyncio.create_task(pump(proc.stdout, 'stdout')),
+        asyncio.create_task(pump(proc.stderr, 'stderr'))
+    ]
+    deadline = start + spec.timeout / 1000
+    open_streams = len(pumps)
+    timed_out = False
+
+    try:
+        while open_streams:
+            try:
+                frame = await asyncio.wait_for(queue.get(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                timed_out = True
+                break
+            if frame is None:
+                open_streams -= 1
+            else:
+                yield frame
+
+        if timed_out:
+            kill(proc)
+        await proc.wait()
+    finally:
+        for task in pumps:
+            task.cancel()
+        if proc.returncode is None:
+            kill(proc)
+            await proc.wait()
+
+    if timed_out:
+        status, exit_code, error = "timeout", None, "Command timeout"
+    else:
+        status = "ok" if proc.returncode == 0 else "failed"
+        exit_code, error = proc.returncode, None
+
+    yield {'stream': 'exit', 'status': status, 'exit_code': exit_code,
+           'error': error, 'duration': time.monotonic() - start}
+
+
+async def write_ndjson(request: web.Request,
+                       frames: AsyncIterator[Dict[str, Any]]) -> web.StreamResponse:
+    """Send frames as a chunked newline-delimited JSON response"""
+    response = web.StreamResponse(headers={
+        'Content-Type': 'application/x-ndjson',
+        'Cache-Control': 'no-cache'
+    })
+    await response.prepare(request)
+
+    try:
+        async for frame in frames:
+            await response.write((json.dumps(frame) + '\n').encode())
+        await response.write_eof()
+    except ConnectionResetError:
+        logger.info("Stream client disconnected")
+    finally:
+        await frames.aclose()
+
+    return response
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+AIROS Crash Replay - Offline crash corpus replay and classifier benchmark
+Feeds recorded logcat buffers through the monitor -> analyze -> fix pipeline
+without a live Waydroid, with the fix side mocked by VirtualWaydroidManager
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+import yaml
+
+from airos_agent import (
+    AppCompatibilityFixer, AppIssue, CrashAnalysisPipeline, build_crash_analyzer
+)
+from airos_agent_virtual import VirtualWaydroidManager
+
+DEFAULT_CORPUS = Path(__file__).parent / "crash_corpus"
+
+
+class CountingReader:
+    """Line reader over a recorded buffer that counts lines handed out"""
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self.position = 0
+
+    def readline(self) -> str:
+        if self.position >= len(self.lines):
+            return ""
+        line = self.lines[self.position]
+        self.position += 1
+        return line
+
+
+class ReplayCompatibilityFixer(AppCompatibilityFixer):
+    """AppCompatibilityFixer whose host-side steps are routed to the mock manager"""
+
+    async def create_library_shim(self, library_name: str, package_name: str) -> Optional[Path]:
+        """Skip the NDK compile and report where the shim would be written"""
+        return self.waydroid.system_path / "lib64" / library_name
+
+    async def extract_installed_apk(self, package_name: str) -> Optional[Path]:
+        """Resolve the APK through the mock shell instead of pulling it"""
+        success, _ = self.waydroid.execute_shell(f"pm path {package_name}")
+        return self.patches_dir / f"{package_name}.apk" if success else None
+
+    async def patch_apk_framework(self, apk_path: Path, issue: AppIssue) -> Optional[Path]:
+        """Skip apktool/apksigner and report the patched APK path"""
+        return self.patches_dir / f"{issue.package_name}_patched.apk"
+
+
+def load_corpus(corpus_dir: Path, labels_path: Optional[Path] = None) -> List[Tuple[str, List[str], List[Optional[Dict]]]]:
+    """
+    Load recorded logcat buffers and their labeled expectations
+
+    Args:
+        corpus_dir: Directory containing *.log buffers
+        labels_path: YAML file mapping buffer name to expected issues
+            (defaults to labels.yml inside the corpus directory)
+
+    Returns:
+        List of (buffer name, lines, expected issues) sorted by name
+    """
+    labels_path = labels_path or corpus_dir / "labels.yml"
+    labels = {}
+    if labels_path.exists():
+        with open(labels_path, 'r') as f:
+            labels = yaml.safe_load(f) or {}
+
+    corpus = []
+    for log_file in sorted(corpus_dir.glob("*.log")):
+        with open(log_file, 'r', errors='replace') as f:
+            lines = f.readlines()
+        corpus.append((log_file.name, lines, labels.get(log_file.name) or []))
+
+    return corpus
+
+
+def score(observed: List[Optional[AppIssue]], expected: List[Optional[Dict]]) -> Tuple[int, int]:
+    """Compare observed issues with expectations crash by crash"""
+    correct = 0
+    total = max(len(observed), len(expected))
+
+    for issue, label in zip(observed, expected):
+        if issue is None or label is None:
+            if issue is None and label is None:
+                correct += 1
+            continue
+        if (issue.package_name == label.get('package')
+                and issue.issue_type.value == label.get('issue_type')):
+            correct += 1
+
+    return correct, total
+
+
+async def replay(corpus: List[Tuple[str, List[str], List[Optional[Dict]]]],
+                 repeat: int = 1, trace_memory: bool = False,
+                 analyzer: Optional[CrashAnalysisPipeline] = None) -> Dict[str, Any]:
+    """
+    Replay a corpus through the crash pipeline and collect metrics
+
+    Args:
+        corpus: Output of load_corpus()
+        repeat: Number of passes over the whole corpus
+        trace_memory: Also record the Python allocation peak (slower)
+        analyzer: Analysis pipeline to benchmark (default: rules only)
+
+    Returns:
+        Benchmark report
+    """
+    work_dir = tempfile.TemporaryDirectory(prefix="airos-replay-")
+    waydroid = VirtualWaydroidManager()
+    waydroid.system_path = Path(work_dir.name) / "system"
+    (waydroid.system_path / "lib64").mkdir(parents=True)
+    fixer = ReplayCompatibilityFixer(waydroid, data_dir=Path(work_dir.name),
+                                     analyzer=analyzer)
+
+    lines_total = 0
+    crashes_total = 0
+    fixes_total = 0
+    correct_total = 0
+    scored_total = 0
+    buffers = []
+
+    if trace_memory:
+        tracemalloc.start()
+
+    start_time = time.perf_counter()
+
+    for pass_index in range(repeat):
+        for name, lines, expected in corpus:
+            results: Dict[int, Tuple[Optional[AppIssue], bool]] = {}
+
+            def on_crash(sequence, event, issue, fix):
+                results[sequence] = (issue, bool(fix and fix.success))
+
+            reader = CountingReader(lines)
+            await fixer.process_crash_stream(reader, on_crash=on_crash)
+
+            # Crashes finish analysis out of order when batched
+            observed = [results[i][0] for i in sorted(results)]
+            fixed = [results[i][1] for i in sorted(results)]
+
+            correct, total = score(observed, expected)
+            lines_total += reader.position
+            crashes_total += len(observed)
+            fixes_total += sum(fixed)
+            correct_total += correct
+            scored_total += total
+
+            if pass_index > 0:
+                continue
+
+            buffers.append({
+                'buffer': name,
+                'crashes': len(observed),
+                'expected': len(expected),
+                'correct': correct,
+                'fixed': sum(fixed),
+                'observed': [
+                    {'package': i.package_name, 'issue_type': i.issue_type.value} if i else None
+                    for i in observed
+                ]
+            })
+
+    elapsed = time.perf_counter() - start_time
+
+    python_peak = None
+    if trace_memory:
+        python_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    await fixer.analyzer.close()
+    work_dir.cleanup()
+
+    return {
+        'buffers': buffers,
+        'passes': repeat,
+        'elapsed_seconds': elapsed,
+        'lines': lines_total,
+        'crashes': crashes_total,
+        'fixes': fixes_total,
+        'lines_per_second': lines_total / elapsed if elapsed else 0.0,
+        'crashes_per_second': crashes_total / elapsed if elapsed else 0.0,
+        'accuracy': correct_total / scored_total if scored_total else 0.0,
+        # ru_maxrss is reported in kilobytes on Linux
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'python_peak_bytes': python_peak,
+        'analyzer': dict(fixer.analyzer.stats)
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """Print a human readable benchmark summary"""
+    for buf in report['buffers']:
+        print(f"{buf['buffer']:<32} crashes {buf['crashes']}/{buf['expected']}  "
+              f"correct {buf['correct']}  fixed {buf['fixed']}")
+
+    print()
+    print(f"Passes:        {report['passes']}")
+    print(f"Lines:         {report['lines']} ({report['lines_per_second']:.0f} lines/sec)")
+    print(f"Crashes:       {report['crashes']} ({report['crashes_per_second']:.1f} crashes/sec)")
+    print(f"Accuracy:      {report['accuracy'] * 100:.1f}%")
+    print(f"Analyzer:      {report['analyzer']}")
+    print(f"Max RSS:       {report['max_rss_bytes'] / 1048576:.1f} MiB")
+    if report['python_peak_bytes'] is not None:
+        print(f"Python peak:   {report['python_peak_bytes'] / 1048576:.2f} MiB")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Replay recorded logcat crash buffers")
+    parser.add_argument('--corpus', type=Path, default=DEFAULT_CORPUS,
+                        help="directory of *.log buffers")
+    parser.add_argument('--labels', type=Path, default=None,
+                        help="labels YAML (default: <corpus>/labels.yml)")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="number of passes over the corpus")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="record the Python allocation peak with tracemalloc")
+    parser.add_argument('--backend-url', default=None,
+                        help="local inference server for novel crashes")
+    parser.add_argument('--batch-size', type=int, default=8,
+                        help="crashes per inference call")
+    parser.add_argument('--json', action='store_true',
+                        help="emit the report as JSON")
+    parser.add_argument('--min-accuracy', type=float, default=None,
+                        help="exit non-zero if accuracy falls below this fraction")
+    args = parser.parse_args()
+
+    # Keep the per-crash pipeline logging out of the benchmark numbers
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ('AIROS-Linux', 'AIROS-Virtual'):
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    corpus = load_corpus(args.corpus, args.labels)
+    if not corpus:
+        print(f"No *.log buffers found in {args.corpus}", file=sys.stderr)
+        sys.exit(2)
+
+    analyzer = build_crash_analyzer({
+        'backend': 'http' if args.backend_url else None,
+        'url': args.backend_url,
+        'batch_size': args.batch_size
+    })
+
+    report = asyncio.run(replay(corpus, args.repeat, args.trace_memory, analyzer))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.min_accuracy is not None and report['accuracy'] < args.min_accuracy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+AIROS DEX Index - Memory-mapped class and method index of APK bytecode
+Reads the string, type and method id tables of every classes*.dex in
+place and answers which classes and methods an app references (such as
+Google Play Services APIs) by binary search over those sorted tables
+"""
+
+import sys
+import json
+import mmap
+import time
+import struct
+import zipfile
+import argparse
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Set, Union
+
+# Dotted and DEX-descriptor prefixes of Google Play Services / Firebase code
+GMS_PREFIXES = ("com.google.android.gms.", "com.google.firebase.")
+GMS_DESCRIPTORS = (b"Lcom/google/android/gms/", b"Lcom/google/firebase/")
+
+DEX_MAGIC = b"dex\n"
+ZIP_LOCAL_HEADER = b"PK\x03\x04"
+ZIP_LOCAL_HEADER_SIZE = 30
+
+# No MUTF-8 byte is 0xFF, so prefix + 0xFF sorts after every string with that prefix
+_PREFIX_END = b"\xff"
+
+
+def gms_api(name: str) -> Optional[str]:
+    """
+    'gms.maps' for com.google.android.gms.maps.GoogleMap, None outside GMS/Firebase
+
+    Names directly under the root package (com.google.android.gms.version,
+    the meta-data every GMS client declares) count as 'gms.common'.
+    """
+    for prefix in GMS_PREFIXES:
+        if name.startswith(prefix):
+            parts = name[len(prefix):].split(".")
+            return f"{prefix.split('.')[-2]}.{parts[0] if len(parts) > 1 else 'common'}"
+    return None
+
+
+def descriptor(prefix: str) -> bytes:
+    """b'Lcom/google/android/gms/' for the dotted prefix 'com.google.android.gms.'"""
+    return b"L" + prefix.replace(".", "/").encode()
+
+
+def class_name(desc: bytes) -> str:
+    """'com.example.Main' for the type descriptor b'Lcom/example/Main;'"""
+    return desc[1:].rstrip(b";").decode('utf-8', 'replace').replace("/", ".")
+
+
+def _table(code: str, data, offset: int, count: int) -> array:
+    """A little-endian id table copied into a flat array (no per-entry objects)"""
+    table = array(code)
+    table.frombytes(data[offset:offset + count * table.itemsize])
+    if sys.byteorder == "big":
+        table.byteswap()
+    return table
+
+
+class DexIndex:
+    """
+    Referenced classes and methods of one DEX file
+
+    Only the id tables are copied (4 bytes per string and type, 8 per
+    method); strings are decoded on demand from `data`, which may be an
+    mmap of the whole APK with the DEX at `base`. DEX files keep strings
+    sorted, types sorted by string and methods sorted by class, so every
+    class prefix maps to one contiguous run of types and of methods.
+    """
+
+    def __init__(self, data: Union[bytes, mmap.mmap], base: int = 0):
+        if data[base:base + 4] != DEX_MAGIC:
+            raise ValueError("not a DEX file")
+
+        (string_count, string_offset, type_count, type_offset, _, _, _, _,
+         method_count, method_offset) = struct.unpack_from('<10I', data, base + 0x38)
+        self.data = data
+        self.base = base
+        self.string_offsets = _table('I', data, base + string_offset, string_count)
+        self.type_strings = _table('I', data, base + type_offset, type_count)
+        # class_idx, proto_idx, name_idx (low, high) per method
+        self.method_words = _table('H', data, base + method_offset, method_count * 4)
+        self.method_count = method_count
+
+    def string(self, index: int) -> bytes:
+        """Raw MUTF-8 bytes of a string id"""
+        pos = self.base + self.string_offsets[index]
+        while self.data[pos] & 0x80:  # skip the uleb128 UTF-16 length
+            pos += 1
+        pos += 1
+        return self.data[pos:self.data.find(b"\0", pos)]
+
+    def type_range(self, prefix: bytes) -> range:
+        """Type ids whose descriptor starts with prefix"""
+        strings = range(len(self.string_offsets))
+        first = bisect_left(strings, prefix, key=self.string)
+        last = bisect_left(strings, prefix + _PREFIX_END, lo=first, key=self.string)
+        return range(bisect_left(self.type_strings, first), bisect_left(self.type_strings, last))
+
+    def method_range(self, types: range) -> range:
+        """Method ids declared on (or called on) the given types"""
+        methods = range(self.method_count)
+        words = self.method_words
+        first = bisect_left(methods, types.start, key=lambda i: words[4 * i])
+        last = bisect_left(methods, types.stop, lo=first, key=lambda i: words[4 * i])
+        return range(first, last)
+
+    def classes(self, prefix: str = "") -> Iterator[str]:
+        """Dotted names of referenced classes in a package prefix"""
+        for type_id in self.type_range(descriptor(prefix)):
+            yield class_name(self.string(self.type_strings[type_id]))
+
+    def methods(self, prefix: str = "") -> Iterator[str]:
+        """'package.Class.method' of referenced methods in a package prefix"""
+        words = self.method_words
+        for method_id in self.method_range(self.type_range(descriptor(prefix))):
+            owner = self.string(self.type_strings[words[4 * method_id]])
+            name = self.string(words[4 * method_id + 2] | words[4 * method_id + 3] << 16)
+            yield f"{class_name(owner)}.{name.decode('utf-8', 'replace')}"
+
+    def calls(self, prefix: str) -> bool:
+        """Whether any method of a class in the package prefix is referenced"""
+        return len(self.method_range(self.type_range(descriptor(prefix)))) > 0
+
+    def gms_apis(self) -> Set[str]:
+        """GMS/Firebase APIs ('gms.maps', 'firebase.auth', ...) the code references"""
+        apis = set()
+        for prefix in GMS_DESCRIPTORS:
+            for type_id in self.type_range(prefix):
+                api = gms_api(class_name(self.string(self.type_strings[type_id])))
+                if api:
+                    apis.add(api)
+        return apis
+
+
+class ApkDexIndex:
+    """
+    DEX indexes of an APK over one read-only mmap
+
+    Stored (uncompressed) DEX files, the default for modern builds, are
+    indexed in place without reading them; deflated ones are inflated once.
+    """
+
+    def __init__(self, apk_path: Union[str, Path], members: Optional[Iterable[str]] = None):
+        self.apk_path = Path(apk_path)
+        self.file = open(self.apk_path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            with zipfile.ZipFile(self.file) as apk:
+                if members is None:
+                    infos = [info for info in sorted(apk.infolist(), key=lambda i: i.filename)
+                             if info.filename.startswith("classes") and info.filename.endswith(".dex")]
+                else:
+                    infos = [apk.getinfo(name) for name in members]
+                self.dexes = [self._index(apk, info) for info in infos]
+        except Exception:
+            self.close()
+            raise
+
+    def _index(self, apk: zipfile.ZipFile, info: zipfile.ZipInfo) -> DexIndex:
+        if info.compress_type != zipfile.ZIP_STORED:
+            return DexIndex(apk.read(info.filename))
+
+        start = info.header_offset
+        if self.map[start:start + 4] != ZIP_LOCAL_HEADER:
+            raise zipfile.BadZipFile(f"bad local header for {info.filename}")
+        name_length, extra_length = struct.unpack_from('<HH', self.map, start + 26)
+        return DexIndex(self.map, start + ZIP_LOCAL_HEADER_SIZE + name_length + extra_length)
+
+    def classes(self, prefix: str = "") -> List[str]:
+        return sorted({name for dex in self.dexes for name in dex.classes(prefix)})
+
+    def methods(self, prefix: str = "") -> List[str]:
+        return sorted({name for dex in self.dexes for name in dex.methods(prefix)})
+
+    def calls(self, prefix: str) -> bool:
+        return any(dex.calls(prefix) for dex in self.dexes)
+
+    def uses_gms(self) -> bool:
+        return any(dex.calls(prefix) for dex in self.dexes for prefix in GMS_PREFIXES)
+
+    def gms_apis(self) -> Set[str]:
+        return set().union(*(dex.gms_apis() for dex in self.dexes))
+
+    def close(self):
+        self.dexes = []
+        if getattr(self, 'map', None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self) -> 'ApkDexIndex':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def gms_apis(apk_paths: Iterable[Union[str, Path]]) -> List[str]:
+    """GMS/Firebase APIs referenced by an app split across one or more APKs"""
+    apis: Set[str] = set()
+    for path in apk_paths:
+        with ApkDexIndex(path) as index:
+            apis |= index.gms_apis()
+    return sorted(apis)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="List the GMS APIs, classes or methods APKs reference")
+    parser.add_argument('apks', type=Path, nargs='+')
+    parser.add_argument('--classes', metavar='PREFIX', default=None,
+                        help="list referenced classes in this package prefix")
+    parser.add_argument('--methods', metavar='PREFIX', default=None,
+                        help="list referenced methods in this package prefix")
+    args = parser.parse_args()
+
+    results = []
+    for path in args.apks:
+        start = time.monotonic()
+        with ApkDexIndex(path) as index:
+            result = {"apk": str(path), "dex_files": len(index.dexes),
+                      "gms_apis": sorted(index.gms_apis())}
+            if args.classes is not None:
+                result["classes"] = index.classes(args.classes)
+            if args.methods is not None:
+                result["methods"] = index.methods(args.methods)
+        result["duration_ms"] = round((time.monotonic() - start) * 1000, 2)
+        results.append(result)
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
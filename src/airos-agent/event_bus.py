@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+AIROS Event Bus - In-process pub/sub with WebSocket and Server-Sent Events
+Publishes crash, issue, fix, install and Waydroid state events to clients
+with per-client topic/package filters, bounded queues and sequence numbers
+that let reconnecting clients resume without loss or duplicates
+"""
+
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Any, Iterable, Set, Callable, Tuple, Awaitable
+
+from aiohttp import web, WSMsgType, WSCloseCode
+
+logger = logging.getLogger('AIROS-Events')
+
+TOPICS = ("crash", "issue", "fix", "install", "waydroid", "state")
+
+# Seconds between SSE keep-alive comments on an idle stream
+SSE_KEEPALIVE = 15.0
+
+
+class Subscription:
+    """One client's filtered view of the bus with a bounded queue"""
+
+    def __init__(self, topics: Optional[Iterable[str]] = None,
+                 packages: Optional[Iterable[str]] = None,
+                 queue_size: int = 256):
+        self.topics: Optional[Set[str]] = set(topics) if topics else None
+        self.packages: Optional[Set[str]] = set(packages) if packages else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.delivered = 0
+        self.dropped = False
+
+    def add_filter(self, topic: Optional[str] = None, package: Optional[str] = None):
+        """Narrow the subscription to (additional) topics and packages"""
+        if topic:
+            self.topics = (self.topics or set()) | {topic}
+        if package:
+            self.packages = (self.packages or set()) | {package}
+
+    def remove_filter(self, topic: Optional[str] = None, package: Optional[str] = None):
+        if topic and self.topics:
+            self.topics.discard(topic)
+        if package and self.packages:
+            self.packages.discard(package)
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        if self.topics is not None and event["eventType"] not in self.topics:
+            return False
+        if self.packages is not None and event.get("package") not in self.packages:
+            return False
+        return True
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        """Queue an event; a full queue marks this as a slow consumer"""
+        if self.dropped:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # Discard the backlog and wake the consumer with the drop sentinel
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None once the subscription has been dropped"""
+        event = await asyncio.wait_for(self.queue.get(), timeout)
+        if event is not None:
+            self.delivered += 1
+        return event
+
+
+class EventBus:
+    """Fan-out of agent events to WebSocket and SSE subscribers"""
+
+    def __init__(self, queue_size: int = 256, replay_size: int = 1024):
+        self.queue_size = queue_size
+        self.subscriptions: List[Subscription] = []
+        self.snapshots: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.snapshot_preparers: List[Callable[[], Awaitable[None]]] = []
+        # Every published event gets the next sequence number; the most
+        # recent ones are kept so reconnecting clients can resume. Numbers
+        # restart with the process, so each run has its own epoch
+        self.epoch = uuid.uuid4().hex
+        self.sequence = 0
+        self.history: deque = deque(maxlen=replay_size)
+        self.stats = {
+            "published": 0,
+            "slow_consumers_dropped": 0,
+            "resumed": 0,
+            "resume_gaps": 0
+        }
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None,
+                  packages: Optional[Iterable[str]] = None) -> Subscription:
+        subscription = Subscription(topics, packages, self.queue_size)
+        self.subscriptions.append(subscription)
+
+        # Late joiners start from a full snapshot, then receive deltas
+        for topic, provider in self.snapshots.items():
+            event = self._event(topic, provider(), None)
+            if subscription.matches(event):
+                event["seq"] = self.sequence
+                event["snapshot"] = True
+                subscription.offer(event)
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    def add_snapshot(self, topic: str, provider: Callable[[], Dict[str, Any]],
+                     prepare: Optional[Callable[[], Awaitable[None]]] = None):
+        """
+        Send provider() as the first event of `topic` to every new subscriber
+
+        provider() runs on the event loop and must not block; an async
+        prepare() is awaited before each new connection subscribes so the
+        provider can serve state gathered off the loop.
+        """
+        self.snapshots[topic] = provider
+        if prepare is not None:
+            self.snapshot_preparers.append(prepare)
+
+    async def prepare_snapshots(self):
+        """Bring every snapshot up to date before a client subscribes"""
+        for prepare in self.snapshot_preparers:
+            await prepare()
+
+    def replay(self, subscription: Subscription, since: int,
+               epoch: Optional[str] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Events after sequence `since` that match a subscription
+
+        Must be called right after subscribe(), before yielding to the event
+        loop, so the backlog and the live queue neither overlap nor leave a gap.
+
+        Args:
+            since: Last sequence number the client received
+            epoch: Epoch that number belongs to, if the client knows it
+
+        Returns:
+            (events, complete) - complete is False if events were already
+            evicted from history or the bus restarted since `since`
+        """
+        restarted = since > self.sequence or (epoch is not None and epoch != self.epoch)
+        if restarted:
+            # The cursor is from before an agent restart: send all we have
+            since = 0
+        oldest = self.history[0]["seq"] if self.history else self.sequence + 1
+        complete = not restarted and since >= oldest - 1
+
+        self.stats["resumed"] += 1
+        if not complete:
+            self.stats["resume_gaps"] += 1
+
+        events = [e for e in self.history if e["seq"] > since and subscription.matches(e)]
+        return events, complete
+
+    def has_subscribers(self, topic: str) -> bool:
+        return any(s.topics is None or topic in s.topics for s in self.subscriptions)
+
+    def _event(self, topic: str, data: Dict[str, Any], package_name: Optional[str]) -> Dict[str, Any]:
+        return {
+            "eventType": topic,
+            "epoch": self.epoch,
+            "package": package_name,
+            "timestamp": time.time(),
+            "data": data
+        }
+
+    def publish(self, topic: str, data: Dict[str, Any], package_name: Optional[str] = None):
+        """
+        Publish an event to every matching subscriber without blocking
+
+        Args:
+            topic: One of TOPICS
+            data: JSON-serializable event payload
+            package_name: Package the event concerns, used for filtering
+        """
+        self.sequence += 1
+        event = self._event(topic, data, package_name)
+        event["seq"] = self.sequence
+        self.history.append(event)
+        self.stats["published"] += 1
+
+        for subscription in list(self.subscriptions):
+            if subscription.matches(event) and not subscription.offer(event):
+                self.stats["slow_consumers_dropped"] += 1
+                self.unsubscribe(subscription)
+                logger.warning("Dropped slow event consumer")
+
+    def _split(self, value: Optional[str]) -> Optional[List[str]]:
+        return [v for v in value.split(",") if v] if value else None
+
+    def _cursor(self, value: Optional[str], epoch: Optional[str] = None) -> Tuple[Optional[int], Optional[str]]:
+        """(seq, epoch) from a cursor of the form 'seq' or 'epoch:seq'"""
+        if value is None:
+            return None, epoch
+        if ":" in value:
+            epoch, value = value.rsplit(":", 1)
+        try:
+            return int(value), epoch
+        except ValueError:
+            return None, epoch
+
+    async def handle_websocket(self, request):
+        """
+        WebSocket endpoint
+
+        Clients send {"action": "subscribe", "eventType": ..., "package": ...}
+        (and "unsubscribe") to filter the stream. Without any subscribe the
+        client receives every topic. {"action": "authenticate"} is
+        acknowledged for compatibility with AIROSClient.
+
+        The first message is {"action": "resume", "seq": <current seq>,
+        "epoch": <bus epoch>}. Connecting with ?since=<seq>&epoch=<epoch>
+        makes it report whether the resume is complete and follows it with
+        every retained event after that seq; a cursor from another epoch
+        (before an agent restart) resumes from the start of this one.
+        """
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        await self.prepare_snapshots()
+
+        subscription = self.subscribe(
+            self._split(request.query.get("topics")),
+            self._split(request.query.get("package"))
+        )
+        since, epoch = self._cursor(request.query.get("since"), request.query.get("epoch"))
+        backlog, complete = self.replay(subscription, since, epoch) if since is not None else ([], True)
+        await ws.send_json({
+            "action": "resume",
+            "status": "new" if since is None else "resumed" if complete else "gap",
+            "since": since,
+            "seq": self.sequence,
+            "epoch": self.epoch
+        })
+        for event in backlog:
+            await ws.send_json(event)
+        sender = asyncio.create_task(self._pump_websocket(ws, subscription))
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    message = json.loads(msg.data)
+                except json.JSONDecodeError:
+                    await ws.send_json({"error": "Invalid JSON"})
+                    continue
+
+                action = message.get("action")
+                response = {"action": action}
+
+                if action == "authenticate":
+                    response["status"] = "authenticated"
+                elif action == "subscribe":
+                    subscription.add_filter(message.get("eventType"), message.get("package"))
+                    response["status"] = "subscribed"
+                elif action == "unsubscribe":
+                    subscription.remove_filter(message.get("eventType"), message.get("package"))
+                    response["status"] = "unsubscribed"
+                else:
+                    response["error"] = "Unknown action"
+
+                await ws.send_json(response)
+        finally:
+            sender.cancel()
+            self.unsubscribe(subscription)
+
+        return ws
+
+    async def _pump_websocket(self, ws: web.WebSocketResponse, subscription: Subscription):
+        """Forward queued events to one WebSocket client"""
+        while True:
+            event = await subscription.get()
+            if event is None:
+                await ws.close(code=WSCloseCode.TRY_AGAIN_LATER, message=b"slow consumer")
+                return
+            await ws.send_json(event)
+
+    async def handle_sse(self, request):
+        """
+        Server-Sent Events endpoint
+
+        Filters come from the query string: ?topics=crash,fix&package=com.foo
+        Each event carries "<epoch>:<seq>" as the SSE id, so browsers resume
+        through Last-Event-ID when EventSource reconnects, from the start
+        of the new epoch if the agent restarted in between.
+        """
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Access-Control-Allow-Origin": "*"
+        })
+        await response.prepare(request)
+        await self.prepare_snapshots()
+
+        subscription = self.subscribe(
+            self._split(request.query.get("topics")),
+            self._split(request.query.get("package"))
+        )
+        since, epoch = self._cursor(
+            request.headers.get("Last-Event-ID", request.query.get("since")),
+            request.query.get("epoch")
+        )
+        backlog = self.replay(subscription, since, epoch)[0] if since is not None else []
+
+        try:
+            for event in backlog:
+                await response.write(self._sse_frame(event))
+
+            while True:
+                try:
+                    event = await subscription.get(timeout=SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    await response.write(b": keep-alive\n\n")
+                    continue
+
+                if event is None:
+                    break
+                await response.write(self._sse_frame(event))
+        except ConnectionResetError:
+            pass
+        finally:
+            self.unsubscribe(subscription)
+
+        return response
+
+    def _sse_frame(self, event: Dict[str, Any]) -> bytes:
+        return (
+            f"id: {event['epoch']}:{event['seq']}\nevent: {event['eventType']}\n"
+            f"data: {json.dumps(event)}\n\n"
+        ).encode()
+
+    def add_routes(self, app: web.Application, ws_path: str = "/", sse_path: str = "/events"):
+        """Register the WebSocket and SSE endpoints on an aiohttp app"""
+        app.router.add_get(ws_path, self.handle_websocket)
+        app.router.add_get(sse_path, self.handle_sse)
+
+
+class StatePublisher:
+    """
+    Publishes only the changed fields of an agent state dict
+
+    The sampler is blocking (psutil, package listings) and always runs in a
+    worker thread. It runs every `interval` seconds and on refresh(), but
+    only while someone is subscribed to the topic; otherwise refresh() just
+    marks the state stale, so idle agents do no psutil or package work.
+    New subscribers get the last full state through the bus snapshot, which
+    is brought up to date before they subscribe.
+    """
+
+    def __init__(self, bus: EventBus, sample: Callable[[], Dict[str, Any]],
+                 topic: str = "state", interval: float = 2.0):
+        self.bus = bus
+        self.sample = sample
+        self.topic = topic
+        self.interval = interval
+        self.last: Dict[str, Any] = {}
+        self.dirty = True
+        self.pending: Optional[asyncio.Task] = None
+        bus.add_snapshot(topic, self.snapshot, self.prepare)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.last)
+
+    async def prepare(self):
+        """Resample a stale state before a new subscriber's snapshot"""
+        if self.dirty or not self.last:
+            await self.update()
+
+    def refresh(self):
+        """Publish the delta soon (e.g. right after a mutation)"""
+        self.dirty = True
+        if not self.bus.has_subscribers(self.topic):
+            return
+        # One refresh at a time; it resamples while mutations keep arriving
+        if self.pending is None or self.pending.done():
+            self.pending = asyncio.get_running_loop().create_task(self._refresh())
+
+    async def _refresh(self):
+        while self.dirty:
+            await self.update()
+
+    async def update(self):
+        """Sample off the event loop and publish the changed fields"""
+        self.dirty = False
+        state = await asyncio.to_thread(self.sample)
+        delta = {k: v for k, v in state.items() if self.last.get(k) != v}
+        self.last = state
+        if delta:
+            self.bus.publish(self.topic, delta)
+
+    async def run(self):
+        while True:
+            if self.bus.has_subscribers(self.topic):
+                await self.update()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+AIROS Experiment Runner - Concurrent experiment suites with timing reports
+Runs many setup/test/cleanup experiments against one device, concurrently
+where their declared resources do not overlap, each under its own snapshot,
+and reports per-phase timings, rollbacks and device resource deltas
+"""
+
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import threading
+import importlib.util
+from pathlib import Path
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Callable, Iterable
+
+from ai_client_python import AIROSClient, SNAPSHOT_MODES
+
+logger = logging.getLogger('AIROS-Experiments')
+
+PHASES = ("snapshot", "setup", "test", "rollback", "cleanup")
+
+
+@dataclass
+class Experiment:
+    """One experiment of a suite and the device state it changes"""
+    name: str
+    setup: Callable[[], Any]
+    test: Callable[[], Any]
+    cleanup: Optional[Callable[[], Any]] = None
+    # e.g. "package:com.whatsapp", "prop:persist.sys.locale"; experiments
+    # sharing a resource never run at the same time
+    resources: Iterable[str] = ()
+    # Runs alone, for changes that affect everything (reboots, global settings)
+    exclusive: bool = False
+
+    def __post_init__(self):
+        self.resources = frozenset(self.resources)
+
+
+@dataclass
+class ExperimentResult:
+    """Outcome and timings of one experiment"""
+    name: str
+    success: bool = False
+    error: Optional[str] = None
+    output: Any = None
+    snapshot_id: Optional[str] = None
+    rolled_back: bool = False
+    rollback_ok: Optional[bool] = None
+    queued: float = 0.0  # seconds from suite start until it began
+    duration: float = 0.0
+    phases: Dict[str, float] = field(default_factory=dict)
+    resource_deltas: Dict[str, float] = field(default_factory=dict)
+    concurrent_with: List[str] = field(default_factory=list)
+
+
+def device_probe(client: AIROSClient) -> Dict[str, float]:
+    """Device counters sampled before and after each experiment"""
+    if client.cache is not None:
+        client.cache.invalidate("system/info")
+    info = client.get_system_info()
+    return {
+        "free_memory": info.free_memory,
+        "used_memory": info.total_memory - info.free_memory
+    }
+
+
+class ExperimentSuite:
+    """
+    Runs experiments concurrently where their resources allow
+
+    Experiments start in declaration order as soon as none of their resources
+    is held by a running experiment; an exclusive experiment waits for the
+    device to be idle and blocks later ones until it finishes. A failed
+    experiment is rolled back to its snapshot only once every other running
+    experiment has finished, since the rollback restores device-wide state;
+    no new experiment starts in the meantime.
+
+    Only lazy snapshots, which journal each experiment's own commands, allow
+    concurrency. A full snapshot taken while a peer is mid-setup would
+    capture (and on rollback restore) the peer's partial changes, so with
+    full snapshots experiments run one at a time.
+    """
+
+    def __init__(self, client: AIROSClient, experiments: List[Experiment],
+                 max_parallel: int = 4,
+                 probe: Optional[Callable[[AIROSClient], Dict[str, float]]] = device_probe):
+        names = [e.name for e in experiments]
+        if len(set(names)) != len(names):
+            raise ValueError("experiment names must be unique")
+
+        self.client = client
+        self.experiments = list(experiments)
+        self.max_parallel = max(1, max_parallel)
+        if client.snapshot_mode != "lazy" and self.max_parallel > 1:
+            logger.warning("Full snapshots are device-wide; running experiments one at a time "
+                           "(use snapshot_mode='lazy' to run them concurrently)")
+            self.max_parallel = 1
+        self.probe = probe
+
+        self.cond = threading.Condition()
+        self.running: Dict[str, ExperimentResult] = {}
+        self.held: set = set()
+        self.exclusive_running = False
+        # Failed experiments waiting for the device to drain, by start time
+        self.rollback_waiting: Dict[str, float] = {}
+        self.results: Dict[str, ExperimentResult] = {}
+        self.start = 0.0
+
+    def run(self, label: str = "") -> Dict[str, Any]:
+        """Run the whole suite and return its report"""
+        self.start = time.perf_counter()
+        started_at = time.time()
+        pending = list(self.experiments)
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            with self.cond:
+                while pending or self.running:
+                    for experiment in self._ready(pending):
+                        pending.remove(experiment)
+                        self._claim(experiment)
+                        pool.submit(self._run_one, experiment)
+                    self.cond.wait()
+
+        wall_time = time.perf_counter() - self.start
+        return build_report(
+            [self.results[e.name] for e in self.experiments],
+            label, started_at, wall_time, self.max_parallel
+        )
+
+    def _ready(self, pending: List[Experiment]) -> List[Experiment]:
+        """Pending experiments that can start now, in order (called with cond held)"""
+        if self.rollback_waiting or self.exclusive_running:
+            return []
+
+        ready = []
+        held = set(self.held)
+        running = len(self.running)
+        for experiment in pending:
+            if running >= self.max_parallel:
+                break
+            if experiment.exclusive:
+                if running == 0:
+                    ready.append(experiment)
+                # Nothing may overtake an exclusive experiment, or it would starve
+                break
+            if experiment.resources & held:
+                continue
+            ready.append(experiment)
+            held |= experiment.resources
+            running += 1
+        return ready
+
+    def _claim(self, experiment: Experiment):
+        """Mark an experiment running and hold its resources (called with cond held)"""
+        result = ExperimentResult(experiment.name, queued=time.perf_counter() - self.start)
+        for other in self.running.values():
+            other.concurrent_with.append(experiment.name)
+            result.concurrent_with.append(other.name)
+        self.running[experiment.name] = result
+        self.held |= experiment.resources
+        if experiment.exclusive:
+            self.exclusive_running = True
+
+    def _release(self, experiment: Experiment):
+        with self.cond:
+            self.results[experiment.name] = self.running.pop(experiment.name)
+            self.held -= experiment.resources
+            if experiment.exclusive:
+                self.exclusive_running = False
+            self.cond.notify_all()
+
+    def _run_one(self, experiment: Experiment):
+        with self.cond:
+            result = self.running[experiment.name]
+        began = time.perf_counter()
+        lazy = self.client.snapshot_mode == "lazy"
+        before = self._sample()
+
+        try:
+            with self._phase(result, "snapshot"):
+                result.snapshot_id = self.client.create_snapshot(
+                    f"suite_{experiment.name}", lazy=lazy)
+
+            # Only this experiment's commands go into its lazy snapshot
+            with self.client.journaling(result.snapshot_id if lazy else None):
+                with self._phase(result, "setup"):
+                    experiment.setup()
+                with self._phase(result, "test"):
+                    result.output = experiment.test()
+            result.success = True
+
+            if lazy:
+                self.client.release_snapshot(result.snapshot_id)
+
+        except Exception as e:
+            logger.error(f"Experiment {experiment.name} failed: {e}")
+            result.error = str(e)
+            if result.snapshot_id:
+                self._rollback(result)
+
+        finally:
+            if experiment.cleanup:
+                try:
+                    with self._phase(result, "cleanup"):
+                        experiment.cleanup()
+                except Exception as e:
+                    logger.error(f"Cleanup of {experiment.name} failed: {e}")
+
+            after = self._sample()
+            result.resource_deltas = {
+                name: after[name] - before[name] for name in before if name in after
+            }
+            result.duration = time.perf_counter() - began
+            self._release(experiment)
+
+    def _rollback(self, result: ExperimentResult):
+        """Roll back once only failed experiments are left running, newest first"""
+        with self.cond:
+            self.rollback_waiting[result.name] = result.queued
+            self.cond.notify_all()
+            while not (set(self.running) == set(self.rollback_waiting)
+                       and result.name == max(self.rollback_waiting,
+                                              key=self.rollback_waiting.get)):
+                self.cond.wait()
+
+        try:
+            logger.info(f"Rolling back {result.name}...")
+            with self._phase(result, "rollback"):
+                result.rollback_ok = self.client.rollback(result.snapshot_id)
+            result.rolled_back = True
+        except Exception as e:
+            logger.error(f"Rollback of {result.name} failed: {e}")
+            result.rollback_ok = False
+        finally:
+            with self.cond:
+                del self.rollback_waiting[result.name]
+                self.cond.notify_all()
+
+    def _phase(self, result: ExperimentResult, phase: str) -> "PhaseTimer":
+        return PhaseTimer(result.phases, phase)
+
+    def _sample(self) -> Dict[str, float]:
+        if self.probe is None:
+            return {}
+        try:
+            return self.probe(self.client)
+        except Exception as e:
+            logger.warning(f"Device probe failed: {e}")
+            return {}
+
+
+class PhaseTimer:
+    """Context manager adding a phase's elapsed seconds to a timing dict"""
+
+    def __init__(self, phases: Dict[str, float], phase: str):
+        self.phases = phases
+        self.phase = phase
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.phases[self.phase] = time.perf_counter() - self.began
+        return False
+
+
+def build_report(results: List[ExperimentResult], label: str, started_at: float,
+                 wall_time: float, max_parallel: int) -> Dict[str, Any]:
+    """Aggregate experiment results into a suite report"""
+    serial_time = sum(r.duration for r in results)
+    return {
+        "label": label,
+        "started_at": started_at,
+        "wall_time": wall_time,
+        "serial_time": serial_time,
+        "speedup": serial_time / wall_time if wall_time else 0.0,
+        "max_parallel": max_parallel,
+        "passed": sum(1 for r in results if r.success),
+        "failed": sum(1 for r in results if not r.success),
+        "rollbacks": sum(1 for r in results if r.rolled_back),
+        "phase_totals": {
+            phase: sum(r.phases.get(phase, 0.0) for r in results) for phase in PHASES
+        },
+        "experiments": [asdict(r) for r in results]
+    }
+
+
+def write_json(report: Dict[str, Any], path: Path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=repr)
+
+
+def write_csv(report: Dict[str, Any], path: Path):
+    """One row per experiment, with phases and resource deltas as columns"""
+    metrics = sorted({name for e in report["experiments"] for name in e["resource_deltas"]})
+    columns = (["label", "name", "success", "error", "rolled_back", "rollback_ok",
+                "queued", "duration"]
+               + [f"{phase}_s" for phase in PHASES]
+               + [f"delta_{name}" for name in metrics]
+               + ["concurrent_with"])
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for e in report["experiments"]:
+            row = {key: e[key] for key in ("name", "success", "error", "rolled_back",
+                                           "rollback_ok", "queued", "duration")}
+            row["label"] = report["label"]
+            row.update({f"{phase}_s": e["phases"].get(phase, "") for phase in PHASES})
+            row.update({f"delta_{name}": e["resource_deltas"].get(name, "") for name in metrics})
+            row["concurrent_with"] = " ".join(e["concurrent_with"])
+            writer.writerow(row)
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-experiment duration and outcome changes between two reports"""
+    before = {e["name"]: e for e in baseline["experiments"]}
+    rows = []
+    for e in current["experiments"]:
+        old = before.get(e["name"])
+        rows.append({
+            "name": e["name"],
+            "baseline": old["duration"] if old else None,
+            "current": e["duration"],
+            "change": (e["duration"] - old["duration"]) / old["duration"]
+                      if old and old["duration"] else None,
+            "status": ("new" if old is None
+                       else "fixed" if e["success"] and not old["success"]
+                       else "broken" if old["success"] and not e["success"]
+                       else "")
+        })
+    return rows
+
+
+def load_suite(path: Path, client: AIROSClient) -> List[Experiment]:
+    """Experiments from a Python file defining experiments(client) -> List[Experiment]"""
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return list(module.experiments(client))
+
+
+def print_report(report: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]] = None):
+    """Print a human readable suite summary"""
+    changes = {row["name"]: row for row in comparison or []}
+    for e in report["experiments"]:
+        status = "pass" if e["success"] else ("rolled back" if e["rolled_back"] else "FAIL")
+        line = f"{e['name']:<32} {status:<12} {e['duration']:>8.2f}s"
+        row = changes.get(e["name"])
+        if row and row["change"] is not None:
+            line += f"  {row['change'] * 100:+6.1f}%"
+        if row and row["status"]:
+            line += f"  {row['status']}"
+        print(line)
+
+    print()
+    print(f"Passed:        {report['passed']}/{report['passed'] + report['failed']}")
+    print(f"Rollbacks:     {report['rollbacks']}")
+    print(f"Wall time:     {report['wall_time']:.2f}s "
+          f"(serial {report['serial_time']:.2f}s, {report['speedup']:.1f}x)")
+    for phase, total in report["phase_totals"].items():
+        print(f"  {phase:<12} {total:.2f}s")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Run an AIROS experiment suite")
+    parser.add_argument('suite', type=Path,
+                        help="Python file defining experiments(client)")
+    parser.add_argument('--device', required=True, help="device IP address")
+    parser.add_argument('--token', required=True, help="agent auth token")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-parallel', type=int, default=4,
+                        help="experiments run at once (lazy snapshots only; full runs one)")
+    parser.add_argument('--snapshot-mode', choices=SNAPSHOT_MODES, default="full")
+    parser.add_argument('--label', default="", help="run label stored in the report")
+    parser.add_argument('--json', type=Path, default=None, help="write the report as JSON")
+    parser.add_argument('--csv', type=Path, default=None, help="write one CSV row per experiment")
+    parser.add_argument('--compare', type=Path, default=None,
+                        help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+
+    client = AIROSClient(args.device, args.token, port=args.port,
+                         snapshot_mode=args.snapshot_mode)
+    try:
+        experiments = load_suite(args.suite, client)
+        report = ExperimentSuite(client, experiments, args.max_parallel).run(args.label)
+    finally:
+        client.close()
+
+    comparison = None
+    if args.compare:
+        with open(args.compare) as f:
+            comparison = compare_reports(json.load(f), report)
+
+    if args.json:
+        write_json(report, args.json)
+    if args.csv:
+        write_csv(report, args.csv)
+    print_report(report, comparison)
+
+    if report["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+AIROS Logcat Ingestion - Multi-buffer crash, tombstone and ANR extraction
+Parses `logcat -v threadtime` output from the crash, main and system buffers
+and attributes every event to a package through a live PID index
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Buffers and filterspecs pushed down to logcat so only crash-relevant tags
+# cross the container boundary
+LOGCAT_BUFFERS = "crash,main,system"
+LOGCAT_FILTERS = ["AndroidRuntime:E", "DEBUG:F", "ActivityManager:I", "*:S"]
+
+# A crash block with no new lines for this long is considered complete
+IDLE_FLUSH_SECONDS = 1.0
+
+# 10-18 09:14:03.019  4321  4321 E AndroidRuntime: FATAL EXCEPTION: main
+THREADTIME_LINE = re.compile(
+    r'^\d\d-\d\d\s+\d\d:\d\d:\d\d\.\d+\s+(\d+)\s+(\d+)\s+([VDIWEFA])\s+(.*?)\s*: (.*)$'
+)
+
+# Start proc 4321:com.whatsapp/u0a142 for activity {...}
+# Start proc com.whatsapp for activity {...}: pid=4321 uid=10142 gids={...}
+START_PROC = re.compile(r'^Start proc (?:(\d+):([^/\s]+)/\S+|([^\s:]+) .*?pid=(\d+))')
+# Process com.whatsapp (pid 4321) has died
+PROCESS_DIED = re.compile(r'^Process (\S+) \(pid (\d+)\) has died')
+# Killing 4321:com.whatsapp/u0a142 (adj 900): empty
+PROCESS_KILLED = re.compile(r'^Killing (\d+):([^/\s]+)/')
+# Process: com.whatsapp, PID: 4321
+JAVA_PROCESS = re.compile(r'^Process: ([^,\s]+)')
+# pid: 9001, tid: 9023, name: GLThread 12  >>> com.example.game <<<
+TOMBSTONE_PID = re.compile(r'^pid: (\d+), tid: \d+, name: .*?(?:>>> (\S+) <<<)?$')
+# ANR in org.example.mail (org.example.mail/.SyncService)
+ANR_IN = re.compile(r'^ANR in (\S+)')
+ANR_PID = re.compile(r'^PID: (\d+)')
+
+
+@dataclass
+class LogcatEvent:
+    """A complete crash, native crash or ANR extracted from logcat"""
+    kind: str  # "java_crash", "native_crash" or "anr"
+    pid: int
+    package_name: Optional[str]
+    lines: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.lines)
+
+
+@dataclass
+class _OpenBlock:
+    """Event still receiving lines from its logging process"""
+    event: LogcatEvent
+    tag: str
+    priority: str
+    last_seen: float
+
+
+class PidPackageIndex:
+    """Live PID -> package map fed from ActivityManager process lines"""
+
+    def __init__(self):
+        self.packages: Dict[int, str] = {}
+
+    def get(self, pid: int) -> Optional[str]:
+        return self.packages.get(pid)
+
+    def observe(self, message: str):
+        """Record process starts seen in ActivityManager messages"""
+        match = START_PROC.match(message)
+        if match:
+            if match.group(1):
+                self.packages[int(match.group(1))] = match.group(2)
+            else:
+                self.packages[int(match.group(4))] = match.group(3)
+
+    def forget(self, pid: int):
+        self.packages.pop(pid, None)
+
+    def seed(self, ps_output: str):
+        """Seed from `ps -A -o PID,NAME` for processes started before ingestion"""
+        for line in ps_output.splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[0].isdigit() and '.' in parts[1]:
+                self.packages[int(parts[0])] = parts[1]
+
+
+class LogcatIngester:
+    """
+    Groups threadtime lines into crash, tombstone and ANR events
+
+    Lines of one event come from one logging process with one tag and
+    priority. An event is closed when that process logs anything else, when
+    ActivityManager reports the crashed process died, when it grows past
+    max_lines, or when flushed after going idle.
+    """
+
+    def __init__(self, index: Optional[PidPackageIndex] = None, max_lines: int = 200):
+        self.index = index or PidPackageIndex()
+        self.max_lines = max_lines
+        self.open: Dict[int, _OpenBlock] = {}
+
+    def feed(self, line: str) -> List[LogcatEvent]:
+        """Consume one logcat line and return any events it completed"""
+        match = THREADTIME_LINE.match(line.rstrip('\n'))
+        if not match:
+            return []
+
+        pid = int(match.group(1))
+        priority = match.group(3)
+        tag = match.group(4)
+        message = match.group(5)
+        now = time.monotonic()
+        events = []
+
+        block = self.open.get(pid)
+        if block and (block.tag != tag or block.priority != priority
+                      or self._starts_event(tag, message)):
+            events.append(self._close(pid))
+            block = None
+
+        if block:
+            block.event.lines.append(line.rstrip('\n'))
+            block.last_seen = now
+            self._attribute(block.event, message)
+            if len(block.event.lines) >= self.max_lines:
+                events.append(self._close(pid))
+        elif self._starts_event(tag, message):
+            kind = {
+                "AndroidRuntime": "java_crash",
+                "DEBUG": "native_crash",
+                "ActivityManager": "anr"
+            }[tag]
+            event = LogcatEvent(kind=kind, pid=pid, package_name=None,
+                                lines=[line.rstrip('\n')])
+            if kind == "java_crash":
+                event.package_name = self.index.get(pid)
+            self._attribute(event, message)
+            self.open[pid] = _OpenBlock(event, tag, priority, now)
+
+        if tag == "ActivityManager":
+            self.index.observe(message)
+            died = PROCESS_DIED.match(message)
+            killed = PROCESS_KILLED.match(message)
+            if died or killed:
+                dead_pid = int(died.group(2)) if died else int(killed.group(1))
+                events.extend(self._close_target(dead_pid))
+                self.index.forget(dead_pid)
+
+        return events
+
+    def flush(self, idle: Optional[float] = None) -> List[LogcatEvent]:
+        """Close open events, or only those idle for at least `idle` seconds"""
+        now = time.monotonic()
+        return [
+            self._close(pid) for pid, block in list(self.open.items())
+            if idle is None or now - block.last_seen >= idle
+        ]
+
+    @staticmethod
+    def _starts_event(tag: str, message: str) -> bool:
+        if tag == "AndroidRuntime":
+            return message.startswith("FATAL EXCEPTION")
+        if tag == "DEBUG":
+            return message.startswith("*** ***")
+        if tag == "ActivityManager":
+            return message.startswith("ANR in ")
+        return False
+
+    def _attribute(self, event: LogcatEvent, message: str):
+        """Resolve the crashed process and package from event lines"""
+        if event.kind == "java_crash":
+            match = JAVA_PROCESS.match(message)
+            if match and not event.package_name:
+                event.package_name = match.group(1)
+        elif event.kind == "native_crash":
+            match = TOMBSTONE_PID.match(message)
+            if match:
+                event.pid = int(match.group(1))
+                event.package_name = self.index.get(event.pid) or match.group(2)
+        elif event.kind == "anr":
+            match = ANR_IN.match(message)
+            if match:
+                event.package_name = match.group(1)
+            match = ANR_PID.match(message)
+            if match:
+                event.pid = int(match.group(1))
+
+    def _close(self, pid: int) -> LogcatEvent:
+        return self.open.pop(pid).event
+
+    def _close_target(self, target_pid: int) -> List[LogcatEvent]:
+        """Close every open event describing the given (now dead) process"""
+        return [
+            self._close(pid) for pid, block in list(self.open.items())
+            if block.event.pid == target_pid
+        ]
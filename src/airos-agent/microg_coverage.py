@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+AIROS MicroG Coverage - Which GMS APIs each GmsCore release implements
+A precomputed, versioned lookup table cross-referenced with the GMS APIs
+an app's DEX files reference (see dex_index), deciding up front whether
+enabling microG is enough, the APK needs patching, or the app cannot run
+"""
+
+import re
+import sys
+import json
+import argparse
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dex_index import gms_apis
+
+MICROG_PACKAGE = "com.google.android.gms"
+
+# Coverage of one API in a GmsCore release
+IMPLEMENTED = "implemented"  # microG serves it
+CLIENT = "client"            # library code that works without GmsCore
+PARTIAL = "partial"          # stubbed or incomplete; the app must be patched to cope
+UNSUPPORTED = "unsupported"  # needs Google-signed attestation or payment backends
+
+# What to do about an app's GMS dependency
+ENABLE_MICROG = "enable_microg"
+PATCH = "patch"
+
+# API coverage of the oldest tracked release, keyed like dex_index.gms_api()
+BASE_COVERAGE = {
+    "gms.common": IMPLEMENTED,
+    "gms.base": IMPLEMENTED,
+    "gms.tasks": CLIENT,
+    "gms.dynamic": CLIENT,
+    "gms.internal": CLIENT,
+    "gms.security": IMPLEMENTED,
+    "gms.auth": PARTIAL,
+    "gms.identity": PARTIAL,
+    "gms.location": IMPLEMENTED,
+    "gms.maps": PARTIAL,
+    "gms.gcm": IMPLEMENTED,
+    "gms.iid": IMPLEMENTED,
+    "gms.cloudmessaging": IMPLEMENTED,
+    "gms.clearcut": IMPLEMENTED,
+    "gms.phenotype": IMPLEMENTED,
+    "gms.measurement": CLIENT,
+    "gms.analytics": CLIENT,
+    "gms.ads": PARTIAL,
+    "gms.cast": PARTIAL,
+    "gms.fido": PARTIAL,
+    "gms.fitness": PARTIAL,
+    "gms.games": PARTIAL,
+    "gms.nearby": PARTIAL,
+    "gms.wearable": PARTIAL,
+    "gms.vision": PARTIAL,
+    "gms.recaptcha": PARTIAL,
+    "gms.safetynet": PARTIAL,
+    "gms.droidguard": UNSUPPORTED,
+    "gms.wallet": UNSUPPORTED,
+    "gms.pay": UNSUPPORTED,
+    "gms.tapandpay": UNSUPPORTED,
+    "firebase.common": CLIENT,
+    "firebase.analytics": CLIENT,
+    "firebase.auth": PARTIAL,
+    "firebase.components": CLIENT,
+    "firebase.crashlytics": CLIENT,
+    "firebase.database": CLIENT,
+    "firebase.firestore": CLIENT,
+    "firebase.installations": CLIENT,
+    "firebase.remoteconfig": CLIENT,
+    "firebase.storage": CLIENT,
+    "firebase.perf": CLIENT,
+    "firebase.iid": IMPLEMENTED,
+    "firebase.messaging": IMPLEMENTED,
+    "firebase.dynamiclinks": PARTIAL,
+    "firebase.appcheck": UNSUPPORTED,
+}
+
+# What changed in each later release, oldest first
+RELEASE_CHANGES = [
+    ("0.2.28.231657", {}),
+    ("0.3.0.233515", {"gms.auth": IMPLEMENTED, "gms.identity": IMPLEMENTED,
+                      "firebase.auth": IMPLEMENTED}),
+    ("0.3.1.240913", {"gms.maps": IMPLEMENTED, "gms.fido": IMPLEMENTED}),
+    ("0.3.6.244735", {"gms.cast": IMPLEMENTED, "firebase.dynamiclinks": IMPLEMENTED}),
+]
+
+
+def version_key(version: str) -> Tuple[int, ...]:
+    """(0, 3, 6, 244735) for '0.3.6.244735', ignoring suffixes such as '-hw'"""
+    return tuple(int(part) for part in re.findall(r'\d+', version.split("-")[0]))
+
+
+def _build_tables() -> Dict[str, Dict[str, str]]:
+    tables, coverage = {}, dict(BASE_COVERAGE)
+    for version, changes in RELEASE_CHANGES:
+        coverage.update(changes)
+        tables[version] = dict(coverage)
+    return tables
+
+
+# Full API -> coverage map per tracked release, built once at import
+COVERAGE = _build_tables()
+LATEST = RELEASE_CHANGES[-1][0]
+
+
+def table_version(installed: Optional[str]) -> str:
+    """The newest tracked release no newer than the installed one (latest if none)"""
+    if not installed:
+        return LATEST
+    key = version_key(installed)
+    tracked = [version for version, _ in RELEASE_CHANGES if version_key(version) <= key]
+    return tracked[-1] if tracked else RELEASE_CHANGES[0][0]
+
+
+@dataclass
+class CoverageDecision:
+    """How an app's GMS dependency will be handled"""
+    action: str  # ENABLE_MICROG, PATCH or UNSUPPORTED
+    microg_version: str  # tracked release the decision used
+    installed_version: Optional[str] = None  # None when microG is not installed
+    covered: List[str] = field(default_factory=list)
+    partial: List[str] = field(default_factory=list)
+    unsupported: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def decide(apis: Iterable[str], installed_version: Optional[str] = None,
+           planned_version: Optional[str] = None) -> CoverageDecision:
+    """
+    Cross-reference referenced GMS APIs with a GmsCore release
+
+    The release is the installed one or, when microG is not installed, the
+    one that would be installed (planned_version, else the latest).
+
+    Any API nothing can provide makes the app unsupported; any API microG
+    only stubs (or that the table does not know) needs the patch pipeline;
+    otherwise enabling microG is enough.
+    """
+    version = table_version(installed_version or planned_version)
+    coverage = COVERAGE[version]
+    decision = CoverageDecision(action=ENABLE_MICROG, microg_version=version,
+                                installed_version=installed_version)
+
+    for api in sorted(set(apis)):
+        status = coverage.get(api, PARTIAL)
+        if status == UNSUPPORTED:
+            decision.unsupported.append(api)
+        elif status == PARTIAL:
+            decision.partial.append(api)
+        else:
+            decision.covered.append(api)
+
+    if decision.unsupported:
+        decision.action = UNSUPPORTED
+    elif decision.partial:
+        decision.action = PATCH
+    return decision
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Decide how microG handles an app's GMS APIs")
+    parser.add_argument('apks', nargs='*', help="APKs to index (or pass --api)")
+    parser.add_argument('--api', action='append', default=[], help="GMS API such as gms.maps; repeatable")
+    parser.add_argument('--microg-version', default=None, help="installed GmsCore version (default: latest)")
+    args = parser.parse_args()
+
+    apis = list(args.api)
+    if args.apks:
+        apis.extend(gms_apis(args.apks))
+
+    json.dump(decide(apis, args.microg_version).to_dict(), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
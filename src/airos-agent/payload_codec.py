@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+AIROS Payload Codec - Negotiated body encoding and compression
+Serves API responses as JSON, MessagePack or CBOR and compresses them with
+zstd or gzip above a size threshold, according to each client's Accept and
+Accept-Encoding headers
+"""
+
+import gzip
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Optional codecs; each is only offered when its package is installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+CBOR_TYPE = "application/cbor"
+
+# Bodies smaller than this are sent uncompressed; framing and CPU cost
+# outweigh the savings on a few hundred bytes
+COMPRESS_THRESHOLD = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def available_formats() -> List[str]:
+    """Body formats this process can encode and decode, preferred first"""
+    formats = []
+    if msgpack:
+        formats.append(MSGPACK_TYPE)
+    if cbor2:
+        formats.append(CBOR_TYPE)
+    formats.append(JSON_TYPE)
+    return formats
+
+
+def available_encodings() -> List[str]:
+    """Content codings this process can compress and decompress, preferred first"""
+    return (["zstd"] if zstandard else []) + ["gzip"]
+
+
+def _parse_header(value: Optional[str]) -> List[Tuple[str, float]]:
+    """Split an Accept-style header into (token, q) pairs, highest q first"""
+    items = []
+    for position, part in enumerate((value or "").split(",")):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        items.append((token.strip().lower(), q, position))
+    items.sort(key=lambda item: (-item[1], item[2]))
+    return [(token, q) for token, q, _ in items if q > 0]
+
+
+def choose_format(accept: Optional[str]) -> str:
+    """Body format for a request's Accept header (JSON unless a binary one is asked for)"""
+    supported = available_formats()
+    for token, _ in _parse_header(accept):
+        if token in supported:
+            return token
+    return JSON_TYPE
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Content coding for a request's Accept-Encoding header, or None"""
+    offered = [token for token, _ in _parse_header(accept_encoding)]
+    for encoding in available_encodings():
+        if encoding in offered:
+            return encoding
+    return None
+
+
+def encode(data: Any, content_type: str = JSON_TYPE) -> bytes:
+    if content_type == MSGPACK_TYPE:
+        return msgpack.packb(data, use_bin_type=True)
+    if content_type == CBOR_TYPE:
+        return cbor2.dumps(data)
+    return json.dumps(data).encode()
+
+
+def decode(body: bytes, content_type: Optional[str] = JSON_TYPE) -> Any:
+    """Decode a body by its Content-Type (parameters such as charset are ignored)"""
+    media_type = (content_type or JSON_TYPE).split(";")[0].strip().lower()
+    if media_type == MSGPACK_TYPE:
+        return msgpack.unpackb(body, raw=False)
+    if media_type == CBOR_TYPE:
+        return cbor2.loads(body)
+    return json.loads(body)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    return body
+
+
+def accept_headers(content_type: str = JSON_TYPE) -> Dict[str, str]:
+    """Request headers preferring content_type, with JSON as fallback for older agents"""
+    accept = JSON_TYPE if content_type == JSON_TYPE else f"{content_type}, {JSON_TYPE};q=0.5"
+    return {
+        "Accept": accept,
+        "Accept-Encoding": ", ".join(available_encodings())
+    }
+
+
+def codec_middleware(threshold: int = COMPRESS_THRESHOLD):
+    """
+    aiohttp middleware applying the negotiated format and compression
+
+    Only buffered JSON responses (web.json_response) are rewritten; SSE,
+    NDJSON and WebSocket streams pass through untouched.
+    """
+    # Imported here so clients can use the codec without aiohttp installed
+    from aiohttp import web
+
+    @web.middleware
+    async def middleware(request, handler):
+        response = await handler(request)
+        if not isinstance(response, web.Response) or response.content_type != JSON_TYPE:
+            return response
+        if not isinstance(response.body, (bytes, bytearray)):
+            return response
+
+        body = bytes(response.body)
+        content_type = choose_format(request.headers.get("Accept"))
+        if content_type != JSON_TYPE:
+            body = encode(json.loads(body), content_type)
+
+        encoding = None
+        if len(body) >= threshold:
+            encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+            if encoding:
+                body = compress(body, encoding)
+
+        if content_type == JSON_TYPE and encoding is None:
+            return response
+
+        response.body = body
+        response.content_type = content_type
+        if content_type != JSON_TYPE:
+            response.charset = None
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept, Accept-Encoding"
+        return response
+
+    return middleware
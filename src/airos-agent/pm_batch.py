@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+AIROS PM Batch - Package manager operations in one container round trip
+Gathers pm enable/disable/grant/revoke calls into a single shell script
+run through one Waydroid shell invocation, optionally all-or-nothing,
+and reports the outcome of every operation
+"""
+
+import uuid
+import shlex
+import logging
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any
+
+from airos_core import AndroidBackend
+
+logger = logging.getLogger('AIROS-PM')
+
+
+@dataclass
+class PmOperation:
+    """One pm call and the call that reverts it"""
+    target: str  # component or "package permission", for reporting
+    command: str
+    undo: Optional[str] = None
+
+
+@dataclass
+class PmResult:
+    """Outcome of one operation of a batch"""
+    target: str
+    command: str
+    status: str  # "ok", "failed", "skipped", "rolled_back", "rollback_failed" or "error"
+    exit_code: Optional[int] = None
+    output: str = ""
+
+    @property
+    def success(self) -> bool:
+        return self.status == "ok"
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = asdict(self)
+        result['success'] = self.success
+        return result
+
+
+class PmBatch:
+    """
+    pm operations applied by one shell script
+
+    Each operation's output and exit status are framed by a random marker
+    so they can be told apart in the combined output. An atomic batch
+    stops at the first failure and reverts what it already applied, in
+    reverse order (grants are revoked; enabled or disabled components go
+    back to their manifest default).
+    """
+
+    def __init__(self, atomic: bool = False):
+        self.atomic = atomic
+        self.operations: List[PmOperation] = []
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def add(self, target: str, command: str, undo: Optional[str] = None) -> 'PmBatch':
+        self.operations.append(PmOperation(target, command, undo))
+        return self
+
+    def enable(self, component: str) -> 'PmBatch':
+        quoted = shlex.quote(component)
+        return self.add(component, f"pm enable {quoted}", f"pm default-state {quoted}")
+
+    def disable(self, component: str) -> 'PmBatch':
+        quoted = shlex.quote(component)
+        return self.add(component, f"pm disable {quoted}", f"pm default-state {quoted}")
+
+    def grant(self, package_name: str, permission: str) -> 'PmBatch':
+        args = f"{shlex.quote(package_name)} {shlex.quote(permission)}"
+        return self.add(f"{package_name} {permission}", f"pm grant {args}", f"pm revoke {args}")
+
+    def revoke(self, package_name: str, permission: str) -> 'PmBatch':
+        args = f"{shlex.quote(package_name)} {shlex.quote(permission)}"
+        return self.add(f"{package_name} {permission}", f"pm revoke {args}", f"pm grant {args}")
+
+    def script(self, marker: str) -> str:
+        """The shell script applying every operation; it always exits 0"""
+        lines = ["ok=1"]
+        for i, op in enumerate(self.operations):
+            run = f'echo "{marker} run {i}"; {op.command} </dev/null 2>&1; rc=$?; echo "{marker} rc {i} $rc"'
+            if self.atomic:
+                lines.append(f'if [ $ok = 1 ]; then {run}; if [ $rc = 0 ]; then a{i}=1; else ok=0; fi; fi')
+            else:
+                lines.append(run)
+
+        if self.atomic:
+            for i, op in reversed(list(enumerate(self.operations))):
+                if op.undo:
+                    lines.append(
+                        f'if [ $ok = 0 ] && [ "$a{i}" = 1 ]; then echo "{marker} undo {i}"; '
+                        f'{op.undo} </dev/null 2>&1; echo "{marker} undone {i} $?"; fi'
+                    )
+
+        lines.append("exit 0")
+        return "\n".join(lines)
+
+    def parse(self, output: str, marker: str) -> List[PmResult]:
+        """Per-operation results from the script's combined output"""
+        results = [PmResult(op.target, op.command, "skipped") for op in self.operations]
+        captured: Dict[int, List[str]] = {}
+        current = None
+
+        for line in output.splitlines():
+            if not line.startswith(marker + " "):
+                if current is not None:
+                    captured[current].append(line)
+                continue
+
+            kind, index, *rest = line[len(marker) + 1:].split()
+            i = int(index)
+            if kind in ("run", "undo"):
+                current = i
+                captured.setdefault(i, [])
+            elif kind == "rc":
+                results[i].exit_code = int(rest[0])
+                results[i].status = "ok" if results[i].exit_code == 0 else "failed"
+                current = None
+            elif kind == "undone":
+                results[i].status = "rolled_back" if rest[0] == "0" else "rollback_failed"
+                current = None
+
+        for i, lines in captured.items():
+            results[i].output = "\n".join(lines).strip()
+
+        # Only an atomic batch that hit a failure skips operations; anything
+        # else that never reported (e.g. a shell that ignored the script) is an error
+        stopped = self.atomic and any(r.status == "failed" for r in results)
+        for result in results:
+            if result.status == "skipped" and not stopped:
+                result.status = "error"
+                result.output = result.output or (output.strip() if not captured else "")
+        return results
+
+    def run(self, backend: AndroidBackend) -> List[PmResult]:
+        """Apply the batch in one round trip to the backend's container"""
+        if not self.operations:
+            return []
+
+        results = backend.run_pm_batch(self)
+        failed = [r.target for r in results if r.status != "ok"]
+        if failed:
+            logger.warning(f"pm batch: {len(failed)} of {len(results)} operations not applied: "
+                           f"{', '.join(failed)}")
+        return results
+
+    def run_in_shell(self, backend: AndroidBackend) -> List[PmResult]:
+        """Apply the batch with a single execute_shell call"""
+        marker = f"@@airos-{uuid.uuid4().hex}"
+        success, output = backend.execute_shell(f"sh -c {shlex.quote(self.script(marker))}")
+        if not success:
+            logger.error(f"pm batch of {len(self)} operations failed to run: {output}")
+            return [PmResult(op.target, op.command, "error", output=output) for op in self.operations]
+
+        return self.parse(output, marker)
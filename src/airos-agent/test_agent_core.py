@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the HTTP API AgentCore shares between the Linux and
+virtual agents, run against the virtual agent with the instant mock profile
+"""
+
+import asyncio
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    """Virtual agent keeping its data under a temporary home"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("AIROS_VIRTUAL_PROFILE", "instant")
+    from airos_agent_virtual import AIROSVirtualAgent
+    return AIROSVirtualAgent()
+
+
+def run(agent, scenario):
+    """Run scenario(client) against the agent's app on a test server"""
+    async def main():
+        async with TestClient(TestServer(agent.app)) as client:
+            await scenario(client)
+
+    asyncio.run(main())
+
+
+def test_status_and_system_info(agent):
+    async def scenario(client):
+        response = await client.get("/api/status")
+        assert response.status == 200
+        status = await response.json()
+        assert status["mode"] == "virtual"
+        assert status["mock_profile"] == "instant"
+        assert status["waydroid_running"] is True
+
+        response = await client.get("/api/system_info")
+        info = await response.json()
+        assert info["os"] == "AIROS-Linux-Virtual"
+        assert info["installed_packages"] == 5
+
+    run(agent, scenario)
+
+
+def test_execute(agent):
+    async def scenario(client):
+        response = await client.post("/api/execute", json={"command": "uname -a"})
+        assert await response.json() == {
+            "success": True, "output": "Mock output for: uname -a", "exit_code": 0
+        }
+
+        response = await client.post("/api/execute", json={})
+        assert response.status == 400
+
+    run(agent, scenario)
+
+
+def test_execute_batch_keeps_request_order(agent):
+    async def scenario(client):
+        response = await client.post("/api/execute_batch", json={
+            "commands": ["ls", {"command": "pwd", "timeout": 1000}],
+            "mode": "parallel"
+        })
+        data = await response.json()
+        assert data["success"] is True
+        assert data["mode"] == "parallel"
+        assert [r["output"] for r in data["results"]] == [
+            "Mock output for: ls", "Mock output for: pwd"
+        ]
+
+        for bad in ({}, {"commands": []}, {"commands": [1]}, {"commands": ["ls"], "mode": "both"}):
+            response = await client.post("/api/execute_batch", json=bad)
+            assert response.status == 400
+
+    run(agent, scenario)
+
+
+def test_execute_stream_ends_with_exit_frame(agent):
+    async def scenario(client):
+        response = await client.post("/api/execute_stream", json={"command": "logcat -d"})
+        assert response.status == 200
+        frames = [json.loads(line) async for line in response.content if line.strip()]
+        assert frames[0] == {"stream": "stdout", "data": "Mock output for: logcat -d"}
+        assert frames[-1]["stream"] == "exit"
+        assert frames[-1]["status"] == "ok"
+
+    run(agent, scenario)
+
+
+def test_install_and_fix_app(agent):
+    async def scenario(client):
+        response = await client.post("/api/install_app", json={"package_name": "com.whatsapp.w4b"})
+        assert response.status == 200
+        assert "com.whatsapp.w4b" in agent.waydroid.list_packages()
+
+        response = await client.post("/api/fix_app", json={"package_name": "com.spotify.music"})
+        assert response.status == 200
+
+        response = await client.get("/api/app_issues")
+        assert response.status == 200
+
+        response = await client.post("/api/install_app", json={})
+        assert response.status == 400
+
+    run(agent, scenario)
+
+
+def test_websocket_resume_replays_missed_events(agent):
+    async def scenario(client):
+        ws = await client.ws_connect("/api/ws")
+        greeting = await ws.receive_json()
+        assert greeting["action"] == "resume"
+        assert greeting["status"] == "new"
+        epoch, seen = greeting["epoch"], greeting["seq"]
+        await ws.close()
+
+        # Events published while the client is away
+        response = await client.post("/api/demo/simulate_crash",
+                                     json={"package_name": "com.whatsapp"})
+        assert (await response.json())["crash_simulated"] is True
+
+        ws = await client.ws_connect(f"/api/ws?since={seen}&epoch={epoch}")
+        greeting = await ws.receive_json()
+        assert greeting["status"] == "resumed"
+        replayed = [await ws.receive_json() for _ in range(greeting["seq"] - seen)]
+        assert [e["eventType"] for e in replayed][:2] == ["crash", "issue"]
+        assert [e["seq"] for e in replayed] == list(range(seen + 1, greeting["seq"] + 1))
+
+        # Snapshot events may still be queued ahead of the acknowledgement
+        await ws.send_json({"action": "authenticate", "token": "any"})
+        message = await ws.receive_json()
+        while message.get("action") != "authenticate":
+            message = await ws.receive_json()
+        assert message["status"] == "authenticated"
+        await ws.close()
+
+    run(agent, scenario)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for event_bus: sequence numbering, filtered subscriptions and the
+replay that lets reconnecting clients resume
+"""
+
+from event_bus import EventBus
+
+
+def test_events_are_numbered_and_kept():
+    bus = EventBus()
+    bus.publish("crash", {"kind": "java"}, "com.whatsapp")
+    bus.publish("install", {"status": "installed"}, "com.spotify.music")
+
+    assert bus.sequence == 2
+    assert [e["seq"] for e in bus.history] == [1, 2]
+    assert all(e["epoch"] == bus.epoch for e in bus.history)
+
+
+def test_subscription_filters_topics_and_packages():
+    bus = EventBus()
+    subscription = bus.subscribe(topics=["crash"], packages=["com.whatsapp"])
+    bus.publish("crash", {}, "com.whatsapp")
+    bus.publish("crash", {}, "com.spotify.music")
+    bus.publish("install", {}, "com.whatsapp")
+
+    assert subscription.queue.qsize() == 1
+    assert subscription.queue.get_nowait()["seq"] == 1
+
+
+def test_replay_returns_missed_events():
+    bus = EventBus()
+    for i in range(5):
+        bus.publish("fix", {"n": i})
+
+    events, complete = bus.replay(bus.subscribe(), since=3, epoch=bus.epoch)
+
+    assert complete
+    assert [e["seq"] for e in events] == [4, 5]
+
+
+def test_replay_respects_subscription_filter():
+    bus = EventBus()
+    bus.publish("crash", {})
+    bus.publish("install", {})
+
+    events, complete = bus.replay(bus.subscribe(topics=["install"]), since=0)
+
+    assert complete
+    assert [e["eventType"] for e in events] == ["install"]
+
+
+def test_replay_reports_gap_when_history_evicted():
+    bus = EventBus(replay_size=2)
+    for i in range(5):
+        bus.publish("fix", {"n": i})
+
+    events, complete = bus.replay(bus.subscribe(), since=1)
+
+    assert not complete
+    assert [e["seq"] for e in events] == [4, 5]
+    assert bus.stats["resume_gaps"] == 1
+
+
+def test_replay_from_another_epoch_starts_over():
+    bus = EventBus()
+    bus.publish("fix", {})
+    bus.publish("fix", {})
+
+    # A cursor from before an agent restart: same numbers, different run
+    events, complete = bus.replay(bus.subscribe(), since=1, epoch="previous-run")
+
+    assert not complete
+    assert [e["seq"] for e in events] == [1, 2]
+
+
+def test_replay_with_cursor_ahead_of_bus_starts_over():
+    bus = EventBus()
+    bus.publish("fix", {})
+
+    events, complete = bus.replay(bus.subscribe(), since=40)
+
+    assert not complete
+    assert [e["seq"] for e in events] == [1]
+
+
+def test_cursor_parsing():
+    bus = EventBus()
+
+    assert bus._cursor(None) == (None, None)
+    assert bus._cursor("7") == (7, None)
+    assert bus._cursor("7", "abc") == (7, "abc")
+    assert bus._cursor("abc:7") == (7, "abc")
+    assert bus._cursor("abc:7", "other") == (7, "abc")
+    assert bus._cursor("abc:x") == (None, "abc")
+
+
+def test_late_subscriber_gets_snapshot_first():
+    bus = EventBus()
+    bus.publish("state", {"fixes_applied": 0})
+    bus.add_snapshot("state", lambda: {"fixes_applied": 3})
+
+    subscription = bus.subscribe()
+    event = subscription.queue.get_nowait()
+
+    assert event["snapshot"] is True
+    assert event["seq"] == 1
+    assert event["data"] == {"fixes_applied": 3}
+
+
+def test_slow_consumer_is_dropped():
+    bus = EventBus(queue_size=2)
+    subscription = bus.subscribe()
+    for i in range(3):
+        bus.publish("fix", {"n": i})
+
+    assert subscription.dropped
+    assert subscription not in bus.subscriptions
+    assert subscription.queue.get_nowait() is None
+    assert bus.stats["slow_consumers_dropped"] == 1
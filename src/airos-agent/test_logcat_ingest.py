@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for logcat_ingest: grouping threadtime lines into crash, tombstone
+and ANR events and attributing them to packages
+"""
+
+from logcat_ingest import LogcatIngester, PidPackageIndex
+
+
+def line(pid: int, priority: str, tag: str, message: str) -> str:
+    """One `logcat -v threadtime` line, logged from the main thread"""
+    return f"10-18 09:14:03.019  {pid}  {pid} {priority} {tag}: {message}"
+
+
+def feed_all(ingester: LogcatIngester, lines) -> list:
+    events = []
+    for text in lines:
+        events.extend(ingester.feed(text))
+    return events
+
+
+def test_java_crash_closes_on_other_output_of_its_process():
+    ingester = LogcatIngester()
+    events = feed_all(ingester, [
+        line(4321, "E", "AndroidRuntime", "FATAL EXCEPTION: main"),
+        line(4321, "E", "AndroidRuntime", "Process: com.whatsapp, PID: 4321"),
+        line(4321, "E", "AndroidRuntime", "java.lang.SecurityException: Permission denied"),
+    ])
+    assert events == []
+
+    events = ingester.feed(line(4321, "I", "Process", "Sending signal. PID: 4321 SIG: 9"))
+
+    assert len(events) == 1
+    assert events[0].kind == "java_crash"
+    assert events[0].package_name == "com.whatsapp"
+    assert len(events[0].lines) == 3
+    assert "SecurityException" in events[0].text
+
+
+def test_java_crash_attributed_from_pid_index():
+    index = PidPackageIndex()
+    index.seed("  PID NAME\n 4321 com.spotify.music\n    1 init\n")
+    ingester = LogcatIngester(index)
+
+    ingester.feed(line(4321, "E", "AndroidRuntime", "FATAL EXCEPTION: main"))
+    events = ingester.flush()
+
+    assert events[0].package_name == "com.spotify.music"
+
+
+def test_tombstone_attributed_to_crashed_process():
+    ingester = LogcatIngester()
+    ingester.feed(line(1000, "I", "ActivityManager",
+                       "Start proc 9001:com.example.game/u0a150 for activity {...}"))
+    feed_all(ingester, [
+        line(555, "F", "DEBUG", "*** *** *** *** *** *** *** *** *** ***"),
+        line(555, "F", "DEBUG", "pid: 9001, tid: 9023, name: GLThread 12  >>> com.example.game <<<"),
+        line(555, "F", "DEBUG", "signal 11 (SIGSEGV), code 1 (SEGV_MAPERR)"),
+    ])
+
+    # ActivityManager reporting the crashed process dead closes its tombstone
+    events = ingester.feed(line(1000, "I", "ActivityManager",
+                                "Process com.example.game (pid 9001) has died"))
+
+    assert len(events) == 1
+    assert events[0].kind == "native_crash"
+    assert events[0].pid == 9001
+    assert events[0].package_name == "com.example.game"
+    assert ingester.index.get(9001) is None
+
+
+def test_anr_block():
+    ingester = LogcatIngester()
+    feed_all(ingester, [
+        line(1000, "E", "ActivityManager", "ANR in org.example.mail (org.example.mail/.SyncService)"),
+        line(1000, "E", "ActivityManager", "PID: 7777"),
+        line(1000, "E", "ActivityManager", "Reason: executing service org.example.mail/.SyncService"),
+    ])
+
+    events = ingester.flush()
+
+    assert len(events) == 1
+    assert events[0].kind == "anr"
+    assert events[0].package_name == "org.example.mail"
+    assert events[0].pid == 7777
+
+
+def test_new_crash_closes_previous_one_of_same_process():
+    ingester = LogcatIngester()
+    ingester.feed(line(4321, "E", "AndroidRuntime", "FATAL EXCEPTION: main"))
+
+    events = ingester.feed(line(4321, "E", "AndroidRuntime", "FATAL EXCEPTION: worker"))
+
+    assert len(events) == 1
+    assert list(ingester.open) == [4321]
+
+
+def test_max_lines_closes_event():
+    ingester = LogcatIngester(max_lines=3)
+    events = feed_all(ingester, [
+        line(4321, "E", "AndroidRuntime", "FATAL EXCEPTION: main"),
+        line(4321, "E", "AndroidRuntime", "at a.b(Unknown Source)"),
+        line(4321, "E", "AndroidRuntime", "at c.d(Unknown Source)"),
+    ])
+
+    assert len(events) == 1
+    assert ingester.open == {}
+
+
+def test_unrelated_and_malformed_lines_are_ignored():
+    ingester = LogcatIngester()
+
+    assert ingester.feed("--------- beginning of crash") == []
+    assert ingester.feed(line(42, "I", "chatty", "uid=1000 expire 3 lines")) == []
+    assert ingester.open == {}
+
+
+def test_flush_only_idle_events():
+    ingester = LogcatIngester()
+    ingester.feed(line(4321, "E", "AndroidRuntime", "FATAL EXCEPTION: main"))
+
+    assert ingester.flush(idle=60.0) == []
+    assert len(ingester.flush(idle=0.0)) == 1
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for microg_coverage: release table lookup and the enable, patch or
+unsupported decision
+"""
+
+from microg_coverage import (
+    ENABLE_MICROG, LATEST, PATCH, UNSUPPORTED, decide, table_version, version_key
+)
+
+
+def test_version_key_ignores_suffix():
+    assert version_key("0.3.6.244735-hw") == (0, 3, 6, 244735)
+
+
+def test_table_version_picks_newest_tracked_release():
+    assert table_version(None) == LATEST
+    assert table_version("0.3.1.250000") == "0.3.1.240913"
+    assert table_version("0.3.0.233515") == "0.3.0.233515"
+    # Older than anything tracked: fall back to the oldest table
+    assert table_version("0.1.0.1") == "0.2.28.231657"
+
+
+def test_implemented_and_client_apis_only_enable_microg():
+    decision = decide(["gms.location", "gms.tasks", "firebase.messaging"])
+
+    assert decision.action == ENABLE_MICROG
+    assert decision.covered == ["firebase.messaging", "gms.location", "gms.tasks"]
+    assert decision.microg_version == LATEST
+
+
+def test_partial_api_needs_patch():
+    decision = decide(["gms.location", "gms.ads"])
+
+    assert decision.action == PATCH
+    assert decision.partial == ["gms.ads"]
+
+
+def test_unknown_api_is_treated_as_partial():
+    decision = decide(["gms.somethingnew"])
+
+    assert decision.action == PATCH
+    assert decision.partial == ["gms.somethingnew"]
+
+
+def test_unsupported_api_wins_over_partial():
+    decision = decide(["gms.ads", "gms.wallet"])
+
+    assert decision.action == UNSUPPORTED
+    assert decision.unsupported == ["gms.wallet"]
+    assert decision.partial == ["gms.ads"]
+
+
+def test_installed_release_decides_over_planned_one():
+    # Maps became fully implemented in 0.3.1
+    assert decide(["gms.maps"], installed_version="0.3.0.233515").action == PATCH
+    assert decide(["gms.maps"], installed_version="0.3.1.240913").action == ENABLE_MICROG
+    assert decide(["gms.maps"], planned_version="0.3.0.233515").action == PATCH
+
+    decision = decide(["gms.maps"], installed_version="0.3.1.240913",
+                      planned_version="0.3.0.233515")
+    assert decision.installed_version == "0.3.1.240913"
+    assert decision.microg_version == "0.3.1.240913"
+
+
+def test_duplicate_apis_are_listed_once():
+    assert decide(["gms.gcm", "gms.gcm"]).covered == ["gms.gcm"]
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for payload_codec: Accept and Accept-Encoding negotiation, the codec
+round trips and the aiohttp middleware
+"""
+
+import asyncio
+import gzip
+import json
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import payload_codec
+from payload_codec import (
+    CBOR_TYPE, JSON_TYPE, MSGPACK_TYPE,
+    accept_headers, choose_encoding, choose_format, codec_middleware,
+    compress, decode, decompress, encode
+)
+
+
+def test_header_parsing_orders_by_quality_then_position():
+    parsed = payload_codec._parse_header("a;q=0.5, b, c;q=0, d;q=0.5, e;q=bad")
+
+    assert parsed == [("b", 1.0), ("a", 0.5), ("d", 0.5)]
+
+
+def test_binary_format_chosen_when_available(monkeypatch):
+    monkeypatch.setattr(payload_codec, "available_formats",
+                        lambda: [MSGPACK_TYPE, CBOR_TYPE, JSON_TYPE])
+
+    assert choose_format(f"{CBOR_TYPE}, {JSON_TYPE};q=0.5") == CBOR_TYPE
+    assert choose_format(f"{JSON_TYPE}, {MSGPACK_TYPE};q=0.9") == JSON_TYPE
+
+
+def test_json_when_nothing_acceptable_is_available(monkeypatch):
+    monkeypatch.setattr(payload_codec, "available_formats", lambda: [JSON_TYPE])
+
+    assert choose_format(f"{MSGPACK_TYPE}, {JSON_TYPE};q=0.5") == JSON_TYPE
+    assert choose_format(None) == JSON_TYPE
+    assert choose_format("text/html") == JSON_TYPE
+
+
+def test_encoding_follows_server_preference(monkeypatch):
+    monkeypatch.setattr(payload_codec, "available_encodings", lambda: ["zstd", "gzip"])
+
+    assert choose_encoding("gzip, zstd") == "zstd"
+    assert choose_encoding("gzip, zstd;q=0") == "gzip"
+    assert choose_encoding("br") is None
+    assert choose_encoding(None) is None
+
+
+def test_json_and_gzip_round_trip():
+    data = {"results": [{"command": "ls", "output": "x" * 100}]}
+    body = encode(data)
+
+    assert decode(body, "application/json; charset=utf-8") == data
+    assert decompress(compress(body, "gzip"), "gzip") == body
+    assert decompress(body, None) == body
+
+
+def test_accept_headers_fall_back_to_json():
+    assert accept_headers()["Accept"] == JSON_TYPE
+    assert accept_headers(CBOR_TYPE)["Accept"] == f"{CBOR_TYPE}, {JSON_TYPE};q=0.5"
+    assert "gzip" in accept_headers()["Accept-Encoding"]
+
+
+def serve(payload):
+    """Client of an app answering every GET with `payload` through the middleware"""
+    async def handler(request):
+        return web.json_response(payload)
+
+    app = web.Application(middlewares=[codec_middleware(threshold=1024)])
+    app.router.add_get("/", handler)
+    return TestClient(TestServer(app), auto_decompress=False)
+
+
+def test_middleware_compresses_large_bodies_only():
+    large = {"output": "x" * 4096}
+
+    async def scenario():
+        async with serve(large) as client:
+            response = await client.get("/", headers={"Accept-Encoding": "gzip"})
+            body = await response.read()
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert response.headers["Vary"] == "Accept, Accept-Encoding"
+            assert json.loads(gzip.decompress(body)) == large
+
+        async with serve({"ok": True}) as client:
+            response = await client.get("/", headers={"Accept-Encoding": "gzip"})
+            assert "Content-Encoding" not in response.headers
+            assert await response.json() == {"ok": True}
+
+    asyncio.run(scenario())
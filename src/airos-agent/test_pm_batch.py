@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for pm_batch: the generated script run through a real shell, and
+parsing of its framed output
+"""
+
+import subprocess
+
+from pm_batch import PmBatch
+
+MARKER = "@@airos-test"
+
+
+def run_script(batch: PmBatch) -> str:
+    """Run the batch's script with sh, as the container shell would"""
+    result = subprocess.run(["sh", "-c", batch.script(MARKER)],
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def test_commands_are_quoted():
+    batch = PmBatch().grant("com.example.app", "android.permission.CAMERA")
+    batch.disable("com.example.app/.Evil; reboot")
+
+    assert batch.operations[0].command == "pm grant com.example.app android.permission.CAMERA"
+    assert batch.operations[0].undo == "pm revoke com.example.app android.permission.CAMERA"
+    assert batch.operations[1].command == "pm disable 'com.example.app/.Evil; reboot'"
+
+
+def test_every_operation_runs_without_atomic():
+    batch = PmBatch().add("a", "echo first").add("b", "false").add("c", "echo third")
+
+    results = batch.parse(run_script(batch), MARKER)
+
+    assert [r.status for r in results] == ["ok", "failed", "ok"]
+    assert [r.exit_code for r in results] == [0, 1, 0]
+    assert results[0].output == "first"
+    assert results[2].output == "third"
+
+
+def test_atomic_batch_reverts_applied_operations():
+    batch = PmBatch(atomic=True)
+    batch.add("a", "echo apply-a", "echo undo-a")
+    batch.add("b", "echo apply-b", "echo undo-b")
+    batch.add("c", "false", "echo undo-c")
+    batch.add("d", "echo apply-d", "echo undo-d")
+
+    results = batch.parse(run_script(batch), MARKER)
+
+    assert [r.status for r in results] == ["rolled_back", "rolled_back", "failed", "skipped"]
+    assert "undo-a" in results[0].output
+    assert "undo-c" not in results[2].output
+
+
+def test_atomic_batch_reports_failed_undo():
+    batch = PmBatch(atomic=True).add("a", "true", "false").add("b", "false")
+
+    results = batch.parse(run_script(batch), MARKER)
+
+    assert [r.status for r in results] == ["rollback_failed", "failed"]
+
+
+def test_atomic_batch_without_failure_keeps_changes():
+    batch = PmBatch(atomic=True).add("a", "true", "echo undo-a").add("b", "true")
+
+    results = batch.parse(run_script(batch), MARKER)
+
+    assert all(r.success for r in results)
+
+
+def test_unframed_output_is_an_error():
+    batch = PmBatch().add("a", "true").add("b", "true")
+
+    results = batch.parse("sh: permission denied", MARKER)
+
+    assert [r.status for r in results] == ["error", "error"]
+    assert results[0].output == "sh: permission denied"
@@ -1,7 +1,13 @@
 package com.airos.agent;
 
+import android.app.ActivityManager;
 import android.app.Service;
+import android.content.ComponentName;
 import android.content.Intent;
+import android.content.pm.ApplicationInfo;
+import android.content.pm.PackageInfo;
+import android.content.pm.PackageManager;
+import android.net.Uri;
 import android.os.Handler;
 import android.os.IBinder;
 import android.os.Looper;
@@ -20,17 +26,44 @@ import org.json.JSONObject;
 
 import java.io.BufferedReader;
 import java.io.File;
+import java.io.FileInputStream;
 import java.io.FileOutputStream;
 import java.io.IOException;
+import java.io.InputStream;
 import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.io.PipedInputStream;
+import java.io.PipedOutputStream;
+import java.io.Reader;
 import java.lang.reflect.Method;
 import java.net.InetSocketAddress;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.security.MessageDigest;
+import java.security.NoSuchAlgorithmException;
+import java.util.ArrayDeque;
+import java.util.ArrayList;
+import java.util.Arrays;
 import java.util.HashMap;
+import java.util.HashSet;
+import java.util.Iterator;
+import java.util.LinkedHashMap;
+import java.util.List;
 import java.util.Map;
+import java.util.Set;
+import java.util.TreeMap;
 import java.util.UUID;
+import java.util.concurrent.BlockingQueue;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.ExecutorCompletionService;
+import java.util.concurrent.ExecutionException;
 import java.util.concurrent.ExecutorService;
 import java.util.concurrent.Executors;
+import java.util.concurrent.Future;
+import java.util.concurrent.LinkedBlockingQueue;
 import java.util.concurrent.TimeUnit;
+import java.util.regex.Matcher;
+import java.util.regex.Pattern;
 
 import dalvik.system.DexClassLoader;
 import fi.iki.elonen.NanoHTTPD;
@@ -39,6 +72,13 @@ public class AIAgentService extends Service {
     private static final String TAG = "AIROS";
     private static final int HTTP_PORT = 8080;
     private static final int WS_PORT = 8081;
+    // execute_batch and execute_stream limits, as on the Python agents
+    private static final int DEFAULT_BATCH_TIMEOUT_MS = 30000;
+    private static final int MAX_BATCH_COMMANDS = 256;
+    private static final int STREAM_CHUNK_SIZE = 4096;
+    private static final int STREAM_PIPE_SIZE = 64 * 1024;
+    // Marks the end of one output pipe in a stream's frame queue
+    private static final JSONObject END_OF_STREAM = new JSONObject();
     
     private AIHttpServer httpServer;
     private AIWebSocketServer wsServer;
@@ -46,6 +86,7 @@ public class AIAgentService extends Service {
     private ExecutorService executorService;
     private Map<String, Long> authTokens;
     private SystemSnapshotManager snapshotManager;
+    private UndoJournal undoJournal;
     
     @Override
     public void onCreate() {
@@ -57,12 +98,18 @@ public class AIAgentService extends Service {
         authTokens = new HashMap<>();
         modManager = new SystemModificationManager(this);
         snapshotManager = new SystemSnapshotManager(this);
+        undoJournal = new UndoJournal(this);
         
         // Generate initial auth token
         String initialToken = UUID.randomUUID().toString();
         authTokens.put(initialToken, System.currentTimeMillis());
         Log.i(TAG, "Initial auth token: " + initialToken);
         
+        // Start WebSocket server first: HTTP handlers publish to it
+        wsServer = new AIWebSocketServer(new InetSocketAddress(WS_PORT));
+        wsServer.start();
+        Log.i(TAG, "WebSocket server started on port " + WS_PORT);
+        
         // Start HTTP server
         try {
             httpServer = new AIHttpServer();
@@ -72,11 +119,6 @@ public class AIAgentService extends Service {
             Log.e(TAG, "Failed to start HTTP server", e);
         }
         
-        // Start WebSocket server
-        wsServer = new AIWebSocketServer(new InetSocketAddress(WS_PORT));
-        wsServer.start();
-        Log.i(TAG, "WebSocket server started on port " + WS_PORT);
-        
         // Create automatic snapshot
         snapshotManager.createSnapshot("service_start");
     }
@@ -140,6 +182,11 @@ public class AIAgentService extends Service {
                 String body = files.get("postData");
                 JSONObject request = body != null ? new JSONObject(body) : new JSONObject();
                 
+                // Streamed responses bypass the JSON body below
+                if ("/api/execute_stream".equals(uri)) {
+                    return handleExecuteStream(request);
+                }
+                
                 // Route to appropriate handler
                 JSONObject response = new JSONObject();
                 
@@ -148,6 +195,10 @@ public class AIAgentService extends Service {
                         response = handleExecuteCommand(request);
                         break;
                         
+                    case "/api/execute_batch":
+                        response = handleExecuteBatch(request);
+                        break;
+                        
                     case "/api/inject":
                         response = handleCodeInjection(request);
                         break;
@@ -156,6 +207,10 @@ public class AIAgentService extends Service {
                         response = handleSnapshot(request);
                         break;
                         
+                    case "/api/snapshot/release":
+                        response = handleReleaseSnapshot(request);
+                        break;
+                        
                     case "/api/rollback":
                         response = handleRollback(request);
                         break;
@@ -185,6 +240,9 @@ public class AIAgentService extends Service {
                 return newFixedLengthResponse(Response.Status.OK,
                     "application/json", response.toString());
                     
+            } catch (IllegalArgumentException e) {
+                return newFixedLengthResponse(Response.Status.BAD_REQUEST,
+                    "application/json", errorBody(e.getMessage()));
             } catch (Exception e) {
                 Log.e(TAG, "Error handling request", e);
                 return newFixedLengthResponse(Response.Status.INTERNAL_ERROR,
@@ -196,20 +254,98 @@ public class AIAgentService extends Service {
     
     /**
      * WebSocket Server for real-time monitoring
+     *
+     * Every published event carries the next sequence number and the epoch
+     * of this service run; the most recent ones are kept so a reconnecting
+     * client can resume. The first message on a connection is
+     * {"action": "resume", "seq": <current seq>, "epoch": <epoch>}.
+     * Connecting with ?since=<seq>&epoch=<epoch> makes it report whether the
+     * resume is complete and follows it with every retained event after
+     * that seq; a cursor from another epoch resumes from the start of this
+     * run. This matches the event stream of the Python agents.
      */
     private class AIWebSocketServer extends WebSocketServer {
+        private static final int REPLAY_SIZE = 1024;
+        
+        private final String epoch = UUID.randomUUID().toString().replace("-", "");
+        private final ArrayDeque<JSONObject> history = new ArrayDeque<>();
+        private long sequence;
+        
         public AIWebSocketServer(InetSocketAddress address) {
             super(address);
         }
         
+        /**
+         * Number an event, keep it for replay and send it to every
+         * connection subscribed to its type
+         */
+        public synchronized void publish(String eventType, JSONObject data) {
+            try {
+                JSONObject event = new JSONObject();
+                event.put("eventType", eventType);
+                event.put("epoch", epoch);
+                event.put("seq", ++sequence);
+                event.put("timestamp", System.currentTimeMillis() / 1000.0);
+                event.put("data", data);
+                
+                history.addLast(event);
+                if (history.size() > REPLAY_SIZE) {
+                    history.removeFirst();
+                }
+                
+                String message = event.toString();
+                for (WebSocket conn : getConnections()) {
+                    if (conn.isOpen() && subscribed(conn, eventType)) {
+                        conn.send(message);
+                    }
+                }
+            } catch (JSONException e) {
+                Log.e(TAG, "Error publishing event", e);
+            }
+        }
+        
         @Override
-        public void onOpen(WebSocket conn, ClientHandshake handshake) {
+        public synchronized void onOpen(WebSocket conn, ClientHandshake handshake) {
             Log.i(TAG, "WebSocket connection opened: " + conn.getRemoteSocketAddress());
+            conn.setAttachment(ConcurrentHashMap.<String>newKeySet());
             
-            // Send initial system state
+            // Greet with the resume status, then replay what the client missed;
+            // holding the lock keeps publish() from interleaving with the backlog
             try {
-                JSONObject state = getSystemInfo();
-                conn.send(state.toString());
+                Uri query = Uri.parse(handshake.getResourceDescriptor());
+                Long since = parseSeq(query.getQueryParameter("since"));
+                String clientEpoch = query.getQueryParameter("epoch");
+                
+                boolean complete = true;
+                if (since != null) {
+                    boolean restarted = since > sequence
+                        || (clientEpoch != null && !clientEpoch.equals(epoch));
+                    if (restarted) {
+                        since = 0L;
+                    }
+                    long oldest = history.isEmpty()
+                        ? sequence + 1 : history.peekFirst().getLong("seq");
+                    complete = !restarted && since >= oldest - 1;
+                }
+                
+                JSONObject greeting = new JSONObject();
+                greeting.put("action", "resume");
+                greeting.put("status", since == null ? "new" : complete ? "resumed" : "gap");
+                greeting.put("since", since != null ? since : JSONObject.NULL);
+                greeting.put("seq", sequence);
+                greeting.put("epoch", epoch);
+                conn.send(greeting.toString());
+                
+                if (since != null) {
+                    for (JSONObject event : history) {
+                        if (event.getLong("seq") > since) {
+                            conn.send(event.toString());
+                        }
+                    }
+                }
+                
+                // Send initial system state
+                conn.send(getSystemInfo().toString());
             } catch (JSONException e) {
                 Log.e(TAG, "Error sending initial state", e);
             }
@@ -230,6 +366,15 @@ public class AIAgentService extends Service {
                 response.put("action", action);
                 
                 switch (action) {
+                    case "authenticate":
+                        String token = request.optString("token", null);
+                        if (isAuthenticated(token != null ? "Bearer " + token : null)) {
+                            response.put("status", "authenticated");
+                        } else {
+                            response.put("error", "Invalid token");
+                        }
+                        break;
+                        
                     case "subscribe":
                         // Subscribe to specific system events
                         String eventType = request.getString("eventType");
@@ -237,6 +382,12 @@ public class AIAgentService extends Service {
                         response.put("status", "subscribed");
                         break;
                         
+                    case "unsubscribe":
+                        Set<String> types = conn.getAttachment();
+                        types.remove(request.getString("eventType"));
+                        response.put("status", "unsubscribed");
+                        break;
+                        
                     case "monitor":
                         // Start monitoring specific component
                         String component = request.getString("component");
@@ -255,6 +406,25 @@ public class AIAgentService extends Service {
             }
         }
         
+        /**
+         * Without any subscribe a connection receives every event type
+         */
+        private boolean subscribed(WebSocket conn, String eventType) {
+            Set<String> types = conn.getAttachment();
+            return types == null || types.isEmpty() || types.contains(eventType);
+        }
+        
+        private Long parseSeq(String value) {
+            if (value == null) {
+                return null;
+            }
+            try {
+                return Long.parseLong(value.substring(value.lastIndexOf(':') + 1));
+            } catch (NumberFormatException e) {
+                return null;
+            }
+        }
+        
         @Override
         public void onError(WebSocket conn, Exception ex) {
             Log.e(TAG, "WebSocket error", ex);
@@ -365,35 +535,121 @@ public class AIAgentService extends Service {
     
     /**
      * System Snapshot Manager for rollback functionality
+     *
+     * Snapshots are flat maps of state entries ("prop/..." and
+     * "service/...") whose values live once in a content-addressed object
+     * store. A snapshot is either a base, listing every entry, or a delta
+     * listing only the entries changed or removed since its base, so taking
+     * one before every operation costs a capture plus a few small writes.
+     * Entries whose value is unchanged since the previous capture reuse its
+     * hash instead of being hashed and stored again.
+     *
+     * Rollback restores writable system properties and restarts services
+     * that were running. Installed packages are not part of a snapshot and
+     * are never restored; lazy snapshots journal package changes instead.
      */
     private class SystemSnapshotManager {
+        // A new base is written after this many deltas, or when a delta
+        // would carry more than this fraction of the base's entries
+        private static final int MAX_DELTAS_PER_BASE = 32;
+        private static final double MAX_DELTA_FRACTION = 0.25;
+        // Retention: keep the newest MAX_SNAPSHOTS, drop anything older than
+        // MAX_AGE_MS; bases of retained deltas are always kept
+        private static final int MAX_SNAPSHOTS = 64;
+        private static final long MAX_AGE_MS = 7L * 24 * 60 * 60 * 1000;
+        private static final int GC_EVERY = 16;
+        // Objects younger than this survive a sweep even if unreferenced, so
+        // one stored for a manifest or journal not yet written is not lost
+        private static final long GC_GRACE_MS = 60 * 1000;
+        // What rollback restores, reported with every full snapshot
+        static final String RESTORED_NAMESPACES = "prop,service";
+        
         private final Service context;
         private final File snapshotDir;
+        private final File objectDir;
+        private final File manifestDir;
+        private final File journalDir;
+        private String currentBase;
+        private Map<String, String> baseEntries;
+        private int deltasSinceBase;
+        private int createdSinceGc;
+        // Values and hashes of the previous capture, so unchanged entries
+        // are neither hashed nor written again
+        private Map<String, String> lastValues = new HashMap<>();
+        private Map<String, String> lastHashes = new HashMap<>();
         
         public SystemSnapshotManager(Service context) {
             this.context = context;
             this.snapshotDir = new File(context.getFilesDir(), "snapshots");
-            snapshotDir.mkdirs();
+            this.objectDir = new File(snapshotDir, "objects");
+            this.manifestDir = new File(snapshotDir, "manifests");
+            this.journalDir = new File(snapshotDir, "journals");
+            objectDir.mkdirs();
+            manifestDir.mkdirs();
+            journalDir.mkdirs();
         }
         
-        public String createSnapshot(String name) {
+        public synchronized String createSnapshot(String name) {
             String snapshotId = name + "_" + System.currentTimeMillis();
-            File snapshotFile = new File(snapshotDir, snapshotId);
             
             try {
-                // Capture system state (simplified)
-                JSONObject state = new JSONObject();
-                state.put("timestamp", System.currentTimeMillis());
-                state.put("name", name);
-                state.put("system_properties", captureSystemProperties());
-                state.put("running_services", captureRunningServices());
-                state.put("installed_packages", captureInstalledPackages());
-                
-                FileOutputStream fos = new FileOutputStream(snapshotFile);
-                fos.write(state.toString().getBytes());
-                fos.close();
+                Map<String, String> state = captureState();
+                Map<String, String> hashes = new TreeMap<>();
+                for (Map.Entry<String, String> entry : state.entrySet()) {
+                    String key = entry.getKey();
+                    String hash = entry.getValue().equals(lastValues.get(key))
+                        ? lastHashes.get(key) : storeObject(entry.getValue());
+                    hashes.put(key, hash);
+                }
                 
-                Log.i(TAG, "Snapshot created: " + snapshotId);
+                JSONObject manifest = new JSONObject();
+                manifest.put("id", snapshotId);
+                manifest.put("name", name);
+                manifest.put("timestamp", System.currentTimeMillis());
+                
+                Map<String, String> base = baseEntries;
+                JSONObject changed = new JSONObject();
+                JSONArray removed = new JSONArray();
+                if (base != null) {
+                    for (Map.Entry<String, String> entry : hashes.entrySet()) {
+                        if (!entry.getValue().equals(base.get(entry.getKey()))) {
+                            changed.put(entry.getKey(), entry.getValue());
+                        }
+                    }
+                    for (String key : base.keySet()) {
+                        if (!hashes.containsKey(key)) {
+                            removed.put(key);
+                        }
+                    }
+                }
+                
+                boolean rebase = base == null
+                    || deltasSinceBase >= MAX_DELTAS_PER_BASE
+                    || changed.length() + removed.length() > base.size() * MAX_DELTA_FRACTION;
+                
+                if (rebase) {
+                    manifest.put("entries", new JSONObject(hashes));
+                    currentBase = snapshotId;
+                    baseEntries = hashes;
+                    deltasSinceBase = 0;
+                } else {
+                    manifest.put("base", currentBase);
+                    manifest.put("changed", changed);
+                    manifest.put("removed", removed);
+                    deltasSinceBase++;
+                }
+                writeAtomically(manifestFile(snapshotId), manifest.toString().getBytes(StandardCharsets.UTF_8));
+                // Only once a manifest references their objects, so GC keeps them
+                lastValues = state;
+                lastHashes = hashes;
+                
+                if (++createdSinceGc >= GC_EVERY) {
+                    createdSinceGc = 0;
+                    executorService.submit(this::gc);
+                }
+                
+                Log.i(TAG, "Snapshot created: " + snapshotId + (rebase ? " (base)"
+                    : " (delta of " + (changed.length() + removed.length()) + " entries)"));
                 return snapshotId;
                 
             } catch (Exception e) {
@@ -402,32 +658,526 @@ public class AIAgentService extends Service {
             }
         }
         
-        public boolean rollback(String snapshotId) {
-            File snapshotFile = new File(snapshotDir, snapshotId);
-            if (!snapshotFile.exists()) {
-                Log.e(TAG, "Snapshot not found: " + snapshotId);
+        public synchronized boolean rollback(String snapshotId) {
+            if (!manifestFile(snapshotId).exists()) {
+                return rollbackLegacy(snapshotId);
+            }
+            
+            try {
+                Map<String, String> target = loadEntries(snapshotId);
+                Map<String, String> current = captureState();
+                
+                // Only restore entries that differ from the live state;
+                // package entries of older snapshots are skipped
+                JSONObject props = new JSONObject();
+                JSONArray services = new JSONArray();
+                for (Map.Entry<String, String> entry : target.entrySet()) {
+                    String key = entry.getKey();
+                    String live = current.get(key);
+                    if (live != null && entry.getValue().equals(live.equals(lastValues.get(key))
+                            ? lastHashes.get(key) : sha256(live.getBytes(StandardCharsets.UTF_8)))) {
+                        continue;
+                    }
+                    if (key.startsWith("prop/")) {
+                        props.put(key.substring(5), readObject(entry.getValue()));
+                    } else if (key.startsWith("service/")) {
+                        services.put(key.substring(8));
+                    }
+                }
+                
+                boolean restored = restoreSystemProperties(props) & restoreServices(services);
+                Log.i(TAG, "Rollback " + (restored ? "completed" : "incomplete") + " to: " + snapshotId);
+                return restored;
+                
+            } catch (Exception e) {
+                Log.e(TAG, "Rollback failed", e);
                 return false;
             }
+        }
+        
+        /**
+         * Apply retention and delete objects no snapshot or undo journal references
+         */
+        public synchronized void gc() {
+            try {
+                File[] files = manifestDir.listFiles((dir, file) -> file.endsWith(".json"));
+                if (files == null) {
+                    return;
+                }
+                
+                List<JSONObject> manifests = new ArrayList<>();
+                for (File file : files) {
+                    manifests.add(new JSONObject(readFile(file)));
+                }
+                manifests.sort((a, b) -> Long.compare(
+                    b.optLong("timestamp"), a.optLong("timestamp")));
+                
+                long cutoff = System.currentTimeMillis() - MAX_AGE_MS;
+                Set<String> keep = new HashSet<>();
+                Set<String> live = new HashSet<>();
+                
+                // Undo journals pin the objects they saved and the snapshots
+                // they fell back to; abandoned ones expire like snapshots
+                File[] journals = journalDir.listFiles((dir, file) -> file.endsWith(".json"));
+                for (File journal : journals != null ? journals : new File[0]) {
+                    if (journal.lastModified() < cutoff) {
+                        journal.delete();
+                        continue;
+                    }
+                    JSONArray entries = new JSONArray(readFile(journal));
+                    for (int i = 0; i < entries.length(); i++) {
+                        JSONObject entry = entries.getJSONObject(i);
+                        if (entry.has("object")) {
+                            live.add(entry.getString("object"));
+                        }
+                        if (entry.has("snapshotId")) {
+                            keep.add(entry.getString("snapshotId"));
+                        }
+                    }
+                }
+                
+                for (int i = 0; i < manifests.size(); i++) {
+                    JSONObject manifest = manifests.get(i);
+                    if (i < MAX_SNAPSHOTS && manifest.optLong("timestamp") >= cutoff) {
+                        keep.add(manifest.getString("id"));
+                    }
+                }
+                if (currentBase != null) {
+                    keep.add(currentBase);
+                }
+                for (JSONObject manifest : manifests) {
+                    if (keep.contains(manifest.getString("id")) && manifest.has("base")) {
+                        keep.add(manifest.getString("base"));
+                    }
+                }
+                
+                // Mark objects of retained snapshots, sweep the rest
+                int dropped = 0;
+                for (JSONObject manifest : manifests) {
+                    String id = manifest.getString("id");
+                    if (!keep.contains(id)) {
+                        manifestFile(id).delete();
+                        dropped++;
+                        continue;
+                    }
+                    JSONObject entries = manifest.has("entries")
+                        ? manifest.getJSONObject("entries") : manifest.getJSONObject("changed");
+                    Iterator<String> keys = entries.keys();
+                    while (keys.hasNext()) {
+                        live.add(entries.getString(keys.next()));
+                    }
+                }
+                
+                int swept = 0;
+                long graceCutoff = System.currentTimeMillis() - GC_GRACE_MS;
+                File[] shards = objectDir.listFiles(File::isDirectory);
+                for (File shard : shards != null ? shards : new File[0]) {
+                    File[] objects = shard.listFiles();
+                    for (File object : objects != null ? objects : new File[0]) {
+                        if (!live.contains(object.getName())
+                                && object.lastModified() < graceCutoff && object.delete()) {
+                            swept++;
+                        }
+                    }
+                }
+                
+                Log.i(TAG, "Snapshot GC: dropped " + dropped + " snapshots, " + swept + " objects");
+                
+            } catch (Exception e) {
+                Log.e(TAG, "Snapshot GC failed", e);
+            }
+        }
+        
+        private Map<String, String> captureState() throws IOException {
+            Map<String, String> state = new TreeMap<>();
+            captureSystemProperties(state);
+            captureRunningServices(state);
+            return state;
+        }
+        
+        /**
+         * Resolve a snapshot to its full entry -> object hash map
+         */
+        private Map<String, String> loadEntries(String snapshotId) throws IOException, JSONException {
+            JSONObject manifest = new JSONObject(readFile(manifestFile(snapshotId)));
+            Map<String, String> entries = new TreeMap<>();
+            
+            if (manifest.has("entries")) {
+                putAll(entries, manifest.getJSONObject("entries"));
+                return entries;
+            }
+            
+            entries.putAll(loadEntries(manifest.getString("base")));
+            putAll(entries, manifest.getJSONObject("changed"));
+            JSONArray removed = manifest.getJSONArray("removed");
+            for (int i = 0; i < removed.length(); i++) {
+                entries.remove(removed.getString(i));
+            }
+            return entries;
+        }
+        
+        private void putAll(Map<String, String> target, JSONObject source) throws JSONException {
+            Iterator<String> keys = source.keys();
+            while (keys.hasNext()) {
+                String key = keys.next();
+                target.put(key, source.getString(key));
+            }
+        }
+        
+        private String storeObject(String value) throws IOException {
+            byte[] data = value.getBytes(StandardCharsets.UTF_8);
+            String hash = sha256(data);
+            File object = objectFile(hash);
+            if (!object.exists()) {
+                object.getParentFile().mkdirs();
+                writeAtomically(object, data);
+            }
+            return hash;
+        }
+        
+        /**
+         * Store a file's contents, streamed so large APKs are not held in memory
+         */
+        private synchronized String storeFile(File source) throws IOException {
+            File temp = new File(objectDir, "incoming.tmp");
+            MessageDigest digest = newDigest();
+            copy(new FileInputStream(source), new FileOutputStream(temp), digest);
             
+            String hash = hex(digest.digest());
+            File object = objectFile(hash);
+            if (object.exists()) {
+                temp.delete();
+                object.setLastModified(System.currentTimeMillis());
+                return hash;
+            }
+            object.getParentFile().mkdirs();
+            if (!temp.renameTo(object)) {
+                throw new IOException("Could not store " + source);
+            }
+            return hash;
+        }
+        
+        /**
+         * Write an object's contents back to a file, replacing it atomically
+         */
+        private void restoreObject(String hash, File target) throws IOException {
+            File temp = new File(target.getPath() + ".airos.tmp");
+            copy(new FileInputStream(objectFile(hash)), new FileOutputStream(temp), null);
+            if (!temp.renameTo(target)) {
+                temp.delete();
+                throw new IOException("Could not restore " + target);
+            }
+        }
+        
+        private void copy(InputStream in, OutputStream out, MessageDigest digest) throws IOException {
+            try {
+                byte[] buffer = new byte[64 * 1024];
+                int read;
+                while ((read = in.read(buffer)) != -1) {
+                    out.write(buffer, 0, read);
+                    if (digest != null) {
+                        digest.update(buffer, 0, read);
+                    }
+                }
+            } finally {
+                in.close();
+                out.close();
+            }
+        }
+        
+        private String readObject(String hash) throws IOException {
+            return readFile(objectFile(hash));
+        }
+        
+        private File objectFile(String hash) {
+            return new File(new File(objectDir, hash.substring(0, 2)), hash);
+        }
+        
+        private File manifestFile(String snapshotId) {
+            return new File(manifestDir, snapshotId + ".json");
+        }
+        
+        private String sha256(byte[] data) {
+            return hex(newDigest().digest(data));
+        }
+        
+        private MessageDigest newDigest() {
+            try {
+                return MessageDigest.getInstance("SHA-256");
+            } catch (NoSuchAlgorithmException e) {
+                throw new IllegalStateException(e);
+            }
+        }
+        
+        private String hex(byte[] digest) {
+            StringBuilder hex = new StringBuilder();
+            for (byte b : digest) {
+                hex.append(String.format("%02x", b));
+            }
+            return hex.toString();
+        }
+        
+        private void writeAtomically(File file, byte[] data) throws IOException {
+            File temp = new File(file.getPath() + ".tmp");
+            FileOutputStream fos = new FileOutputStream(temp);
+            try {
+                fos.write(data);
+            } finally {
+                fos.close();
+            }
+            if (!temp.renameTo(file)) {
+                throw new IOException("Could not write " + file);
+            }
+        }
+        
+        private String readFile(File file) throws IOException {
+            BufferedReader reader = new BufferedReader(
+                new InputStreamReader(new FileInputStream(file), StandardCharsets.UTF_8));
             try {
-                // Read snapshot data
-                BufferedReader reader = new BufferedReader(
-                    new InputStreamReader(new java.io.FileInputStream(snapshotFile)));
                 StringBuilder sb = new StringBuilder();
-                String line;
-                while ((line = reader.readLine()) != null) {
-                    sb.append(line);
+                char[] buffer = new char[4096];
+                int read;
+                while ((read = reader.read(buffer)) != -1) {
+                    sb.append(buffer, 0, read);
                 }
+                return sb.toString();
+            } finally {
                 reader.close();
+            }
+        }
+        
+        /**
+         * Restore a full snapshot written before incremental snapshots
+         */
+        private boolean rollbackLegacy(String snapshotId) {
+            File snapshotFile = new File(snapshotDir, snapshotId);
+            if (!snapshotFile.exists()) {
+                Log.e(TAG, "Snapshot not found: " + snapshotId);
+                return false;
+            }
+            
+            try {
+                JSONObject state = new JSONObject(readFile(snapshotFile));
+                boolean restored = restoreSystemProperties(state.getJSONObject("system_properties"))
+                    & restoreServices(state.getJSONArray("running_services"));
                 
-                JSONObject state = new JSONObject(sb.toString());
+                Log.i(TAG, "Rollback " + (restored ? "completed" : "incomplete") + " to: " + snapshotId);
+                return restored;
+                
+            } catch (Exception e) {
+                Log.e(TAG, "Rollback failed", e);
+                return false;
+            }
+        }
+        
+        private void captureSystemProperties(Map<String, String> state) throws IOException {
+            // One getprop call lists every property as "[name]: [value]"
+            Process process = Runtime.getRuntime().exec("getprop");
+            BufferedReader reader = new BufferedReader(
+                new InputStreamReader(process.getInputStream()));
+            String line;
+            while ((line = reader.readLine()) != null) {
+                int split = line.indexOf("]: [");
+                if (line.startsWith("[") && split > 0 && line.endsWith("]")) {
+                    state.put("prop/" + line.substring(1, split),
+                        line.substring(split + 4, line.length() - 1));
+                }
+            }
+            reader.close();
+        }
+        
+        private void captureRunningServices(Map<String, String> state) {
+            ActivityManager am = (ActivityManager) context.getSystemService(ACTIVITY_SERVICE);
+            for (ActivityManager.RunningServiceInfo info : am.getRunningServices(Integer.MAX_VALUE)) {
+                state.put("service/" + info.service.flattenToShortString(),
+                    info.started ? "started" : "bound");
+            }
+        }
+        
+        /**
+         * Set each property back with setprop; read-only ones cannot change
+         * after boot and are skipped. Returns false if any could not be set.
+         */
+        private boolean restoreSystemProperties(JSONObject props) throws JSONException {
+            boolean restored = true;
+            Iterator<String> names = props.keys();
+            while (names.hasNext()) {
+                String name = names.next();
+                if (name.startsWith("ro.")) {
+                    continue;
+                }
+                try {
+                    Process process = Runtime.getRuntime().exec(
+                        new String[]{"setprop", name, props.getString(name)});
+                    if (!process.waitFor(5, TimeUnit.SECONDS) || process.exitValue() != 0) {
+                        process.destroyForcibly();
+                        Log.w(TAG, "Could not restore property " + name);
+                        restored = false;
+                    }
+                } catch (IOException | InterruptedException e) {
+                    Log.w(TAG, "Could not restore property " + name, e);
+                    restored = false;
+                }
+            }
+            return restored;
+        }
+        
+        /**
+         * Start each service that was running and no longer is. Services
+         * started since the snapshot are left running.
+         */
+        private boolean restoreServices(JSONArray services) {
+            boolean restored = true;
+            for (int i = 0; i < services.length(); i++) {
+                String name = services.optString(i);
+                ComponentName component = ComponentName.unflattenFromString(name);
+                try {
+                    if (component == null || context.startService(
+                            new Intent().setComponent(component)) == null) {
+                        Log.w(TAG, "Could not restart service " + name);
+                        restored = false;
+                    }
+                } catch (RuntimeException e) {
+                    Log.w(TAG, "Could not restart service " + name, e);
+                    restored = false;
+                }
+            }
+            return restored;
+        }
+    }
+    
+    /**
+     * Undo journal backing lazy snapshots
+     *
+     * A lazy snapshot captures nothing up front. While it is open, each
+     * command run through /api/execute with its snapshotId first records
+     * how to undo itself: the previous property value, enabled state,
+     * permission grant, file contents or installed APK. Rollback replays
+     * those entries newest first. A command the journal cannot reason about
+     * is refused: full snapshots do not restore everything it could change.
+     */
+    private class UndoJournal {
+        // Journals a client opened and never released or rolled back are
+        // evicted oldest first past this many
+        private static final int MAX_OPEN_JOURNALS = 16;
+        
+        private final Service context;
+        private final Map<String, JSONArray> open = new LinkedHashMap<>();
+        
+        // Commands that never change device state
+        private final Set<String> readOnlyCommands = new HashSet<>(Arrays.asList(
+            "cat", "date", "df", "du", "dumpsys", "echo", "getprop", "grep", "head",
+            "id", "logcat", "ls", "pidof", "printf", "ps", "stat", "tail", "uname",
+            "uptime", "wc", "whoami"));
+        private final Set<String> readOnlyPmCommands = new HashSet<>(Arrays.asList(
+            "dump", "get-install-location", "has-feature", "list", "path",
+            "query-activities", "query-receivers", "query-services", "resolve-activity"));
+        
+        // "<command> > file" or ">> file"; anything else with shell syntax
+        // (pipes, chaining, substitution, quoting) is not journaled
+        private final Pattern redirect = Pattern.compile("^([^<>|;&$`()'\"\\\\]*?)\\s*>>?\\s*(\\S+)$");
+        private final Pattern shellSyntax = Pattern.compile("[<>|;&$`()'\"\\\\]");
+        
+        public UndoJournal(Service context) {
+            this.context = context;
+        }
+        
+        public synchronized String open(String name) {
+            String snapshotId = "lazy_" + name + "_" + System.currentTimeMillis();
+            JSONArray entries = new JSONArray();
+            
+            try {
+                save(snapshotId, entries);
+            } catch (IOException e) {
+                Log.e(TAG, "Failed to open undo journal", e);
+                return null;
+            }
+            
+            if (open.size() >= MAX_OPEN_JOURNALS) {
+                String oldest = open.keySet().iterator().next();
+                open.remove(oldest);
+                Log.w(TAG, "Undo journal evicted, later changes are not recorded: " + oldest);
+            }
+            open.put(snapshotId, entries);
+            
+            Log.i(TAG, "Lazy snapshot opened: " + snapshotId);
+            return snapshotId;
+        }
+        
+        public synchronized boolean owns(String snapshotId) {
+            return open.containsKey(snapshotId) || journalFile(snapshotId).exists();
+        }
+        
+        /**
+         * Discard a journal once its operation succeeded
+         */
+        public synchronized boolean release(String snapshotId) {
+            boolean wasOpen = open.remove(snapshotId) != null;
+            return journalFile(snapshotId).delete() || wasOpen;
+        }
+        
+        /**
+         * Record how to undo a command about to run in the journal of the
+         * lazy snapshot it runs under
+         *
+         * Only that journal records it, so rolling back one client's lazy
+         * snapshot never reverts commands other clients ran under theirs.
+         * Returns null once recorded, else why the command must not run.
+         */
+        public synchronized String recordBefore(String command, String snapshotId) {
+            JSONArray entries = open.get(snapshotId);
+            if (entries == null) {
+                return "Lazy snapshot not open: " + snapshotId;
+            }
+            
+            JSONArray undo;
+            try {
+                undo = undoEntries(command.trim());
+            } catch (Exception e) {
+                Log.w(TAG, "No undo entry for: " + command, e);
+                undo = null;
+            }
+            if (undo == null) {
+                // A full snapshot cannot restore what such a command may
+                // change, so it would be rolled back in name only
+                return "Command cannot be journaled under a lazy snapshot: " + command;
+            }
+            
+            try {
+                for (int i = 0; i < undo.length(); i++) {
+                    entries.put(undo.get(i));
+                }
+                save(snapshotId, entries);
+            } catch (Exception e) {
+                Log.e(TAG, "Failed to record undo entry in " + snapshotId, e);
+                return "Failed to record undo entry: " + e.getMessage();
+            }
+            return null;
+        }
+        
+        public synchronized boolean rollback(String snapshotId) {
+            try {
+                JSONArray entries = open.remove(snapshotId);
+                if (entries == null) {
+                    entries = new JSONArray(snapshotManager.readFile(journalFile(snapshotId)));
+                }
                 
-                // Restore system state (simplified - would need root access)
-                restoreSystemProperties(state.getJSONObject("system_properties"));
-                restoreServices(state.getJSONArray("running_services"));
+                boolean complete = true;
+                for (int i = entries.length() - 1; i >= 0; i--) {
+                    JSONObject entry = entries.getJSONObject(i);
+                    if (!undo(entry)) {
+                        Log.e(TAG, "Undo failed: " + entry);
+                        complete = false;
+                    }
+                }
                 
-                Log.i(TAG, "Rollback completed to: " + snapshotId);
-                return true;
+                // A partly failed journal is kept for inspection until GC
+                if (complete) {
+                    journalFile(snapshotId).delete();
+                }
+                Log.i(TAG, "Rollback of " + entries.length() + " journaled changes "
+                    + (complete ? "completed" : "incomplete") + ": " + snapshotId);
+                return complete;
                 
             } catch (Exception e) {
                 Log.e(TAG, "Rollback failed", e);
@@ -435,34 +1185,226 @@ public class AIAgentService extends Service {
             }
         }
         
-        private JSONObject captureSystemProperties() throws JSONException {
-            JSONObject props = new JSONObject();
-            // Capture relevant system properties
-            props.put("ro.build.version.release", 
-                android.os.Build.VERSION.RELEASE);
-            props.put("ro.build.version.sdk", 
-                android.os.Build.VERSION.SDK_INT);
-            return props;
+        /**
+         * Undo entries for one command, empty if it changes nothing, or null
+         * if it cannot be journaled
+         */
+        private JSONArray undoEntries(String command) throws Exception {
+            JSONArray undo = new JSONArray();
+            
+            Matcher redirected = redirect.matcher(command);
+            if (redirected.matches()) {
+                undo.put(fileEntry(redirected.group(2)));
+                command = redirected.group(1).trim();
+            }
+            if (command.isEmpty() || shellSyntax.matcher(command).find()) {
+                return null;
+            }
+            
+            String[] args = command.split("\\s+");
+            if (readOnlyCommands.contains(args[0])) {
+                return undo;
+            }
+            
+            switch (args[0]) {
+                case "setprop":
+                    if (args.length != 3) {
+                        return null;
+                    }
+                    undo.put(entry("prop").put("name", args[1]).put("value", getprop(args[1])));
+                    return undo;
+                    
+                case "pm":
+                    return args.length > 2 ? pmUndoEntries(args, undo) : null;
+                    
+                case "cp":
+                    if (args.length != 3) {
+                        return null;
+                    }
+                    undo.put(fileEntry(args[2]));
+                    return undo;
+                    
+                case "rm":
+                case "touch":
+                    for (int i = 1; i < args.length; i++) {
+                        if (args[i].startsWith("-")) {
+                            return null;
+                        }
+                        undo.put(fileEntry(args[i]));
+                    }
+                    return undo;
+                    
+                default:
+                    return null;
+            }
+        }
+        
+        private JSONArray pmUndoEntries(String[] args, JSONArray undo) throws Exception {
+            PackageManager pm = context.getPackageManager();
+            String target = args[args.length - 1];
+            
+            if (readOnlyPmCommands.contains(args[1])) {
+                return undo;
+            }
+            
+            switch (args[1]) {
+                case "enable":
+                case "disable":
+                case "disable-user":
+                case "disable-until-used":
+                case "default-state":
+                    // Component-level state is not journaled
+                    if (target.contains("/")) {
+                        return null;
+                    }
+                    undo.put(entry("enabled").put("package", target)
+                        .put("state", pm.getApplicationEnabledSetting(target)));
+                    return undo;
+                    
+                case "grant":
+                case "revoke":
+                    if (args.length != 4) {
+                        return null;
+                    }
+                    undo.put(entry("permission").put("package", args[2])
+                        .put("permission", args[3])
+                        .put("granted", pm.checkPermission(args[3], args[2])
+                            == PackageManager.PERMISSION_GRANTED));
+                    return undo;
+                    
+                case "install":
+                    PackageInfo archive = pm.getPackageArchiveInfo(target, 0);
+                    if (archive == null) {
+                        return null;
+                    }
+                    undo.put(packageEntry(archive.packageName));
+                    return undo;
+                    
+                case "uninstall":
+                    // Only the APK is kept; app data is restored only with -k
+                    undo.put(packageEntry(target));
+                    return undo;
+                    
+                default:
+                    return null;
+            }
+        }
+        
+        /**
+         * The installed APK of a package, or none if it is not installed
+         */
+        private JSONObject packageEntry(String packageName) throws Exception {
+            JSONObject entry = entry("package").put("package", packageName);
+            try {
+                ApplicationInfo app = context.getPackageManager().getApplicationInfo(packageName, 0);
+                if (app.splitSourceDirs != null) {
+                    throw new IOException("Split APKs are not journaled: " + packageName);
+                }
+                entry.put("object", snapshotManager.storeFile(new File(app.sourceDir)));
+            } catch (PackageManager.NameNotFoundException e) {
+                // Not installed yet, so undo is an uninstall
+            }
+            return entry;
+        }
+        
+        private JSONObject fileEntry(String path) throws Exception {
+            File file = new File(path);
+            if (file.isDirectory()) {
+                throw new IOException("Directories are not journaled: " + path);
+            }
+            JSONObject entry = entry("file").put("path", file.getAbsolutePath());
+            if (file.exists()) {
+                entry.put("object", snapshotManager.storeFile(file));
+            }
+            return entry;
+        }
+        
+        private boolean undo(JSONObject entry) throws Exception {
+            switch (entry.getString("type")) {
+                case "prop":
+                    return run("setprop", entry.getString("name"), entry.getString("value"));
+                    
+                case "enabled":
+                    return run("pm", enabledCommand(entry.getInt("state")), entry.getString("package"));
+                    
+                case "permission":
+                    return run("pm", entry.getBoolean("granted") ? "grant" : "revoke",
+                        entry.getString("package"), entry.getString("permission"));
+                    
+                case "package":
+                    if (!entry.has("object")) {
+                        return run("pm", "uninstall", entry.getString("package"));
+                    }
+                    return run("pm", "install", "-r", "-d",
+                        snapshotManager.objectFile(entry.getString("object")).getAbsolutePath());
+                    
+                case "file":
+                    File file = new File(entry.getString("path"));
+                    if (!entry.has("object")) {
+                        return !file.exists() || file.delete();
+                    }
+                    snapshotManager.restoreObject(entry.getString("object"), file);
+                    return true;
+                    
+                case "snapshot":
+                    // Fallback of journals written by earlier versions; a full
+                    // snapshot does not restore everything, so never claim it did
+                    return false;
+                    
+                default:
+                    return false;
+            }
         }
         
-        private JSONArray captureRunningServices() throws JSONException {
-            JSONArray services = new JSONArray();
-            // Would enumerate running services
-            return services;
+        private String enabledCommand(int state) {
+            switch (state) {
+                case PackageManager.COMPONENT_ENABLED_STATE_ENABLED:
+                    return "enable";
+                case PackageManager.COMPONENT_ENABLED_STATE_DISABLED:
+                    return "disable";
+                case PackageManager.COMPONENT_ENABLED_STATE_DISABLED_USER:
+                    return "disable-user";
+                case PackageManager.COMPONENT_ENABLED_STATE_DISABLED_UNTIL_USED:
+                    return "disable-until-used";
+                default:
+                    return "default-state";
+            }
         }
         
-        private JSONArray captureInstalledPackages() throws JSONException {
-            JSONArray packages = new JSONArray();
-            // Would enumerate installed packages
-            return packages;
+        private JSONObject entry(String type) throws JSONException {
+            JSONObject entry = new JSONObject();
+            entry.put("type", type);
+            return entry;
         }
         
-        private void restoreSystemProperties(JSONObject props) {
-            // Restore system properties (requires root)
+        private String getprop(String name) throws IOException {
+            Process process = Runtime.getRuntime().exec(new String[]{"getprop", name});
+            BufferedReader reader = new BufferedReader(
+                new InputStreamReader(process.getInputStream()));
+            try {
+                String value = reader.readLine();
+                return value != null ? value : "";
+            } finally {
+                reader.close();
+            }
+        }
+        
+        private boolean run(String... command) throws IOException, InterruptedException {
+            Process process = Runtime.getRuntime().exec(command);
+            if (!process.waitFor(60, TimeUnit.SECONDS)) {
+                process.destroyForcibly();
+                return false;
+            }
+            return process.exitValue() == 0;
         }
         
-        private void restoreServices(JSONArray services) {
-            // Restore service states
+        private void save(String snapshotId, JSONArray entries) throws IOException {
+            snapshotManager.writeAtomically(journalFile(snapshotId),
+                entries.toString().getBytes(StandardCharsets.UTF_8));
+        }
+        
+        private File journalFile(String snapshotId) {
+            return new File(snapshotManager.journalDir, snapshotId + ".json");
         }
     }
     
@@ -473,7 +1415,18 @@ public class AIAgentService extends Service {
         
         JSONObject response = new JSONObject();
         
-        executorService.submit(() -> {
+        // Journal the command for the lazy snapshot it runs under, if any;
+        // refuse to run it unjournaled
+        String snapshotId = request.optString("snapshotId", null);
+        if (snapshotId != null) {
+            String refused = undoJournal.recordBefore(command, snapshotId);
+            if (refused != null) {
+                response.put("error", refused);
+                return response;
+            }
+        }
+        
+        Future<?> done = executorService.submit(() -> {
             try {
                 Process process = Runtime.getRuntime().exec(command);
                 boolean finished = process.waitFor(timeout, TimeUnit.MILLISECONDS);
@@ -502,9 +1455,312 @@ public class AIAgentService extends Service {
             }
         });
         
+        // A journaled command must have applied its change before the client
+        // can ask for a rollback, or the undo would run first and be lost
+        if (snapshotId != null) {
+            try {
+                done.get(timeout + 1000L, TimeUnit.MILLISECONDS);
+            } catch (Exception e) {
+                done.cancel(true);
+                response.put("error", "Command did not finish: " + e.getMessage());
+            }
+        }
+        
         return response;
     }
     
+    /**
+     * Run several shell commands in one round trip
+     *
+     * Same request and response as execute_batch on the Python agents:
+     * "commands" are strings or {"command", "timeout"} objects, "mode" is
+     * "sequential" or "parallel", and with "stop_on_error" the commands
+     * after (or still running at) the first failure are reported as
+     * "skipped". "in_waydroid" is ignored, as this service runs on the
+     * device itself.
+     */
+    private JSONObject handleExecuteBatch(JSONObject request)
+            throws JSONException, InterruptedException {
+        JSONArray commands = request.optJSONArray("commands");
+        if (commands == null || commands.length() == 0) {
+            throw new IllegalArgumentException("'commands' must be a non-empty list");
+        }
+        if (commands.length() > MAX_BATCH_COMMANDS) {
+            throw new IllegalArgumentException("at most " + MAX_BATCH_COMMANDS + " commands per batch");
+        }
+        String mode = request.optString("mode", "sequential");
+        if (!"sequential".equals(mode) && !"parallel".equals(mode)) {
+            throw new IllegalArgumentException("'mode' must be 'sequential' or 'parallel'");
+        }
+        boolean stopOnError = request.optBoolean("stop_on_error", false);
+        int defaultTimeout = request.optInt("timeout", DEFAULT_BATCH_TIMEOUT_MS);
+        
+        int count = commands.length();
+        String[] lines = new String[count];
+        int[] timeouts = new int[count];
+        for (int i = 0; i < count; i++) {
+            Object item = commands.get(i);
+            if (item instanceof String) {
+                lines[i] = (String) item;
+                timeouts[i] = defaultTimeout;
+            } else if (item instanceof JSONObject
+                    && ((JSONObject) item).opt("command") instanceof String) {
+                lines[i] = ((JSONObject) item).getString("command");
+                timeouts[i] = ((JSONObject) item).optInt("timeout", defaultTimeout);
+            } else {
+                throw new IllegalArgumentException(
+                    "each command must be a string or have a 'command' string");
+            }
+        }
+        
+        long start = System.nanoTime();
+        JSONObject[] results = new JSONObject[count];
+        if ("sequential".equals(mode)) {
+            for (int i = 0; i < count; i++) {
+                results[i] = stopOnError && i > 0 && !results[i - 1].getBoolean("success")
+                    ? commandResult(lines[i], "skipped")
+                    : runCommand(lines[i], timeouts[i]);
+            }
+        } else {
+            ExecutorCompletionService<JSONObject> completion =
+                new ExecutorCompletionService<>(executorService);
+            List<Future<JSONObject>> futures = new ArrayList<>();
+            for (int i = 0; i < count; i++) {
+                String line = lines[i];
+                int timeout = timeouts[i];
+                futures.add(completion.submit(() -> runCommand(line, timeout)));
+            }
+            try {
+                for (int i = 0; i < count; i++) {
+                    JSONObject result = completion.take().get();
+                    if (stopOnError && !result.getBoolean("success")) {
+                        break;
+                    }
+                }
+            } catch (ExecutionException e) {
+                Log.e(TAG, "Batch command failed to run", e);
+            } finally {
+                for (Future<JSONObject> future : futures) {
+                    future.cancel(true);
+                }
+            }
+            for (int i = 0; i < count; i++) {
+                Future<JSONObject> future = futures.get(i);
+                try {
+                    results[i] = future.isCancelled()
+                        ? commandResult(lines[i], "skipped") : future.get();
+                } catch (ExecutionException e) {
+                    results[i] = commandResult(lines[i], "error")
+                        .put("error", String.valueOf(e.getCause()));
+                }
+            }
+        }
+        
+        boolean success = true;
+        JSONArray items = new JSONArray();
+        for (JSONObject result : results) {
+            success &= result.getBoolean("success");
+            items.put(result);
+        }
+        
+        JSONObject response = new JSONObject();
+        response.put("success", success);
+        response.put("mode", mode);
+        response.put("results", items);
+        response.put("duration", (System.nanoTime() - start) / 1e9);
+        
+        return response;
+    }
+    
+    /**
+     * Run one command through the shell, in the result format of execute_batch
+     */
+    private JSONObject runCommand(String command, int timeout) throws JSONException {
+        long start = System.nanoTime();
+        JSONObject result = commandResult(command, "error");
+        File output = null;
+        Process process = null;
+        
+        try {
+            // Output goes to a file so a chatty command cannot fill a pipe
+            // nobody reads until it exits
+            output = File.createTempFile("exec", ".out", getCacheDir());
+            process = new ProcessBuilder("sh", "-c", command)
+                .redirectErrorStream(true)
+                .redirectOutput(output)
+                .start();
+            
+            if (process.waitFor(timeout, TimeUnit.MILLISECONDS)) {
+                int exitCode = process.exitValue();
+                result.put("status", exitCode == 0 ? "ok" : "failed");
+                result.put("exit_code", exitCode);
+                result.put("output", new String(Files.readAllBytes(output.toPath()),
+                    StandardCharsets.UTF_8));
+            } else {
+                process.destroyForcibly();
+                result.put("status", "timeout");
+                result.put("error", "Command timeout");
+            }
+        } catch (IOException e) {
+            result.put("error", e.getMessage());
+        } catch (InterruptedException e) {
+            // Cancelled by stop_on_error in a parallel batch
+            process.destroyForcibly();
+            result.put("status", "skipped");
+            Thread.currentThread().interrupt();
+        } finally {
+            if (output != null) {
+                output.delete();
+            }
+        }
+        
+        result.put("success", "ok".equals(result.getString("status")));
+        result.put("duration", (System.nanoTime() - start) / 1e9);
+        return result;
+    }
+    
+    private JSONObject commandResult(String command, String status) throws JSONException {
+        JSONObject result = new JSONObject();
+        result.put("command", command);
+        result.put("status", status);
+        result.put("exit_code", JSONObject.NULL);
+        result.put("output", "");
+        result.put("error", JSONObject.NULL);
+        result.put("success", false);
+        result.put("duration", 0.0);
+        return result;
+    }
+    
+    /**
+     * Run a command and stream its output as NDJSON frames
+     *
+     * Same frames as execute_stream on the Python agents: {"stream":
+     * "stdout"|"stderr", "data"} while the command runs, then one {"stream":
+     * "exit", "status", "exit_code", "error", "duration"}. A client that
+     * disconnects kills the command.
+     */
+    private NanoHTTPD.Response handleExecuteStream(JSONObject request) throws IOException {
+        String command = request.optString("command", "");
+        if (command.isEmpty()) {
+            return NanoHTTPD.newFixedLengthResponse(NanoHTTPD.Response.Status.BAD_REQUEST,
+                "application/json", errorBody("command required"));
+        }
+        int timeout = request.optInt("timeout", DEFAULT_BATCH_TIMEOUT_MS);
+        
+        PipedInputStream body = new PipedInputStream(STREAM_PIPE_SIZE);
+        OutputStream frames = new PipedOutputStream(body);
+        new Thread(() -> streamCommand(command, timeout, frames), "airos-stream").start();
+        
+        return NanoHTTPD.newChunkedResponse(NanoHTTPD.Response.Status.OK,
+            "application/x-ndjson", body);
+    }
+    
+    /**
+     * Write output frames while the command runs, then the exit frame
+     *
+     * Only this thread writes to the pipe, so it stays alive for as long as
+     * the client reads; the pumps hand their frames over through a queue.
+     */
+    private void streamCommand(String command, int timeout, OutputStream frames) {
+        long start = System.nanoTime();
+        long deadline = start + TimeUnit.MILLISECONDS.toNanos(timeout);
+        Process process = null;
+        
+        try {
+            JSONObject exit = new JSONObject();
+            exit.put("stream", "exit");
+            exit.put("exit_code", JSONObject.NULL);
+            exit.put("error", JSONObject.NULL);
+            
+            try {
+                process = new ProcessBuilder("sh", "-c", command).start();
+                BlockingQueue<JSONObject> queue = new LinkedBlockingQueue<>();
+                pump(process.getInputStream(), "stdout", queue);
+                pump(process.getErrorStream(), "stderr", queue);
+                
+                int openStreams = 2;
+                while (openStreams > 0) {
+                    JSONObject frame = queue.poll(deadline - System.nanoTime(), TimeUnit.NANOSECONDS);
+                    if (frame == null) {
+                        break;
+                    } else if (frame == END_OF_STREAM) {
+                        openStreams--;
+                    } else {
+                        writeFrame(frames, frame);
+                    }
+                }
+                
+                if (openStreams == 0
+                        && process.waitFor(Math.max(0, deadline - System.nanoTime()), TimeUnit.NANOSECONDS)) {
+                    int exitCode = process.exitValue();
+                    exit.put("status", exitCode == 0 ? "ok" : "failed");
+                    exit.put("exit_code", exitCode);
+                } else {
+                    process.destroyForcibly();
+                    exit.put("status", "timeout");
+                    exit.put("error", "Command timeout");
+                }
+            } catch (IOException e) {
+                if (process != null) {
+                    // The client went away
+                    process.destroyForcibly();
+                    return;
+                }
+                exit.put("status", "error");
+                exit.put("error", e.getMessage());
+            }
+            
+            exit.put("duration", (System.nanoTime() - start) / 1e9);
+            writeFrame(frames, exit);
+            
+        } catch (IOException | JSONException | InterruptedException e) {
+            Log.w(TAG, "Output stream of " + command + " ended early", e);
+            if (process != null) {
+                process.destroyForcibly();
+            }
+        } finally {
+            try {
+                frames.close();
+            } catch (IOException e) {
+                Log.w(TAG, "Error closing output stream", e);
+            }
+        }
+    }
+    
+    private void pump(InputStream in, String stream, BlockingQueue<JSONObject> queue) {
+        new Thread(() -> {
+            // A reader keeps multi-byte characters split across reads intact
+            Reader reader = new InputStreamReader(in, StandardCharsets.UTF_8);
+            char[] buffer = new char[STREAM_CHUNK_SIZE];
+            try {
+                int read;
+                while ((read = reader.read(buffer)) != -1) {
+                    JSONObject frame = new JSONObject();
+                    frame.put("stream", stream);
+                    frame.put("data", new String(buffer, 0, read));
+                    queue.put(frame);
+                }
+            } catch (IOException | JSONException | InterruptedException e) {
+                Log.w(TAG, "Error reading " + stream, e);
+            } finally {
+                queue.add(END_OF_STREAM);
+            }
+        }, "airos-stream-" + stream).start();
+    }
+    
+    private void writeFrame(OutputStream frames, JSONObject frame) throws IOException {
+        frames.write((frame.toString() + "\n").getBytes(StandardCharsets.UTF_8));
+        frames.flush();
+    }
+    
+    private String errorBody(String message) {
+        try {
+            return new JSONObject().put("error", message).toString();
+        } catch (JSONException e) {
+            return "{\"error\":\"Bad request\"}";
+        }
+    }
+    
     private JSONObject handleCodeInjection(JSONObject request) throws JSONException {
         String targetClass = request.getString("targetClass");
         String methodName = request.getString("methodName");
@@ -523,23 +1779,45 @@ public class AIAgentService extends Service {
     
     private JSONObject handleSnapshot(JSONObject request) throws JSONException {
         String name = request.optString("name", "manual");
-        String snapshotId = snapshotManager.createSnapshot(name);
+        boolean lazy = "lazy".equals(request.optString("mode", "full"));
+        String snapshotId = lazy ? undoJournal.open(name) : snapshotManager.createSnapshot(name);
         
         JSONObject response = new JSONObject();
         response.put("snapshotId", snapshotId);
+        response.put("mode", lazy ? "lazy" : "full");
+        if (!lazy) {
+            // Full snapshots do not cover installed packages
+            response.put("restores", SystemSnapshotManager.RESTORED_NAMESPACES);
+        }
         response.put("success", snapshotId != null);
         
+        if (snapshotId != null) {
+            wsServer.publish("snapshot", response);
+        }
+        return response;
+    }
+    
+    private JSONObject handleReleaseSnapshot(JSONObject request) throws JSONException {
+        String snapshotId = request.getString("snapshotId");
+        
+        JSONObject response = new JSONObject();
+        response.put("success", undoJournal.release(snapshotId));
+        response.put("snapshotId", snapshotId);
+        
         return response;
     }
     
     private JSONObject handleRollback(JSONObject request) throws JSONException {
         String snapshotId = request.getString("snapshotId");
-        boolean success = snapshotManager.rollback(snapshotId);
+        boolean success = undoJournal.owns(snapshotId)
+            ? undoJournal.rollback(snapshotId)
+            : snapshotManager.rollback(snapshotId);
         
         JSONObject response = new JSONObject();
         response.put("success", success);
         response.put("snapshotId", snapshotId);
         
+        wsServer.publish("rollback", response);
         return response;
     }
     
@@ -627,7 +1905,9 @@ public class AIAgentService extends Service {
     }
     
     private void subscribeToEvents(WebSocket conn, String eventType) {
-        // Subscribe to system events and forward to WebSocket
+        // Events of the subscribed types are forwarded by AIWebSocketServer.publish
+        Set<String> types = conn.getAttachment();
+        types.add(eventType);
     }
     
     private void startMonitoring(WebSocket conn, String component) {